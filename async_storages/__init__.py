@@ -1,11 +1,15 @@
-from sanitize_filename import sanitize_filename
+import importlib
+import typing
 
-from async_storages.backends.base import BaseBackend
-from async_storages.backends.fs import FileSystemBackend
-from async_storages.backends.memory import MemoryBackend
-from async_storages.backends.s3 import S3Backend
-from async_storages.file_storage import FileStorage
-from async_storages.helpers import generate_file_path
+if typing.TYPE_CHECKING:  # pragma: no cover
+    from sanitize_filename import sanitize_filename
+
+    from async_storages.backends.base import BaseBackend
+    from async_storages.backends.fs import FileSystemBackend
+    from async_storages.backends.memory import MemoryBackend
+    from async_storages.backends.s3 import S3Backend
+    from async_storages.file_storage import FileStorage
+    from async_storages.helpers import generate_file_path
 
 __all__ = [
     "FileStorage",
@@ -16,3 +20,29 @@ __all__ = [
     "sanitize_filename",
     "generate_file_path",
 ]
+
+# public name -> (module, attribute), attribute is None when the module itself is exported
+_lazy_attributes: dict[str, tuple[str, str | None]] = {
+    "FileStorage": ("async_storages.file_storage", "FileStorage"),
+    "S3Backend": ("async_storages.backends.s3", "S3Backend"),
+    "MemoryBackend": ("async_storages.backends.memory", "MemoryBackend"),
+    "FileSystemBackend": ("async_storages.backends.fs", "FileSystemBackend"),
+    "BaseBackend": ("async_storages.backends.base", "BaseBackend"),
+    "sanitize_filename": ("sanitize_filename.sanitize_filename", None),
+    "generate_file_path": ("async_storages.helpers", "generate_file_path"),
+}
+
+
+def __getattr__(name: str) -> typing.Any:
+    if name not in _lazy_attributes:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    module_name, attribute = _lazy_attributes[name]
+    module = importlib.import_module(module_name)
+    value = module if attribute is None else getattr(module, attribute)
+    globals()[name] = value  # next lookups bypass __getattr__
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *__all__])
@@ -0,0 +1,207 @@
+import contextlib
+import os
+import tarfile
+import tempfile
+import time
+import typing
+import zipfile
+
+import anyio
+import anyio.abc
+
+from async_storages.backends.base import run_sync
+
+if typing.TYPE_CHECKING:  # pragma: no cover
+    from async_storages.file_storage import FileStorage
+
+ArchiveFormat = typing.Literal["zip", "tar"]
+
+# compressing these again wastes CPU for no gain
+STORED_EXTENSIONS = frozenset(
+    {
+        ".7z", ".aac", ".avif", ".br", ".bz2", ".docx", ".flac", ".gif", ".gz", ".heic", ".jpeg", ".jpg", ".m4a",
+        ".mkv", ".mov", ".mp3", ".mp4", ".ogg", ".png", ".rar", ".tgz", ".webm", ".webp", ".xlsx", ".xz", ".zip",
+        ".zst",
+    }
+)  # fmt: skip
+
+_CHUNK_SIZE = 1024 * 64
+
+
+class _Sink:
+    """A write-only, non-seekable file collecting archive bytes until they are sent to the client."""
+
+    def __init__(self) -> None:
+        self.chunks: list[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+class _Slot:
+    def __init__(self, path: str, arcname: str) -> None:
+        self.path = path
+        self.arcname = arcname
+        self.ready = anyio.Event()
+        self.file: tempfile.SpooledTemporaryFile[bytes] | None = None
+        self.size = 0
+        self.on_disk = False  # spooled files roll over to disk, touch them in a worker thread from then on
+        self.error: Exception | None = None
+
+
+async def _prefetch(storage: "FileStorage", slot: _Slot, spool_max_size: int) -> None:
+    try:
+        spooled = tempfile.SpooledTemporaryFile(max_size=spool_max_size)
+        slot.file = spooled
+        file = await storage.open(slot.path)
+        async with file:
+            while chunk := await file.read(_CHUNK_SIZE):
+                slot.size += len(chunk)
+                slot.on_disk = slot.size > spool_max_size
+                if slot.on_disk:
+                    await run_sync(spooled.write, chunk)
+                else:
+                    spooled.write(chunk)
+        spooled.seek(0)
+    except Exception as ex:
+        slot.error = ex
+    finally:
+        slot.ready.set()
+
+
+async def _read_chunks(slot: _Slot) -> typing.AsyncIterator[bytes]:
+    assert slot.file is not None
+    while True:
+        chunk = await run_sync(slot.file.read, _CHUNK_SIZE) if slot.on_disk else slot.file.read(_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def _zip_entries(slots: typing.AsyncIterator[_Slot]) -> typing.AsyncIterator[bytes]:
+    sink = _Sink()
+    archive = zipfile.ZipFile(typing.cast(typing.IO[bytes], sink), mode="w", allowZip64=True)
+    async for slot in slots:
+        info = zipfile.ZipInfo(slot.arcname, date_time=time.localtime()[:6])
+        is_stored = os.path.splitext(slot.arcname)[1].lower() in STORED_EXTENSIONS
+        info.compress_type = zipfile.ZIP_STORED if is_stored else zipfile.ZIP_DEFLATED
+        info.file_size = slot.size
+        with archive.open(info, mode="w", force_zip64=True) as entry:
+            async for chunk in _read_chunks(slot):
+                if is_stored:
+                    entry.write(chunk)
+                else:
+                    await run_sync(entry.write, chunk)
+                if data := sink.drain():
+                    yield data
+        yield sink.drain()
+    archive.close()
+    yield sink.drain()
+
+
+async def _tar_entries(slots: typing.AsyncIterator[_Slot]) -> typing.AsyncIterator[bytes]:
+    written = 0
+    async for slot in slots:
+        info = tarfile.TarInfo(slot.arcname)
+        info.size = slot.size
+        info.mtime = int(time.time())
+        header = info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+        written += len(header)
+        yield header
+        async for chunk in _read_chunks(slot):
+            written += len(chunk)
+            yield chunk
+        if padding := -slot.size % tarfile.BLOCKSIZE:
+            written += padding
+            yield tarfile.NUL * padding
+
+    end = tarfile.NUL * (tarfile.BLOCKSIZE * 2)
+    written += len(end)
+    yield end + tarfile.NUL * (-written % tarfile.RECORDSIZE)
+
+
+@contextlib.asynccontextmanager
+async def open_archive(
+    storage: "FileStorage",
+    paths: typing.Iterable[str] | typing.Mapping[str, str],
+    format: ArchiveFormat = "zip",
+    concurrency: int = 4,
+    spool_max_size: int = 1024**2 * 8,
+) -> typing.AsyncIterator[typing.AsyncIterator[bytes]]:
+    """
+    Generate an archive of stored files, yields an iterator of archive bytes.
+
+    Up to `concurrency` files are downloaded ahead of the one being written, each is spooled to memory
+    and rolled over to a temporary file when it grows beyond `spool_max_size`.
+    Entries are written in the given order. Pass a mapping to rename files inside the archive.
+    Downloads run in background tasks which are cancelled when the context exits,
+    so the archive may be abandoned halfway.
+    """
+    if format not in ("zip", "tar"):
+        raise ValueError(f"Unsupported archive format: {format}")
+
+    items = list(paths.items() if isinstance(paths, typing.Mapping) else ((path, path) for path in paths))
+    slots = [_Slot(path, arcname.lstrip("/")) for path, arcname in items]
+    limiter = anyio.Semaphore(max(concurrency, 1))
+    send_stream, receive_stream = anyio.create_memory_object_stream[bytes](1)
+    errors: list[Exception] = []
+
+    async def producer(tg: anyio.abc.TaskGroup) -> None:
+        for slot in slots:
+            await limiter.acquire()  # released when the entry has been written
+            tg.start_soon(_prefetch, storage, slot, spool_max_size)
+
+    async def ordered_slots() -> typing.AsyncIterator[_Slot]:
+        for slot in slots:
+            await slot.ready.wait()
+            if slot.error:
+                raise slot.error
+            try:
+                yield slot
+            finally:
+                if slot.file:
+                    slot.file.close()
+                limiter.release()
+
+    async def writer() -> None:
+        write_entries = _zip_entries if format == "zip" else _tar_entries
+        async with send_stream:
+            try:
+                async for data in write_entries(ordered_slots()):
+                    if data:
+                        await send_stream.send(data)
+            except Exception as ex:
+                errors.append(ex)  # raised to the reader when the stream ends
+
+    async def chunks() -> typing.AsyncIterator[bytes]:
+        async for data in receive_stream:
+            yield data
+        if errors:
+            raise errors[0]
+
+    # the context owns the task group: archive bytes are never yielded from inside of its scope
+    error: Exception | None = None
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(producer, tg)
+        tg.start_soon(writer)
+        try:
+            yield chunks()
+        except Exception as ex:
+            error = ex  # raised outside of the task group so callers don't get an exception group
+        finally:
+            tg.cancel_scope.cancel()
+            receive_stream.close()
+            for slot in slots:
+                if slot.file:
+                    slot.file.close()
+    if error:
+        raise error
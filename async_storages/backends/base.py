@@ -1,10 +1,33 @@
 import abc
+import asyncio
+import contextvars
+import dataclasses
 import tempfile
+import time
 import types
 import typing
+import weakref
 
 import anyio.to_thread
 
+_T = typing.TypeVar("_T")
+
+# callbacks notified every time a blocking call is sent to a worker thread, used by instrumentation
+thread_hop_listeners: contextvars.ContextVar[tuple[typing.Callable[[], None], ...]] = contextvars.ContextVar(
+    "thread_hop_listeners", default=()
+)
+
+
+async def run_sync(func: typing.Callable[..., _T], *args: typing.Any) -> _T:
+    for listener in thread_hop_listeners.get():
+        listener()
+    return await anyio.to_thread.run_sync(func, *args)
+
+
+# event loops running as long as the process (the loop thread of SyncFileStorage),
+# backends keep clients and their connection pools bound to them between calls
+long_lived_loops: "weakref.WeakSet[asyncio.AbstractEventLoop]" = weakref.WeakSet()
+
 
 def is_rolled(file: tempfile.SpooledTemporaryFile[bytes]) -> bool:
     return getattr(file, "_rolled", True)
@@ -27,30 +50,82 @@ class AsyncFileLike(typing.Protocol):  # pragma: no cover
     ) -> None: ...
 
 
+@dataclasses.dataclass(frozen=True)
+class FileInfo:
+    path: str
+    size: int
+    etag: str | None = None
+    mtime: float | None = None
+
+
+@dataclasses.dataclass
+class UploadSession:
+    id: str
+    path: str
+    length: int | None = None  # total size, if announced
+    offset: int = 0  # number of stored bytes, next part must start here
+    metadata: dict[str, str] = dataclasses.field(default_factory=dict)
+    created_at: float = dataclasses.field(default_factory=time.time)
+
+    @property
+    def is_complete(self) -> bool:
+        return self.length is not None and self.offset >= self.length
+
+
+class UploadOffsetError(ValueError):
+    def __init__(self, expected: int, actual: int) -> None:
+        super().__init__(f"Upload is at offset {expected}, got part at offset {actual}")
+        self.expected = expected
+        self.actual = actual
+
+
+class UploadSizeError(ValueError):
+    def __init__(self, length: int) -> None:
+        super().__init__(f"Upload exceeds announced length of {length} bytes")
+        self.length = length
+
+
+async def read_upload_part(
+    data: AsyncReader, session: UploadSession, chunk_size: int = 1024 * 64
+) -> typing.AsyncIterator[bytes]:
+    """Read a part of a resumable upload, it must not go past the announced length."""
+    remaining = None if session.length is None else session.length - session.offset
+    while chunk := await data.read(chunk_size if remaining is None else min(chunk_size, remaining)):
+        if remaining is not None:
+            remaining -= len(chunk)
+        yield chunk
+    if session.length is not None and remaining == 0 and await data.read(1):
+        raise UploadSizeError(session.length)
+
+
 class AdaptedBytesIO:
-    def __init__(self, base: typing.BinaryIO | tempfile.SpooledTemporaryFile[bytes]) -> None:
+    def __init__(
+        self, base: typing.BinaryIO | tempfile.SpooledTemporaryFile[bytes], close_on_exit: bool = True
+    ) -> None:
         self.io = base
+        self.close_on_exit = close_on_exit
 
     async def read(self, n: int = -1) -> bytes:
         if isinstance(self.io, tempfile.SpooledTemporaryFile):
             if is_rolled(self.io):
-                return await anyio.to_thread.run_sync(self.io.read, n)
+                return await run_sync(self.io.read, n)
             return self.io.read(n)
-        return await anyio.to_thread.run_sync(self.io.read, n)
+        return await run_sync(self.io.read, n)
 
     async def __aiter__(self) -> typing.AsyncIterator[bytes]:
         if isinstance(self.io, tempfile.SpooledTemporaryFile) and not is_rolled(self.io):
             for line in self.io.readlines():
                 yield line
         else:
-            for line in await anyio.to_thread.run_sync(self.io.readlines):  # will it block for large files?
+            for line in await run_sync(self.io.readlines):  # will it block for large files?
                 yield line
 
     async def __aenter__(self) -> "AdaptedBytesIO":
         return self
 
     async def __aexit__(self, exc_type: type[Exception], exc_val: BaseException, exc_tb: types.TracebackType) -> None:
-        await anyio.to_thread.run_sync(self.io.close)
+        if self.close_on_exit:
+            await run_sync(self.io.close)
 
 
 class BaseBackend(abc.ABC):  # pragma: no cover
@@ -71,3 +146,49 @@ class BaseBackend(abc.ABC):  # pragma: no cover
 
     @abc.abstractmethod
     def abspath(self, path: str) -> str: ...
+
+    def list(self, prefix: str = "") -> typing.AsyncIterator[FileInfo]:
+        """Iterate over stored files which paths start with `prefix`."""
+        raise NotImplementedError(f"{type(self).__name__} does not support listing files")
+
+    async def copy(self, source: str, dest: str) -> None:
+        """Copy a file within the backend. Backends that can copy without downloading the file override it."""
+        file = await self.read(source, 1024 * 64)
+        async with file:
+            await self.write(dest, file)
+
+    # content encoding stored with the object itself (S3 Content-Encoding), used by CompressedBackend.
+    # Backends setting `stores_content_encoding` implement both methods, `write` stores a file without encoding.
+    stores_content_encoding: bool = False
+
+    async def write_encoded(self, path: str, data: AsyncReader, encoding: str) -> None:
+        """Store already encoded bytes (gzip, zstd) and their encoding."""
+        raise NotImplementedError(f"{type(self).__name__} does not store content encodings")
+
+    async def read_encoded(self, path: str, chunk_size: int) -> tuple[AsyncFileLike, str | None]:
+        """Open the file and return its stored bytes as is, with their encoding."""
+        raise NotImplementedError(f"{type(self).__name__} does not store content encodings")
+
+    # resumable uploads: parts are appended to a session and the file appears at `path` on completion
+
+    async def create_upload(
+        self, path: str, length: int | None = None, metadata: dict[str, str] | None = None
+    ) -> UploadSession:
+        raise NotImplementedError(f"{type(self).__name__} does not support resumable uploads")
+
+    async def get_upload(self, upload_id: str) -> UploadSession:
+        """Return the session, raise FileNotFoundError for unknown ids."""
+        raise NotImplementedError(f"{type(self).__name__} does not support resumable uploads")
+
+    async def append_upload(self, upload_id: str, offset: int, data: AsyncReader) -> UploadSession:
+        """
+        Append data at `offset`, which must equal the current offset of the session.
+        If reading `data` fails, bytes received so far are kept and the session offset is advanced.
+        """
+        raise NotImplementedError(f"{type(self).__name__} does not support resumable uploads")
+
+    async def complete_upload(self, upload_id: str) -> UploadSession:
+        raise NotImplementedError(f"{type(self).__name__} does not support resumable uploads")
+
+    async def abort_upload(self, upload_id: str) -> None:
+        raise NotImplementedError(f"{type(self).__name__} does not support resumable uploads")
@@ -0,0 +1,302 @@
+import io
+import time
+import types
+import typing
+
+import anyio
+
+from async_storages.backends.base import (
+    AdaptedBytesIO,
+    AsyncFileLike,
+    AsyncReader,
+    BaseBackend,
+    FileInfo,
+    UploadSession,
+)
+
+
+class _Flight:
+    """One upstream read shared by concurrent readers of the same file."""
+
+    def __init__(self, backend: "CoalescingBackend", path: str) -> None:
+        self.backend = backend
+        self.path = path
+        self.upstream: AsyncFileLike | None = None
+        self.opened = anyio.Event()
+        self.fetch_lock = anyio.Lock()
+        self.chunks: list[bytes] = []  # fetched bytes which are still buffered
+        self.base_offset = 0  # position of the first buffered byte
+        self.size = 0  # number of bytes fetched so far
+        self.eof = False
+        self.error: Exception | None = None
+        self.broken = False  # a fetch was cancelled, remaining readers continue with their own reads
+        self.readers = 0
+        self.retaining = backend.retain_ttl > 0
+
+    async def open(self) -> None:
+        try:
+            self.upstream = await self.backend.backend.read(self.path, self.backend.chunk_size)
+        except BaseException as ex:
+            self.error = ex if isinstance(ex, Exception) else ConnectionAbortedError("Shared read was cancelled")
+            self.backend.forget(self)
+            raise
+        finally:
+            self.opened.set()
+
+    def _slice(self, position: int, n: int) -> bytes:
+        offset = self.base_offset
+        for chunk in self.chunks:
+            if position < offset + len(chunk):
+                start = position - offset
+                return chunk[start:] if n < 0 else chunk[start : start + n]
+            offset += len(chunk)
+        return b""  # pragma: no cover
+
+    def _evict(self) -> None:
+        if self.retaining and self.size <= self.backend.retain_max_size:
+            return
+
+        self.retaining = False
+        buffered = self.size - self.base_offset
+        while len(self.chunks) > 1 and buffered - len(self.chunks[0]) >= self.backend.buffer_size:
+            evicted = self.chunks.pop(0)
+            buffered -= len(evicted)
+            self.base_offset += len(evicted)
+
+    async def read_at(self, position: int, n: int) -> bytes | None:
+        """Return bytes at `position`, or None if they were already evicted from the buffer."""
+        while True:
+            if position < self.base_offset:
+                return None
+            if position < self.size:
+                return self._slice(position, n)
+            if self.error:
+                raise self.error
+            if self.eof:
+                return b""
+            if self.broken:
+                return None
+
+            # the fastest reader pulls the next chunk, others wait for it and read it from the buffer
+            async with self.fetch_lock:
+                if position < self.size or self.eof or self.error or self.broken:
+                    continue
+                assert self.upstream is not None
+                try:
+                    chunk = await self.upstream.read(self.backend.chunk_size)
+                except BaseException as ex:
+                    if isinstance(ex, Exception):
+                        self.error = ex
+                    else:  # the reader was cancelled, the upstream position is unknown now
+                        self.broken = True
+                    with anyio.CancelScope(shield=True):
+                        await self.close_upstream()
+                    raise
+
+                if chunk:
+                    self.chunks.append(chunk)
+                    self.size += len(chunk)
+                    self._evict()
+                else:
+                    self.eof = True
+                    self.backend.finish(self)
+                    await self.close_upstream()
+
+    async def close_upstream(self) -> None:
+        self.backend.forget(self)
+        if self.upstream is not None:
+            upstream, self.upstream = self.upstream, None
+            await upstream.__aexit__(None, None, None)  # type: ignore[arg-type]
+
+    async def release(self) -> None:
+        self.readers -= 1
+        if self.readers == 0 and not self.eof:
+            await self.close_upstream()
+
+
+class CoalescedFile:
+    """
+    Reads from a shared upstream read.
+    When the reader falls behind the shared buffer, it opens its own upstream read and skips bytes it has seen.
+    """
+
+    def __init__(self, flight: _Flight, chunk_size: int) -> None:
+        self.flight = flight
+        self.chunk_size = chunk_size
+        self.position = 0
+        self.own_file: AsyncFileLike | None = None
+        self.closed = False
+
+    async def _detach(self) -> None:
+        backend = self.flight.backend
+        backend.detached += 1
+        self.own_file = await backend.backend.read(self.flight.path, backend.chunk_size)
+        await self.flight.release()
+
+        skip = self.position
+        while skip > 0:
+            chunk = await self.own_file.read(min(skip, backend.chunk_size))
+            if not chunk:
+                break
+            skip -= len(chunk)
+
+    async def read(self, n: int = -1) -> bytes:
+        if n < 0:
+            parts = []
+            while part := await self.read(self.chunk_size):
+                parts.append(part)
+            return b"".join(parts)
+
+        chunk = None if self.own_file else await self.flight.read_at(self.position, n)
+        if chunk is None:
+            if self.own_file is None:
+                await self._detach()
+            assert self.own_file is not None
+            chunk = await self.own_file.read(n)
+        self.position += len(chunk)
+        return chunk
+
+    async def __aiter__(self) -> typing.AsyncIterator[bytes]:
+        while chunk := await self.read(self.chunk_size):
+            yield chunk
+
+    async def __aenter__(self) -> "CoalescedFile":
+        return self
+
+    async def __aexit__(self, exc_type: type[Exception], exc_val: BaseException, exc_tb: types.TracebackType) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        if self.own_file is not None:
+            await self.own_file.__aexit__(exc_type, exc_val, exc_tb)
+        else:
+            await self.flight.release()
+
+
+class CoalescingBackend(BaseBackend):
+    """
+    Concurrent reads of the same file share one upstream read (single-flight).
+
+    Fetched chunks are kept in a buffer of `buffer_size` bytes shared by all readers.
+    The fastest reader pulls new chunks, readers which fall behind the buffer continue with their own upstream read.
+    With `retain_ttl` files up to `retain_max_size` bytes are kept in memory after they were read completely
+    and served to readers arriving within `retain_ttl` seconds. Writes and deletes through this backend drop them.
+    """
+
+    def __init__(
+        self,
+        backend: BaseBackend,
+        buffer_size: int = 1024**2,
+        chunk_size: int = 1024 * 64,
+        retain_ttl: float = 0.0,
+        retain_max_size: int = 1024**2,
+    ) -> None:
+        self.backend = backend
+        self.buffer_size = buffer_size
+        self.chunk_size = chunk_size
+        self.retain_ttl = retain_ttl
+        self.retain_max_size = retain_max_size
+        self.flights: dict[str, _Flight] = {}
+        self.retained: dict[str, tuple[bytes, float]] = {}
+        self.upstream_reads = 0
+        self.coalesced_reads = 0
+        self.retained_reads = 0
+        self.detached = 0
+
+    def forget(self, flight: _Flight) -> None:
+        if self.flights.get(flight.path) is flight:
+            del self.flights[flight.path]
+
+    def finish(self, flight: _Flight) -> None:
+        if self.flights.get(flight.path) is flight and flight.retaining and flight.base_offset == 0:
+            self.retained[flight.path] = (b"".join(flight.chunks), time.monotonic() + self.retain_ttl)
+
+    def invalidate(self, path: str) -> None:
+        """New readers won't join reads started before this call, readers of old content finish undisturbed."""
+        self.flights.pop(path, None)
+        self.retained.pop(path, None)
+
+    def _get_retained(self, path: str) -> bytes | None:
+        now = time.monotonic()
+        for expired in [key for key, (_, expires_at) in self.retained.items() if expires_at <= now]:
+            del self.retained[expired]
+        entry = self.retained.get(path)
+        return entry[0] if entry else None
+
+    async def read(self, path: str, chunk_size: int) -> AsyncFileLike:
+        if (data := self._get_retained(path)) is not None:
+            self.retained_reads += 1
+            return AdaptedBytesIO(io.BytesIO(data))
+
+        flight = self.flights.get(path)
+        # late readers can join only while the start of the file is still buffered
+        if flight is not None and flight.base_offset == 0 and flight.error is None and not flight.broken:
+            self.coalesced_reads += 1
+            flight.readers += 1
+            try:
+                await flight.opened.wait()
+            except BaseException:
+                # cancelled while waiting, the last remaining reader must still close the upstream
+                with anyio.CancelScope(shield=True):
+                    await flight.release()
+                raise
+            if flight.error is not None:
+                flight.readers -= 1
+                raise flight.error
+        else:
+            flight = _Flight(self, path)
+            self.flights[path] = flight
+            self.upstream_reads += 1
+            flight.readers += 1
+            try:
+                await flight.open()
+            except BaseException:
+                flight.readers -= 1
+                raise
+        return CoalescedFile(flight, max(chunk_size, self.chunk_size))
+
+    async def write(self, path: str, data: AsyncReader) -> None:
+        self.invalidate(path)
+        try:
+            await self.backend.write(path, data)
+        finally:
+            self.invalidate(path)
+
+    async def delete(self, path: str) -> None:
+        self.invalidate(path)
+        await self.backend.delete(path)
+
+    async def exists(self, path: str) -> bool:
+        return self._get_retained(path) is not None or await self.backend.exists(path)
+
+    async def url(self, path: str) -> str:
+        return await self.backend.url(path)
+
+    def abspath(self, path: str) -> str:
+        return self.backend.abspath(path)
+
+    async def copy(self, source: str, dest: str) -> None:
+        self.invalidate(dest)
+        await self.backend.copy(source, dest)
+
+    def list(self, prefix: str = "") -> typing.AsyncIterator[FileInfo]:
+        return self.backend.list(prefix)
+
+    async def create_upload(
+        self, path: str, length: int | None = None, metadata: dict[str, str] | None = None
+    ) -> UploadSession:
+        return await self.backend.create_upload(path, length, metadata)
+
+    async def get_upload(self, upload_id: str) -> UploadSession:
+        return await self.backend.get_upload(upload_id)
+
+    async def append_upload(self, upload_id: str, offset: int, data: AsyncReader) -> UploadSession:
+        return await self.backend.append_upload(upload_id, offset, data)
+
+    async def complete_upload(self, upload_id: str) -> UploadSession:
+        session = await self.backend.complete_upload(upload_id)
+        self.invalidate(session.path)
+        return session
+
+    async def abort_upload(self, upload_id: str) -> None:
+        await self.backend.abort_upload(upload_id)
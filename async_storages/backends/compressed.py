@@ -0,0 +1,254 @@
+import io
+import types
+import typing
+import zlib
+
+from async_storages.backends.base import (
+    AdaptedBytesIO,
+    AsyncFileLike,
+    AsyncReader,
+    BaseBackend,
+    FileInfo,
+    UploadSession,
+    run_sync,
+)
+from async_storages.pipeline import GzipStage, PipelineReader, Stage, ZstdStage
+
+MAGIC_NUMBERS = {"gzip": b"\x1f\x8b", "zstd": b"\x28\xb5\x2f\xfd"}
+
+
+class _Decompressor(typing.Protocol):  # pragma: no cover
+    def decompress(self, data: bytes) -> bytes: ...
+
+
+def _make_decompressor(encoding: str) -> _Decompressor:
+    if encoding == "zstd":
+        import zstandard
+
+        return typing.cast(_Decompressor, zstandard.ZstdDecompressor().decompressobj())
+    return zlib.decompressobj(31)
+
+
+class _PrependedReader:
+    def __init__(self, head: bytes, reader: AsyncReader) -> None:
+        self.head = head
+        self.reader = reader
+
+    async def read(self, n: int = -1) -> bytes:
+        if n < 0:
+            data, self.head = self.head, b""
+            return data + await self.reader.read()
+        if self.head:
+            data, self.head = (self.head, b"") if n >= len(self.head) else (self.head[:n], self.head[n:])
+            return data
+        return await self.reader.read(n)
+
+
+class _PrependedFile(_PrependedReader):
+    """A file which first bytes were already read."""
+
+    def __init__(self, head: bytes, file: AsyncFileLike) -> None:
+        super().__init__(head, file)
+        self.file = file
+
+    async def __aiter__(self) -> typing.AsyncIterator[bytes]:
+        while chunk := await self.read(1024 * 64):
+            yield chunk
+
+    async def __aenter__(self) -> "_PrependedFile":
+        return self
+
+    async def __aexit__(self, exc_type: type[Exception], exc_val: BaseException, exc_tb: types.TracebackType) -> None:
+        await self.file.__aexit__(exc_type, exc_val, exc_tb)
+
+
+class DecompressingReader:
+    def __init__(self, file: AsyncFileLike, encoding: str, chunk_size: int = 1024 * 64) -> None:
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decompressor = _make_decompressor(encoding)
+        self._buffer = bytearray()
+        self._eof = False
+
+    async def read(self, n: int = -1) -> bytes:
+        while not self._eof and (n < 0 or len(self._buffer) < n):
+            chunk = await self.file.read(self.chunk_size)
+            self._eof = not chunk
+            if chunk:
+                self._buffer += await run_sync(self.decompressor.decompress, chunk)
+
+        if n < 0 or n >= len(self._buffer):
+            data = bytes(self._buffer)
+            self._buffer.clear()
+            return data
+
+        data = bytes(self._buffer[:n])
+        del self._buffer[:n]
+        return data
+
+    async def __aiter__(self) -> typing.AsyncIterator[bytes]:
+        while chunk := await self.read(self.chunk_size):
+            yield chunk
+
+    async def __aenter__(self) -> "DecompressingReader":
+        return self
+
+    async def __aexit__(self, exc_type: type[Exception], exc_val: BaseException, exc_tb: types.TracebackType) -> None:
+        await self.file.__aexit__(exc_type, exc_val, exc_tb)
+
+
+class CompressedBackend(BaseBackend):
+    """
+    Compresses files on write and decompresses them on read.
+
+    Files are stored under their own names, files smaller than `min_size` are stored as is.
+    The encoding is stored with the object when the backend supports it (S3 Content-Encoding, so presigned URLs
+    are decoded by clients). Other backends get a marker file under `encodings_prefix`
+    ("report.json" -> ".encodings/report.json" containing "gzip") and compressed bytes are recognized
+    by the magic number of the encoding.
+    """
+
+    def __init__(
+        self,
+        backend: BaseBackend,
+        encoding: typing.Literal["gzip", "zstd"] = "gzip",
+        level: int | None = None,
+        min_size: int = 1024,
+        encodings_prefix: str = ".encodings/",
+    ) -> None:
+        if encoding not in MAGIC_NUMBERS:
+            raise ValueError(f"Unsupported encoding: {encoding}")
+
+        self.backend = backend
+        self.encoding = encoding
+        self.level = level
+        self.min_size = min_size
+        self.encodings_prefix = encodings_prefix
+
+    def make_stage(self) -> Stage:
+        if self.encoding == "zstd":
+            return ZstdStage() if self.level is None else ZstdStage(self.level)
+        return GzipStage() if self.level is None else GzipStage(self.level)
+
+    def marker_path(self, path: str) -> str:
+        return self.encodings_prefix + path
+
+    async def _read_marker(self, path: str) -> str | None:
+        try:
+            file = await self.backend.read(self.marker_path(path), 64)
+        except FileNotFoundError:
+            return None
+        async with file:
+            encoding = (await file.read()).decode("ascii")
+        if encoding not in MAGIC_NUMBERS:
+            raise ValueError(f"Unsupported encoding of {path}: {encoding}")
+        return encoding
+
+    async def _write_marker(self, path: str, encoding: str | None) -> None:
+        if encoding is None:
+            await self.backend.delete(self.marker_path(path))
+        else:
+            await self.backend.write(self.marker_path(path), AdaptedBytesIO(io.BytesIO(encoding.encode("ascii"))))
+
+    # Without stored encodings the data and its marker are two writes. The marker of a compressed file is written
+    # before the data and removed after uncompressed data, so while they are out of step the marker says "gzip" and
+    # the data is uncompressed. Such data doesn't start with the magic number and is returned as is.
+
+    async def write(self, path: str, data: AsyncReader) -> None:
+        head = b""
+        while len(head) < self.min_size and (chunk := await data.read(self.min_size - len(head))):
+            head += chunk
+
+        reader = _PrependedReader(head, data)
+        if len(head) < self.min_size:
+            await self.backend.write(path, reader)
+            if not self.backend.stores_content_encoding:
+                await self._write_marker(path, None)
+        elif self.backend.stores_content_encoding:
+            await self.backend.write_encoded(path, PipelineReader(reader, [self.make_stage()]), self.encoding)
+        else:
+            await self._write_marker(path, self.encoding)
+            await self.backend.write(path, PipelineReader(reader, [self.make_stage()]))
+
+    async def read(self, path: str, chunk_size: int) -> AsyncFileLike:
+        file, _ = await self.read_encoded(path, chunk_size)
+        return file
+
+    async def read_encoded(
+        self, path: str, chunk_size: int, accept_encodings: typing.Collection[str] = ()
+    ) -> tuple[AsyncFileLike, str | None]:
+        """
+        Open the file for reading.
+        If the stored encoding is one of `accept_encodings` then compressed bytes are returned as is.
+        Returns the file and the encoding of returned bytes.
+        """
+        file: AsyncFileLike
+        if self.backend.stores_content_encoding:
+            file, encoding = await self.backend.read_encoded(path, chunk_size)
+        else:
+            encoding = await self._read_marker(path)
+            file = await self.backend.read(path, chunk_size)
+            if encoding is not None:
+                magic = MAGIC_NUMBERS[encoding]
+                head = await file.read(len(magic))
+                file = _PrependedFile(head, file)
+                if head != magic:
+                    encoding = None  # written before its marker was removed
+
+        if encoding is None or encoding in accept_encodings:
+            return file, encoding
+        return DecompressingReader(file, encoding, max(chunk_size, 1024 * 64)), None
+
+    async def delete(self, path: str) -> None:
+        await self.backend.delete(path)
+        if not self.backend.stores_content_encoding:
+            await self._write_marker(path, None)
+
+    async def exists(self, path: str) -> bool:
+        return await self.backend.exists(path)
+
+    async def url(self, path: str) -> str:
+        return await self.backend.url(path)
+
+    def abspath(self, path: str) -> str:
+        return self.backend.abspath(path)
+
+    async def list(self, prefix: str = "") -> typing.AsyncIterator[FileInfo]:
+        """List stored files without encoding markers, sizes are sizes of stored (compressed) files."""
+        async for info in self.backend.list(prefix):
+            if not info.path.startswith(self.encodings_prefix):
+                yield info
+
+    async def copy(self, source: str, dest: str) -> None:
+        if self.backend.stores_content_encoding:
+            await self.backend.copy(source, dest)
+            return
+
+        encoding = await self._read_marker(source)
+        if encoding is not None:
+            await self._write_marker(dest, encoding)
+        await self.backend.copy(source, dest)
+        if encoding is None:
+            await self._write_marker(dest, None)
+
+    # resumable uploads are stored uncompressed, the parts are written at offsets of the original file
+
+    async def create_upload(
+        self, path: str, length: int | None = None, metadata: dict[str, str] | None = None
+    ) -> UploadSession:
+        return await self.backend.create_upload(path, length, metadata)
+
+    async def get_upload(self, upload_id: str) -> UploadSession:
+        return await self.backend.get_upload(upload_id)
+
+    async def append_upload(self, upload_id: str, offset: int, data: AsyncReader) -> UploadSession:
+        return await self.backend.append_upload(upload_id, offset, data)
+
+    async def complete_upload(self, upload_id: str) -> UploadSession:
+        session = await self.backend.complete_upload(upload_id)
+        if not self.backend.stores_content_encoding:
+            await self._write_marker(session.path, None)
+        return session
+
+    async def abort_upload(self, upload_id: str) -> None:
+        await self.backend.abort_upload(upload_id)
@@ -1,10 +1,23 @@
+import dataclasses
+import json
 import os
 import pathlib
+import shutil
 import typing
+import uuid
 
-import anyio.to_thread
+import anyio
 
-from async_storages.backends.base import AsyncFileLike, AsyncReader, BaseBackend
+from async_storages.backends.base import (
+    AsyncFileLike,
+    AsyncReader,
+    BaseBackend,
+    FileInfo,
+    UploadOffsetError,
+    UploadSession,
+    read_upload_part,
+    run_sync,
+)
 
 
 class FileSystemBackend(BaseBackend):
@@ -15,40 +28,167 @@ class FileSystemBackend(BaseBackend):
         base_url: str = "/",
         mkdir_permissions: int = 0o777,
         mkdir_exists_ok: bool = True,
+        uploads_dir: str | os.PathLike[typing.AnyStr] | None = None,
     ) -> None:
         self.base_url = base_url
         self.base_dir = pathlib.Path(str(base_dir))
+        # must be on the same filesystem as base_dir, completed uploads are moved into place.
+        # Its files are hidden from reads and listings, so partial uploads are never served
+        self.uploads_dir = pathlib.Path(str(uploads_dir)) if uploads_dir else self.base_dir / ".uploads"
+        self._hidden_prefix = os.path.join(os.path.abspath(self.uploads_dir), "")
         self.mkdirs = mkdirs
         self.mkdir_permissions = mkdir_permissions
         self.mkdir_exists_ok = mkdir_exists_ok
 
-    async def write(self, path: str, data: AsyncReader) -> None:
-        full_path = self.base_dir / path
-        if self.mkdirs and not await anyio.to_thread.run_sync(full_path.parent.exists):
-            await anyio.to_thread.run_sync(
+    async def _make_parents(self, full_path: pathlib.Path) -> None:
+        if self.mkdirs and not await run_sync(full_path.parent.exists):
+            await run_sync(
                 os.makedirs,
                 full_path.parent,
                 self.mkdir_permissions,
                 self.mkdir_exists_ok,
             )
 
-        async with await anyio.open_file(self.base_dir / path, mode="wb") as f:
+    async def write(self, path: str, data: AsyncReader) -> None:
+        full_path = self.base_dir / path
+        await self._make_parents(full_path)
+
+        file = await run_sync(open, full_path, "wb")
+        try:
             while chunk := await data.read(1024 * 8):
-                await f.write(chunk)
+                await run_sync(file.write, chunk)
+        finally:
+            await run_sync(file.close)
+
+    def _is_hidden(self, full_path: pathlib.Path) -> bool:
+        return os.path.join(os.path.abspath(full_path), "").startswith(self._hidden_prefix)
 
     async def read(self, path: str, chunk_size: int) -> AsyncFileLike:
+        if self._is_hidden(self.base_dir / path):
+            raise FileNotFoundError(f"File not found: {path}")
         return await anyio.open_file(self.base_dir / path, mode="rb")
 
     async def delete(self, path: str) -> None:
         full_path = self.base_dir / path
-        if await anyio.to_thread.run_sync(full_path.exists):
-            await anyio.to_thread.run_sync(os.remove, full_path)
+        if await run_sync(full_path.exists):
+            await run_sync(os.remove, full_path)
 
     async def exists(self, path: str) -> bool:
-        return await anyio.to_thread.run_sync(os.path.exists, self.base_dir / path)
+        if self._is_hidden(self.base_dir / path):
+            return False
+        return await run_sync(os.path.exists, self.base_dir / path)
 
     async def url(self, path: str) -> str:
         return os.path.join(self.base_url, path)
 
     def abspath(self, path: str) -> str:
         return str(self.base_dir / path)
+
+    async def copy(self, source: str, dest: str) -> None:
+        full_path = self.base_dir / dest
+        await self._make_parents(full_path)
+        await run_sync(shutil.copyfile, self.base_dir / source, full_path)
+
+    async def list(self, prefix: str = "") -> typing.AsyncIterator[FileInfo]:
+        def scan() -> list[FileInfo]:
+            # only walk the directory the prefix points into
+            start = self.base_dir / os.path.dirname(prefix)
+            files = []
+            for root, dirs, names in os.walk(start):
+                dirs[:] = [name for name in dirs if not self._is_hidden(pathlib.Path(root, name))]
+                for name in names:
+                    relative = pathlib.Path(root, name).relative_to(self.base_dir).as_posix()
+                    if relative.startswith(prefix):
+                        stat = os.stat(os.path.join(root, name))
+                        files.append(FileInfo(relative, stat.st_size, mtime=stat.st_mtime))
+            return sorted(files, key=lambda info: info.path)
+
+        for info in await run_sync(scan):
+            yield info
+
+    def _upload_paths(self, upload_id: str) -> tuple[pathlib.Path, pathlib.Path]:
+        if not upload_id.isalnum():
+            raise FileNotFoundError(f"Upload not found: {upload_id}")
+        return self.uploads_dir / f"{upload_id}.part", self.uploads_dir / f"{upload_id}.json"
+
+    async def _save_upload(self, session: UploadSession) -> None:
+        _, meta_path = self._upload_paths(session.id)
+        data = json.dumps(dataclasses.asdict(session))
+
+        def save() -> None:
+            temp_path = meta_path.with_suffix(".tmp")
+            temp_path.write_text(data, "utf-8")
+            os.replace(temp_path, meta_path)
+
+        await run_sync(save)
+
+    async def create_upload(
+        self, path: str, length: int | None = None, metadata: dict[str, str] | None = None
+    ) -> UploadSession:
+        session = UploadSession(id=uuid.uuid4().hex, path=path, length=length, metadata=metadata or {})
+        part_path, _ = self._upload_paths(session.id)
+
+        def create() -> None:
+            os.makedirs(self.uploads_dir, self.mkdir_permissions, exist_ok=True)
+            with open(part_path, "wb") as file:
+                if length:
+                    file.truncate(length)  # sparse file, no disk space is used until data arrives
+
+        await run_sync(create)
+        await self._save_upload(session)
+        return session
+
+    async def get_upload(self, upload_id: str) -> UploadSession:
+        _, meta_path = self._upload_paths(upload_id)
+        try:
+            return UploadSession(**json.loads(await run_sync(meta_path.read_text, "utf-8")))
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Upload not found: {upload_id}")
+
+    async def append_upload(self, upload_id: str, offset: int, data: AsyncReader) -> UploadSession:
+        session = await self.get_upload(upload_id)
+        if offset != session.offset:
+            raise UploadOffsetError(session.offset, offset)
+
+        part_path, _ = self._upload_paths(upload_id)
+        file = await run_sync(open, part_path, "r+b")
+        written = 0
+        try:
+            await run_sync(file.seek, offset)
+            async for chunk in read_upload_part(data, session):
+                await run_sync(file.write, chunk)
+                written += len(chunk)
+        finally:
+            await run_sync(file.close)
+            # bytes written before a dropped connection are kept, the client resumes after them
+            session.offset += written
+            await self._save_upload(session)
+        return session
+
+    async def complete_upload(self, upload_id: str) -> UploadSession:
+        session = await self.get_upload(upload_id)
+        if session.length is not None and session.offset != session.length:
+            raise ValueError(f"Upload is incomplete: {session.offset} of {session.length} bytes received")
+
+        part_path, meta_path = self._upload_paths(upload_id)
+        full_path = self.base_dir / session.path
+        await self._make_parents(full_path)
+
+        def finish() -> None:
+            with open(part_path, "r+b") as file:
+                file.truncate(session.offset)
+            os.replace(part_path, full_path)
+            os.remove(meta_path)
+
+        await run_sync(finish)
+        return session
+
+    async def abort_upload(self, upload_id: str) -> None:
+        part_path, meta_path = self._upload_paths(upload_id)
+
+        def remove() -> None:
+            for path in (part_path, meta_path):
+                if path.exists():
+                    os.remove(path)
+
+        await run_sync(remove)
@@ -1,40 +1,62 @@
 import tempfile
-
-import anyio.to_thread
+import time
+import typing
+import uuid
 
 from async_storages.backends.base import (
     AdaptedBytesIO,
     AsyncFileLike,
     AsyncReader,
     BaseBackend,
+    FileInfo,
+    UploadOffsetError,
+    UploadSession,
     is_rolled,
+    read_upload_part,
+    run_sync,
 )
 
 
 class MemoryBackend(BaseBackend):
+    stores_content_encoding = True
+
     def __init__(self, spool_max_size: int = 1024**2) -> None:
         self.spool_max_size = spool_max_size
         self.fs: dict[str, tempfile.SpooledTemporaryFile[bytes]] = {}
+        self.mtimes: dict[str, float] = {}
+        self.encodings: dict[str, str] = {}
+        self.upload_sessions: dict[str, tuple[UploadSession, tempfile.SpooledTemporaryFile[bytes]]] = {}
 
     async def write(self, path: str, data: AsyncReader) -> None:
         self.fs[path] = tempfile.SpooledTemporaryFile(max_size=self.spool_max_size)
         while chunk := await data.read(1024 * 16):
             if is_rolled(self.fs[path]):
-                await anyio.to_thread.run_sync(self.fs[path].write, chunk)
+                await run_sync(self.fs[path].write, chunk)
             else:
                 self.fs[path].write(chunk)
+        self.mtimes[path] = time.time()
+        self.encodings.pop(path, None)
+
+    async def write_encoded(self, path: str, data: AsyncReader, encoding: str) -> None:
+        await self.write(path, data)
+        self.encodings[path] = encoding
+
+    async def read_encoded(self, path: str, chunk_size: int) -> tuple[AsyncFileLike, str | None]:
+        return await self.read(path, chunk_size), self.encodings.get(path)
 
     async def read(self, path: str, chunk_size: int) -> AsyncFileLike:
         if path not in self.fs:
             raise FileNotFoundError(f"No such file in memory store: {path}")
         stored_file = self.fs[path]
-        await anyio.to_thread.run_sync(stored_file.seek, 0)
-        return AdaptedBytesIO(stored_file)
+        await run_sync(stored_file.seek, 0)
+        return AdaptedBytesIO(stored_file, close_on_exit=False)  # closing a reader must not drop the data
 
     async def delete(self, path: str) -> None:
         if path in self.fs:
             self.fs[path].close()
             del self.fs[path]
+            self.mtimes.pop(path, None)
+            self.encodings.pop(path, None)
 
     async def exists(self, path: str) -> bool:
         return path in self.fs
@@ -44,3 +66,59 @@ class MemoryBackend(BaseBackend):
 
     def abspath(self, path: str) -> str:
         return path
+
+    async def copy(self, source: str, dest: str) -> None:
+        if source not in self.fs:
+            raise FileNotFoundError(f"No such file in memory store: {source}")
+        if source != dest:
+            await self.write(dest, await self.read(source, 1024 * 64))
+            if encoding := self.encodings.get(source):
+                self.encodings[dest] = encoding
+
+    async def list(self, prefix: str = "") -> typing.AsyncIterator[FileInfo]:
+        for path in sorted(self.fs):
+            if path.startswith(prefix) and path in self.fs:
+                stored_file = self.fs[path]
+                size = await run_sync(stored_file.seek, 0, 2) if is_rolled(stored_file) else stored_file.seek(0, 2)
+                yield FileInfo(path, size, mtime=self.mtimes.get(path))
+
+    async def create_upload(
+        self, path: str, length: int | None = None, metadata: dict[str, str] | None = None
+    ) -> UploadSession:
+        session = UploadSession(id=uuid.uuid4().hex, path=path, length=length, metadata=metadata or {})
+        self.upload_sessions[session.id] = (session, tempfile.SpooledTemporaryFile(max_size=self.spool_max_size))
+        return session
+
+    async def get_upload(self, upload_id: str) -> UploadSession:
+        if upload_id not in self.upload_sessions:
+            raise FileNotFoundError(f"Upload not found: {upload_id}")
+        return self.upload_sessions[upload_id][0]
+
+    async def append_upload(self, upload_id: str, offset: int, data: AsyncReader) -> UploadSession:
+        session = await self.get_upload(upload_id)
+        if offset != session.offset:
+            raise UploadOffsetError(session.offset, offset)
+
+        part = self.upload_sessions[upload_id][1]
+        async for chunk in read_upload_part(data, session):
+            if is_rolled(part):
+                await run_sync(part.write, chunk)
+            else:
+                part.write(chunk)
+            session.offset += len(chunk)
+        return session
+
+    async def complete_upload(self, upload_id: str) -> UploadSession:
+        session = await self.get_upload(upload_id)
+        if session.length is not None and session.offset != session.length:
+            raise ValueError(f"Upload is incomplete: {session.offset} of {session.length} bytes received")
+
+        _, part = self.upload_sessions.pop(upload_id)
+        await self.delete(session.path)
+        self.fs[session.path] = part
+        self.mtimes[session.path] = time.time()
+        return session
+
+    async def abort_upload(self, upload_id: str) -> None:
+        if upload_id in self.upload_sessions:
+            self.upload_sessions.pop(upload_id)[1].close()
@@ -0,0 +1,332 @@
+import dataclasses
+import math
+import random
+import time
+import typing
+
+import anyio
+
+from async_storages.backends.base import AsyncFileLike, AsyncReader, BaseBackend, FileInfo, UploadSession
+
+_T = typing.TypeVar("_T")
+
+_RETRYABLE_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+# transport errors of the S3 client stack, not subclasses of builtin ConnectionError or TimeoutError
+_RETRYABLE_ERROR_CLASSES = frozenset(
+    {
+        ("botocore.exceptions", "ConnectionError"),  # EndpointConnectionError, ConnectTimeoutError
+        ("botocore.exceptions", "HTTPClientError"),  # ReadTimeoutError, ConnectionClosedError
+        ("aiohttp.client_exceptions", "ClientConnectionError"),  # ServerDisconnectedError, ClientConnectorError
+        ("aiohttp.client_exceptions", "ClientPayloadError"),  # body cut off
+    }
+)
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised without calling the backend while the circuit breaker is open."""
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Default retry predicate: timeouts, connection errors and throttling or 5xx responses."""
+    if isinstance(exc, CircuitOpenError | FileNotFoundError):
+        return False
+    if isinstance(exc, TimeoutError | ConnectionError):
+        return True
+    # botocore and aiohttp errors are checked by class name to avoid importing them
+    if any((cls.__module__, cls.__name__) in _RETRYABLE_ERROR_CLASSES for cls in type(exc).__mro__):
+        return True
+    response = getattr(exc, "response", None)
+    if isinstance(response, dict):
+        status_code = response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        return status_code in _RETRYABLE_STATUS_CODES
+    return False
+
+
+@dataclasses.dataclass
+class PolicyStats:
+    calls: int = 0
+    failures: int = 0
+    timeouts: int = 0
+    retries: int = 0
+    retries_rejected: int = 0
+    hedged: int = 0
+    hedge_wins: int = 0
+    circuit_opened: int = 0
+    circuit_rejected: int = 0
+
+
+class RetryBudget:
+    """
+    Limits retries to a fraction of regular calls so that a failing backend is not hit by a retry storm.
+    Every call deposits `ratio` tokens, every retry withdraws one token.
+    """
+
+    def __init__(self, ratio: float = 0.1, min_tokens: float = 10, max_tokens: float = 100) -> None:
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = min_tokens
+
+    def deposit(self) -> None:
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures.
+    After `reset_timeout` one trial call is let through, its outcome closes or reopens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.trial_in_flight = False
+
+    @property
+    def state(self) -> typing.Literal["closed", "open", "half-open"]:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "half-open" and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        return state == "closed"
+
+    def cancel_trial(self) -> None:
+        """The trial call ended without showing whether the backend recovered, let another call try."""
+        self.trial_in_flight = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self) -> bool:
+        """Record a failure, return True if this failure opened the circuit."""
+        self.failures += 1
+        if self.trial_in_flight or (self.opened_at is None and self.failures >= self.failure_threshold):
+            self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+            return True
+        return False
+
+
+class PolicyBackend(BaseBackend):
+    """
+    Applies timeouts, retries with exponential backoff and jitter, retry budget,
+    hedged reads and circuit breaking to another backend.
+
+    Writes are never retried because the data stream is consumed by the first attempt.
+
+    `default_timeout` applies to operations missing in `timeouts`, except streaming uploads ("write",
+    "append_upload") which have no timeout unless set in `timeouts`: their duration depends on the file size.
+    The "read" timeout covers opening the file only, reading the body is not limited.
+    """
+
+    streaming_operations = frozenset({"write", "append_upload"})
+
+    def __init__(
+        self,
+        backend: BaseBackend,
+        timeouts: typing.Mapping[str, float | None] | None = None,
+        default_timeout: float | None = 30.0,
+        max_attempts: int = 3,
+        backoff_base: float = 0.05,
+        backoff_max: float = 2.0,
+        retry_budget: RetryBudget | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
+        hedge_after: float | None = None,
+        retryable: typing.Callable[[BaseException], bool] = is_retryable,
+    ) -> None:
+        self.backend = backend
+        self.timeouts = dict(timeouts or {})
+        self.default_timeout = default_timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_budget = retry_budget or RetryBudget()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.hedge_after = hedge_after
+        self.retryable = retryable
+        self.stats: dict[str, PolicyStats] = {}
+
+    def get_stats(self, operation: str) -> PolicyStats:
+        return self.stats.setdefault(operation, PolicyStats())
+
+    def get_timeout(self, operation: str) -> float:
+        default = None if operation in self.streaming_operations else self.default_timeout
+        timeout = self.timeouts.get(operation, default)
+        return math.inf if timeout is None else timeout
+
+    def get_backoff(self, attempt: int) -> float:
+        # "full jitter": sleep a random time between zero and the exponential cap
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
+
+    async def _attempt(self, operation: str, func: typing.Callable[[], typing.Awaitable[_T]]) -> _T:
+        stats = self.get_stats(operation)
+        # only the attempt let through while half-open owns the trial
+        is_trial = self.circuit_breaker.state == "half-open"
+        if not self.circuit_breaker.allow():
+            stats.circuit_rejected += 1
+            raise CircuitOpenError(f"Circuit is open, {operation} rejected.")
+
+        try:
+            with anyio.fail_after(self.get_timeout(operation)):
+                result = await func()
+        except anyio.get_cancelled_exc_class():
+            if is_trial:
+                self.circuit_breaker.cancel_trial()
+            raise
+        except TimeoutError:
+            stats.timeouts += 1
+            stats.failures += 1
+            if self.circuit_breaker.record_failure():
+                stats.circuit_opened += 1
+            raise
+        except Exception as ex:
+            stats.failures += 1
+            if not self.retryable(ex):
+                # the request is wrong, not the backend: neither a failure nor a success of the backend
+                if is_trial:
+                    self.circuit_breaker.cancel_trial()
+            elif self.circuit_breaker.record_failure():
+                stats.circuit_opened += 1
+            raise
+        self.circuit_breaker.record_success()
+        return result
+
+    async def call(
+        self,
+        operation: str,
+        func: typing.Callable[[], typing.Awaitable[_T]],
+        idempotent: bool = True,
+        attempt_func: typing.Callable[[str, typing.Callable[[], typing.Awaitable[_T]]], typing.Awaitable[_T]]
+        | None = None,
+    ) -> _T:
+        stats = self.get_stats(operation)
+        stats.calls += 1
+        self.retry_budget.deposit()
+        attempt_func = attempt_func or self._attempt
+
+        attempt = 0
+        while True:
+            try:
+                return await attempt_func(operation, func)
+            except Exception as ex:
+                attempt += 1
+                if not idempotent or attempt >= self.max_attempts or not self.retryable(ex):
+                    raise
+                if not self.retry_budget.withdraw():
+                    stats.retries_rejected += 1
+                    raise
+                stats.retries += 1
+                await anyio.sleep(self.get_backoff(attempt))
+
+    async def _hedged_attempt(
+        self, operation: str, func: typing.Callable[[], typing.Awaitable[AsyncFileLike]]
+    ) -> AsyncFileLike:
+        """
+        One attempt of a read: a second request is sent if the first one is slower than `hedge_after`,
+        the first successful response wins.
+        """
+        assert self.hedge_after is not None
+        stats = self.get_stats(operation)
+        results: list[AsyncFileLike] = []
+        errors: dict[bool, Exception] = {}  # hedge -> error
+        finished = anyio.Event()
+        hedge_sent = False
+
+        async def runner(hedge: bool) -> None:
+            nonlocal hedge_sent
+            if hedge:
+                await anyio.sleep(typing.cast(float, self.hedge_after))
+                hedge_sent = True
+                stats.hedged += 1
+            try:
+                file = await self._attempt(operation, func)
+            except Exception as ex:
+                errors[hedge] = ex
+                # fails when all sent requests failed, a request failing before the hedge is sent
+                # is retried by `call` with a backoff
+                if len(errors) == (2 if hedge_sent else 1):
+                    finished.set()
+                return
+
+            if results:  # the other request has already won, release this file
+                await file.__aexit__(None, None, None)  # type: ignore[arg-type]
+                return
+            if hedge:
+                stats.hedge_wins += 1
+            results.append(file)
+            finished.set()
+
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(runner, False)
+            tg.start_soon(runner, True)
+            await finished.wait()
+            tg.cancel_scope.cancel()
+
+        if results:
+            return results[0]
+        raise errors.get(False) or errors[True]
+
+    async def write(self, path: str, data: AsyncReader) -> None:
+        await self.call("write", lambda: self.backend.write(path, data), idempotent=False)
+
+    async def read(self, path: str, chunk_size: int) -> AsyncFileLike:
+        attempt_func = self._hedged_attempt if self.hedge_after is not None else None
+        return await self.call("read", lambda: self.backend.read(path, chunk_size), attempt_func=attempt_func)
+
+    async def delete(self, path: str) -> None:
+        await self.call("delete", lambda: self.backend.delete(path))
+
+    async def exists(self, path: str) -> bool:
+        return await self.call("exists", lambda: self.backend.exists(path))
+
+    async def url(self, path: str) -> str:
+        return await self.call("url", lambda: self.backend.url(path))
+
+    def abspath(self, path: str) -> str:
+        return self.backend.abspath(path)
+
+    async def copy(self, source: str, dest: str) -> None:
+        await self.call("copy", lambda: self.backend.copy(source, dest))
+
+    def list(self, prefix: str = "") -> typing.AsyncIterator[FileInfo]:
+        return self.backend.list(prefix)
+
+    # creating and changing an upload is not repeated: a retry could create a second session or append twice
+
+    async def create_upload(
+        self, path: str, length: int | None = None, metadata: dict[str, str] | None = None
+    ) -> UploadSession:
+        return await self.call(
+            "create_upload", lambda: self.backend.create_upload(path, length, metadata), idempotent=False
+        )
+
+    async def get_upload(self, upload_id: str) -> UploadSession:
+        return await self.call("get_upload", lambda: self.backend.get_upload(upload_id))
+
+    async def append_upload(self, upload_id: str, offset: int, data: AsyncReader) -> UploadSession:
+        return await self.call(
+            "append_upload", lambda: self.backend.append_upload(upload_id, offset, data), idempotent=False
+        )
+
+    async def complete_upload(self, upload_id: str) -> UploadSession:
+        return await self.call("complete_upload", lambda: self.backend.complete_upload(upload_id), idempotent=False)
+
+    async def abort_upload(self, upload_id: str) -> None:
+        await self.call("abort_upload", lambda: self.backend.abort_upload(upload_id))
@@ -1,10 +1,62 @@
+import asyncio
+import contextlib
+import dataclasses
+import functools
+import importlib.util
+import json
 import mimetypes
+import types
 import typing
+import uuid
+import weakref
 
-from async_storages.backends.base import AsyncFileLike, AsyncReader, BaseBackend
+from async_storages.backends.base import (
+    AsyncFileLike,
+    AsyncReader,
+    BaseBackend,
+    FileInfo,
+    UploadOffsetError,
+    UploadSession,
+    long_lived_loops,
+    read_upload_part,
+)
+
+
+class S3File:
+    """Streams object body and keeps the client open until the body is exhausted or closed."""
+
+    def __init__(self, body: typing.Any, exit_stack: contextlib.AsyncExitStack, chunk_size: int) -> None:
+        self.body = body
+        self.exit_stack = exit_stack
+        self.chunk_size = chunk_size
+
+    async def read(self, n: int = -1) -> bytes:
+        chunk: bytes = await (self.body.read() if n < 0 else self.body.read(n))
+        if not chunk or n < 0:
+            await self.close()
+        return chunk
+
+    async def close(self) -> None:
+        self.body.close()
+        await self.exit_stack.aclose()
+
+    async def __aiter__(self) -> typing.AsyncIterator[bytes]:
+        while chunk := await self.read(self.chunk_size):
+            yield chunk
+
+    async def __aenter__(self) -> "S3File":
+        return self
+
+    async def __aexit__(self, exc_type: type[Exception], exc_val: BaseException, exc_tb: types.TracebackType) -> None:
+        await self.close()
+
+    def __getattr__(self, name: str) -> typing.Any:
+        return getattr(self.body, name)
 
 
 class S3Backend(BaseBackend):
+    stores_content_encoding = True
+
     def __init__(
         self,
         bucket: str,
@@ -14,69 +66,128 @@ class S3Backend(BaseBackend):
         profile_name: str | None = None,
         endpoint_url: str | None = None,
         signed_link_ttl: int = 3600,
+        upload_part_size: int = 1024**2 * 8,
+        upload_state_prefix: str = ".uploads/",
+        keep_client_alive: bool | None = None,
     ) -> None:
-        try:
-            import aioboto3
-        except ImportError:  # pragma: no cover
+        # aioboto3 is slow to import, check that it is installed but import it on first use
+        if importlib.util.find_spec("aioboto3") is None:  # pragma: no cover
             raise ImportError("Install aioboto3 to use s3 backend: pip install async_storages[s3]")
 
         self.bucket = bucket
         self.signed_link_ttl = signed_link_ttl
+        self.upload_part_size = max(upload_part_size, 1024**2 * 5)  # S3 minimum for all parts but the last
+        self.upload_state_prefix = upload_state_prefix
+        # None keeps clients only on long-lived loops, a loop per call (asyncio.run) would leak them
+        self.keep_client_alive = keep_client_alive
+        # one client (and its connection pool) per event loop, clients can't be shared between loops
+        self._clients: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, tuple[contextlib.AsyncExitStack, typing.Any]
+        ] = weakref.WeakKeyDictionary()
         self.endpoint_url = endpoint_url.rstrip("/") if endpoint_url else None
         self.region_name = region_name or "us-east-2"
-        self.session = aioboto3.Session(
-            region_name=region_name,
-            profile_name=profile_name,
-            aws_access_key_id=aws_access_key_id,
-            aws_secret_access_key=aws_secret_access_key,
-        )
+        self._session_options = {
+            "region_name": region_name,
+            "profile_name": profile_name,
+            "aws_access_key_id": aws_access_key_id,
+            "aws_secret_access_key": aws_secret_access_key,
+        }
+
+    @functools.cached_property
+    def session(self) -> typing.Any:
+        import aioboto3
+
+        return aioboto3.Session(**self._session_options)
+
+    async def _enter_client(self, exit_stack: contextlib.AsyncExitStack) -> typing.Any:
+        """Return a client, a client created for this call is closed with the exit stack."""
+        loop = asyncio.get_running_loop()
+        keep_alive = loop in long_lived_loops if self.keep_client_alive is None else self.keep_client_alive
+        if not keep_alive:
+            return await exit_stack.enter_async_context(self.session.client("s3", endpoint_url=self.endpoint_url))
+
+        if loop not in self._clients:
+            client_stack = contextlib.AsyncExitStack()
+            client = await client_stack.enter_async_context(self.session.client("s3", endpoint_url=self.endpoint_url))
+            if loop in self._clients:  # created by a concurrent call
+                await client_stack.aclose()
+            else:
+                self._clients[loop] = (client_stack, client)
+        return self._clients[loop][1]
+
+    @contextlib.asynccontextmanager
+    async def client(self) -> typing.AsyncIterator[typing.Any]:
+        async with contextlib.AsyncExitStack() as exit_stack:
+            yield await self._enter_client(exit_stack)
+
+    async def close(self) -> None:
+        """Close the client kept alive for the running event loop."""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client[0].aclose()
 
     async def write(self, path: str, data: AsyncReader) -> None:
+        await self._upload(path, data, {})
+
+    async def _upload(self, path: str, data: AsyncReader, extra_args: dict[str, str]) -> None:
         mime_type = mimetypes.guess_type(path)
-        async with self.session.client("s3", endpoint_url=self.endpoint_url) as client:
+        async with self.client() as client:
             await client.upload_fileobj(
                 data,
                 self.bucket,
                 path,
                 ExtraArgs={
                     "ContentType": mime_type[0],
+                    **extra_args,
                 },
             )
 
+    async def write_encoded(self, path: str, data: AsyncReader, encoding: str) -> None:
+        # presigned URLs of the object are served with Content-Encoding, clients decode the body
+        await self._upload(path, data, {"ContentEncoding": encoding})
+
     async def read(self, path: str, chunk_size: int) -> AsyncFileLike:
+        file, _ = await self.read_encoded(path, chunk_size)
+        return file
+
+    async def read_encoded(self, path: str, chunk_size: int) -> tuple[AsyncFileLike, str | None]:
         from botocore.exceptions import ClientError
 
-        async with self.session.client("s3", endpoint_url=self.endpoint_url) as client:
-            try:
-                s3_object = await client.get_object(Bucket=self.bucket, Key=path)
-            except ClientError as ex:
-                if ex.response["Error"]["Code"] == "NoSuchKey":
-                    raise FileNotFoundError("File not found: %s" % path)
-                raise  # pragma: no cover
-            else:
-                return typing.cast(AsyncFileLike, s3_object["Body"])
+        # the client must stay open while the body is being read, S3File closes it
+        exit_stack = contextlib.AsyncExitStack()
+        client = await self._enter_client(exit_stack)
+        try:
+            s3_object = await client.get_object(Bucket=self.bucket, Key=path)
+        except ClientError as ex:
+            await exit_stack.aclose()
+            if ex.response["Error"]["Code"] == "NoSuchKey":
+                raise FileNotFoundError(f"File not found: {path}")
+            raise  # pragma: no cover
+        except BaseException:  # pragma: no cover
+            await exit_stack.aclose()
+            raise
+        return S3File(s3_object["Body"], exit_stack, max(chunk_size, 1024 * 8)), s3_object.get("ContentEncoding")
 
     async def delete(self, path: str) -> None:
-        pass
-
-        async with self.session.client("s3", endpoint_url=self.endpoint_url) as client:
+        async with self.client() as client:
             await client.delete_object(Bucket=self.bucket, Key=path)
 
     async def exists(self, path: str) -> bool:
         from botocore.exceptions import ClientError
 
-        async with self.session.client("s3", endpoint_url=self.endpoint_url) as client:
+        async with self.client() as client:
             try:
-                await client.get_object(Bucket=self.bucket, Key=path)
+                await client.head_object(Bucket=self.bucket, Key=path)
             except ClientError as ex:
-                if ex.response["Error"]["Code"] == "NoSuchKey":
+                # HEAD responses have no body, missing keys are reported by the status code
+                if ex.response["Error"]["Code"] in ("404", "NoSuchKey"):
                     return False
                 raise  # pragma: no cover
             else:
                 return True
 
     async def url(self, path: str) -> str:
-        async with self.session.client("s3", endpoint_url=self.endpoint_url) as client:
+        async with self.client() as client:
             url = await client.generate_presigned_url(
                 ClientMethod="get_object",
                 Params={"Bucket": self.bucket, "Key": path},
@@ -86,3 +197,147 @@ class S3Backend(BaseBackend):
 
     def abspath(self, path: str) -> str:
         return path
+
+    def shares_account(self, other: "S3Backend") -> bool:
+        """Objects can be copied between backends of the same account without downloading them."""
+        return self.endpoint_url == other.endpoint_url and self._session_options == other._session_options
+
+    async def copy(self, source: str, dest: str, source_bucket: str | None = None) -> None:
+        from botocore.exceptions import ClientError
+
+        async with self.client() as client:
+            try:
+                # managed copy switches to multipart copy for objects larger than 5GB
+                await client.copy({"Bucket": source_bucket or self.bucket, "Key": source}, self.bucket, dest)
+            except ClientError as ex:
+                if ex.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                    raise FileNotFoundError(f"File not found: {source}")
+                raise  # pragma: no cover
+
+    async def list(self, prefix: str = "") -> typing.AsyncIterator[FileInfo]:
+        async with self.client() as client:
+            paginator = client.get_paginator("list_objects_v2")
+            async for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix):
+                for item in page.get("Contents", []):
+                    if item["Key"].startswith(self.upload_state_prefix):
+                        continue
+                    yield FileInfo(
+                        path=item["Key"],
+                        size=item["Size"],
+                        etag=item["ETag"].strip('"'),
+                        mtime=item["LastModified"].timestamp(),
+                    )
+
+    # resumable uploads use multipart uploads, parts smaller than `upload_part_size` are buffered
+    # in a "tail" object next to the session state until more data arrives
+
+    def _upload_key(self, upload_id: str, suffix: str) -> str:
+        if not upload_id.isalnum():
+            raise FileNotFoundError(f"Upload not found: {upload_id}")
+        return f"{self.upload_state_prefix}{upload_id}{suffix}"
+
+    async def _load_upload(self, client: typing.Any, upload_id: str) -> tuple[UploadSession, dict[str, typing.Any]]:
+        from botocore.exceptions import ClientError
+
+        try:
+            response = await client.get_object(Bucket=self.bucket, Key=self._upload_key(upload_id, ".json"))
+            state = json.loads(await response["Body"].read())
+        except ClientError as ex:
+            if ex.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                raise FileNotFoundError(f"Upload not found: {upload_id}")
+            raise  # pragma: no cover
+        return UploadSession(**state.pop("session")), state
+
+    async def _save_upload(self, client: typing.Any, session: UploadSession, state: dict[str, typing.Any]) -> None:
+        body = json.dumps({"session": dataclasses.asdict(session), **state}).encode("utf-8")
+        await client.put_object(Bucket=self.bucket, Key=self._upload_key(session.id, ".json"), Body=body)
+
+    async def create_upload(
+        self, path: str, length: int | None = None, metadata: dict[str, str] | None = None
+    ) -> UploadSession:
+        session = UploadSession(id=uuid.uuid4().hex, path=path, length=length, metadata=metadata or {})
+        mime_type, _ = mimetypes.guess_type(path)
+        async with self.client() as client:
+            response = await client.create_multipart_upload(
+                Bucket=self.bucket, Key=path, **({"ContentType": mime_type} if mime_type else {})
+            )
+            await self._save_upload(client, session, {"upload_id": response["UploadId"], "parts": [], "tail": 0})
+        return session
+
+    async def get_upload(self, upload_id: str) -> UploadSession:
+        async with self.client() as client:
+            session, _ = await self._load_upload(client, upload_id)
+        return session
+
+    async def _upload_part(
+        self, client: typing.Any, session: UploadSession, state: dict[str, typing.Any], body: bytes
+    ) -> None:
+        number = len(state["parts"]) + 1
+        response = await client.upload_part(
+            Bucket=self.bucket, Key=session.path, UploadId=state["upload_id"], PartNumber=number, Body=body
+        )
+        state["parts"].append({"PartNumber": number, "ETag": response["ETag"]})
+
+    async def append_upload(self, upload_id: str, offset: int, data: AsyncReader) -> UploadSession:
+        async with self.client() as client:
+            session, state = await self._load_upload(client, upload_id)
+            if offset != session.offset:
+                raise UploadOffsetError(session.offset, offset)
+
+            buffer = bytearray()
+            if state["tail"]:
+                response = await client.get_object(Bucket=self.bucket, Key=self._upload_key(upload_id, ".tail"))
+                buffer += await response["Body"].read()
+
+            received = 0
+            try:
+                async for chunk in read_upload_part(data, session):
+                    buffer += chunk
+                    received += len(chunk)
+                    while len(buffer) >= self.upload_part_size:
+                        await self._upload_part(client, session, state, bytes(buffer[: self.upload_part_size]))
+                        del buffer[: self.upload_part_size]
+            finally:
+                # bytes received before a dropped connection are kept, the client resumes after them
+                await client.put_object(
+                    Bucket=self.bucket, Key=self._upload_key(upload_id, ".tail"), Body=bytes(buffer)
+                )
+                state["tail"] = len(buffer)
+                session.offset += received
+                await self._save_upload(client, session, state)
+        return session
+
+    async def complete_upload(self, upload_id: str) -> UploadSession:
+        async with self.client() as client:
+            session, state = await self._load_upload(client, upload_id)
+            if session.length is not None and session.offset != session.length:
+                raise ValueError(f"Upload is incomplete: {session.offset} of {session.length} bytes received")
+
+            if state["tail"] or not state["parts"]:
+                tail = b""
+                if state["tail"]:
+                    response = await client.get_object(Bucket=self.bucket, Key=self._upload_key(upload_id, ".tail"))
+                    tail = await response["Body"].read()
+                await self._upload_part(client, session, state, tail)
+
+            await client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=session.path,
+                UploadId=state["upload_id"],
+                MultipartUpload={"Parts": state["parts"]},
+            )
+            await self._delete_upload_state(client, upload_id)
+        return session
+
+    async def _delete_upload_state(self, client: typing.Any, upload_id: str) -> None:
+        for suffix in (".json", ".tail"):
+            await client.delete_object(Bucket=self.bucket, Key=self._upload_key(upload_id, suffix))
+
+    async def abort_upload(self, upload_id: str) -> None:
+        async with self.client() as client:
+            try:
+                session, state = await self._load_upload(client, upload_id)
+            except FileNotFoundError:
+                return
+            await client.abort_multipart_upload(Bucket=self.bucket, Key=session.path, UploadId=state["upload_id"])
+            await self._delete_upload_state(client, upload_id)
@@ -0,0 +1,263 @@
+import io
+import os
+import types
+import typing
+import uuid
+
+import anyio
+import anyio.abc
+
+from async_storages.backends.base import (
+    AdaptedBytesIO,
+    AsyncFileLike,
+    AsyncReader,
+    BaseBackend,
+    FileInfo,
+    UploadSession,
+    run_sync,
+)
+from async_storages.backends.fs import FileSystemBackend
+
+
+class WriteBehindBackend(BaseBackend):
+    """
+    Acknowledges writes once data is staged on the local disk and uploads it to the remote backend in background.
+
+    Repeated writes to the same path while it waits in the queue are coalesced into one upload.
+    Reads of not yet uploaded files are served from the staging directory.
+    Staged files survive restarts, they are queued again when the backend starts.
+
+    The backend must be started before use:
+
+        async with WriteBehindBackend(S3Backend(...), FileSystemBackend("/var/spool/uploads", mkdirs=True)) as backend:
+            ...
+    """
+
+    def __init__(
+        self,
+        remote: BaseBackend,
+        staging: FileSystemBackend,
+        workers: int = 4,
+        max_queue_size: int = 1000,
+        max_retries: int = 3,
+        retry_delay: float = 1.0,
+        drain_timeout: float | None = None,
+    ) -> None:
+        self.remote = remote
+        self.staging = staging
+        self.workers = workers
+        self.max_queue_size = max_queue_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.drain_timeout = drain_timeout
+        self.pending: dict[str, str] = {}  # remote path -> staging key of the latest version
+        self.failed: dict[str, Exception] = {}
+        self.uploads = 0
+        self._uploading: dict[str, str] = {}
+        self._queued: set[str] = set()
+        self._deleted_while_uploading: set[str] = set()
+        self._changed = anyio.Event()
+        self._send_stream, self._receive_stream = anyio.create_memory_object_stream[str](max_queue_size)
+        self._task_group: anyio.abc.TaskGroup | None = None
+
+    async def __aenter__(self) -> "WriteBehindBackend":
+        self._task_group = anyio.create_task_group()
+        await self._task_group.__aenter__()
+        for _ in range(self.workers):
+            self._task_group.start_soon(self._worker, self._receive_stream.clone())
+        self._receive_stream.close()  # workers own their clones
+        await self.recover()
+        return self
+
+    async def __aexit__(self, exc_type: type[Exception], exc_val: BaseException, exc_tb: types.TracebackType) -> None:
+        assert self._task_group is not None
+        try:
+            with anyio.move_on_after(self.drain_timeout):
+                await self.drain()
+        finally:
+            # unfinished uploads stay staged and will be picked up on the next start
+            self._send_stream.close()
+            if self.drain_timeout is not None:
+                self._task_group.cancel_scope.cancel()
+            await self._task_group.__aexit__(exc_type, exc_val, exc_tb)
+            self._task_group = None
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = anyio.Event()
+
+    async def drain(self) -> None:
+        """Wait until all queued uploads finish."""
+        while self._queued or self._uploading:
+            await self._changed.wait()
+
+    async def recover(self) -> None:
+        """Queue files staged by a previous process."""
+
+        def scan() -> list[tuple[str, str]]:
+            if not self.staging.base_dir.exists():
+                return []
+            markers = sorted(self.staging.base_dir.glob("*.path"), key=os.path.getmtime)
+            return [(marker.read_text("utf-8"), marker.stem) for marker in markers]
+
+        for path, key in await run_sync(scan):
+            if previous := self.pending.get(path):
+                await self._discard(previous)
+            self.pending[path] = key
+            if path not in self._queued:
+                self._queued.add(path)
+                await self._send_stream.send(path)
+
+    async def _discard(self, key: str) -> None:
+        await self.staging.delete(f"{key}.path")
+        await self.staging.delete(f"{key}.data")
+
+    async def _fsync(self, name: str, directory: bool = False) -> None:
+        """Flush a staged file, and optionally entries of the staging directory, to the disk."""
+
+        def sync(path: str, flags: int) -> None:
+            fd = os.open(path, flags)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+        await run_sync(sync, self.staging.abspath(name), os.O_RDONLY)
+        # directories can't be opened on Windows
+        if directory and hasattr(os, "O_DIRECTORY"):  # pragma: no branch
+            await run_sync(sync, str(self.staging.base_dir), os.O_RDONLY | os.O_DIRECTORY)
+
+    async def _worker(self, receive_stream: anyio.abc.ObjectReceiveStream[str]) -> None:
+        async with receive_stream:
+            async for path in receive_stream:
+                self._queued.discard(path)
+                while path in self._uploading:  # uploads of the same path must not overlap
+                    await self._changed.wait()
+                if key := self.pending.get(path):
+                    await self._upload(path, key)
+                self._notify()
+
+    async def _upload(self, path: str, key: str) -> None:
+        self._uploading[path] = key
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    file = await self.staging.read(f"{key}.data", 1024 * 64)
+                    async with file:
+                        await self.remote.write(path, file)
+                except Exception as ex:
+                    if attempt == self.max_retries:
+                        self.failed[path] = ex  # keep the staged file, it will be retried on restart
+                        return
+                    await anyio.sleep(self.retry_delay * 2**attempt)
+                else:
+                    self.uploads += 1
+                    self.failed.pop(path, None)
+                    break
+        finally:
+            del self._uploading[path]
+
+        # errors must not escape, they would stop all workers
+        if path in self._deleted_while_uploading:
+            self._deleted_while_uploading.discard(path)
+            try:
+                await self.remote.delete(path)
+            except Exception as ex:
+                self.failed[path] = ex
+        if self.pending.get(path) == key:
+            del self.pending[path]
+        if key not in self.pending.values():
+            try:
+                await self._discard(key)
+            except OSError:
+                pass  # left staged, it is uploaded again on the next start
+
+    async def write(self, path: str, data: AsyncReader) -> None:
+        key = uuid.uuid4().hex
+        await self.staging.write(f"{key}.data", data)
+        await self._fsync(f"{key}.data")
+        # the marker is written last, only complete files are recovered after a crash
+        await self.staging.write(f"{key}.path", AdaptedBytesIO(io.BytesIO(path.encode("utf-8"))))
+        # the write is acknowledged once it survives a crash
+        await self._fsync(f"{key}.path", directory=True)
+
+        previous = self.pending.get(path)
+        self.pending[path] = key
+        self._deleted_while_uploading.discard(path)
+        if previous and self._uploading.get(path) != previous:
+            await self._discard(previous)
+
+        if path not in self._queued:
+            self._queued.add(path)
+            await self._send_stream.send(path)
+
+    async def read(self, path: str, chunk_size: int) -> AsyncFileLike:
+        if key := self.pending.get(path):
+            return await self.staging.read(f"{key}.data", chunk_size)
+        return await self.remote.read(path, chunk_size)
+
+    async def delete(self, path: str) -> None:
+        if (key := self.pending.pop(path, None)) and self._uploading.get(path) != key:
+            await self._discard(key)
+        if path in self._uploading:
+            self._deleted_while_uploading.add(path)
+        self.failed.pop(path, None)
+        await self.remote.delete(path)
+
+    async def exists(self, path: str) -> bool:
+        return path in self.pending or await self.remote.exists(path)
+
+    async def url(self, path: str) -> str:
+        return await self.remote.url(path)
+
+    def abspath(self, path: str) -> str:
+        return self.remote.abspath(path)
+
+    async def list(self, prefix: str = "") -> typing.AsyncIterator[FileInfo]:
+        """List remote files merged with staged ones, a staged version replaces the remote file."""
+
+        def stat_staged() -> list[FileInfo]:
+            files = []
+            for path, key in self.pending.items():
+                if path.startswith(prefix):
+                    try:
+                        stat = os.stat(self.staging.abspath(f"{key}.data"))
+                    except FileNotFoundError:  # uploaded and discarded meanwhile
+                        continue
+                    files.append(FileInfo(path, stat.st_size, mtime=stat.st_mtime))
+            return sorted(files, key=lambda info: info.path, reverse=True)
+
+        staged = await run_sync(stat_staged)
+        staged_paths = {info.path for info in staged}
+        async for info in self.remote.list(prefix):
+            while staged and staged[-1].path < info.path:
+                yield staged.pop()
+            if info.path not in staged_paths:
+                yield info
+        while staged:
+            yield staged.pop()
+
+    # resumable uploads are already durable on the remote backend, they are not staged
+
+    async def create_upload(
+        self, path: str, length: int | None = None, metadata: dict[str, str] | None = None
+    ) -> UploadSession:
+        return await self.remote.create_upload(path, length, metadata)
+
+    async def get_upload(self, upload_id: str) -> UploadSession:
+        return await self.remote.get_upload(upload_id)
+
+    async def append_upload(self, upload_id: str, offset: int, data: AsyncReader) -> UploadSession:
+        return await self.remote.append_upload(upload_id, offset, data)
+
+    async def complete_upload(self, upload_id: str) -> UploadSession:
+        session = await self.remote.get_upload(upload_id)
+        # an older staged write must not overwrite the completed upload
+        if (key := self.pending.pop(session.path, None)) and self._uploading.get(session.path) != key:
+            await self._discard(key)
+        while session.path in self._uploading:
+            await self._changed.wait()
+        return await self.remote.complete_upload(upload_id)
+
+    async def abort_upload(self, upload_id: str) -> None:
+        await self.remote.abort_upload(upload_id)
@@ -0,0 +1,126 @@
+import collections
+import hashlib
+import math
+import time
+import typing
+
+
+class BloomFilter:
+    """
+    A set-like structure answering "definitely not present" or "maybe present".
+    Items can be added but not removed.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01) -> None:
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> typing.Iterator[int]:
+        # double hashing: k positions from two independent 64 bit hashes
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        for index in range(self.hash_count):
+            yield (first + index * second) % self.size
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: object) -> bool:
+        if not isinstance(item, str):
+            return False
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class ExistenceCache:
+    """
+    Bounded LRU cache of `exists` answers with separate lifetimes for positive and negative entries.
+
+    When a Bloom filter built from a complete listing is loaded,
+    paths missing from the filter are reported as absent without asking the backend.
+    The filter only knows about files written through this process, rebuild it periodically
+    if other processes write to the same storage.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 10_000,
+        positive_ttl: float = 60.0,
+        negative_ttl: float = 5.0,
+    ) -> None:
+        self.max_size = max_size
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.bloom: BloomFilter | None = None
+        self._written_while_loading: list[str] | None = None
+        self.entries: collections.OrderedDict[str, tuple[bool, float]] = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.bloom_hits = 0
+
+    def get(self, path: str) -> bool | None:
+        if path in self.entries:
+            exists, expires_at = self.entries[path]
+            if expires_at > time.monotonic():
+                self.entries.move_to_end(path)
+                self.hits += 1
+                return exists
+            del self.entries[path]
+
+        if self.bloom is not None and path not in self.bloom:
+            self.bloom_hits += 1
+            return False
+
+        self.misses += 1
+        return None
+
+    def set(self, path: str, exists: bool) -> None:
+        ttl = self.positive_ttl if exists else self.negative_ttl
+        if ttl <= 0:
+            self.entries.pop(path, None)
+            return
+
+        self.entries[path] = (exists, time.monotonic() + ttl)
+        self.entries.move_to_end(path)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, path: str) -> None:
+        self.entries.pop(path, None)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def mark_written(self, path: str) -> None:
+        if self.bloom is not None:
+            self.bloom.add(path)
+        if self._written_while_loading is not None:
+            self._written_while_loading.append(path)
+        self.set(path, True)
+
+    def mark_deleted(self, path: str) -> None:
+        self.set(path, False)
+
+    async def load_bloom(
+        self,
+        paths: typing.Iterable[str] | typing.AsyncIterable[str],
+        capacity: int = 1_000_000,
+        error_rate: float = 0.01,
+    ) -> None:
+        """Build a Bloom filter from a complete listing of stored paths."""
+        bloom = BloomFilter(capacity, error_rate)
+        self._written_while_loading = []
+        try:
+            if isinstance(paths, typing.AsyncIterable):
+                async for path in paths:
+                    bloom.add(path)
+            else:
+                for path in paths:
+                    bloom.add(path)
+            for path in self._written_while_loading:
+                bloom.add(path)
+        finally:
+            self._written_while_loading = None
+        self.bloom = bloom
@@ -0,0 +1,118 @@
+import importlib.util
+import io
+import typing
+
+import anyio
+from anyio import to_process
+
+from async_storages.backends.base import run_sync
+from async_storages.file_storage import FileStorage
+
+
+def resize_image(data: bytes, width: int | None, height: int | None, quality: int) -> bytes:
+    """Fit the image into width x height keeping aspect ratio, images are never upscaled."""
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        source = Image.open(io.BytesIO(data))
+        image_format = source.format or "PNG"
+        image = ImageOps.exif_transpose(source)
+        image.load()  # decode here, truncated data fails only when pixels are read
+    except UnidentifiedImageError as ex:
+        raise ValueError("File is not an image") from ex
+    except Image.DecompressionBombError as ex:
+        raise ValueError("Image is too large") from ex
+    except OSError as ex:
+        raise ValueError("Image is damaged") from ex
+
+    image.thumbnail((width or image.width, height or image.height))
+    if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    output = io.BytesIO()
+    image.save(output, format=image_format, quality=quality, optimize=True)
+    return output.getvalue()
+
+
+# widths and heights which can be requested by default, every allowed size costs CPU and storage per image
+DEFAULT_SIZES = (160, 320, 640, 1280, 1920)
+
+
+class ImageDerivatives:
+    """
+    Resized variants of stored images, generated on first request and stored under `prefix`.
+
+    Only widths and heights listed in `sizes` are generated: sizes come from anonymous requests,
+    arbitrary ones would let anyone fill the storage with variants.
+    Resizing runs in a process pool (or worker threads with `use_processes=False`), never on the event loop.
+    Concurrent requests for the same variant wait for one generation.
+    """
+
+    def __init__(
+        self,
+        storage: FileStorage,
+        prefix: str = "_derivatives",
+        sizes: typing.Collection[int] = DEFAULT_SIZES,
+        max_size: int = 4096,
+        quality: int = 85,
+        use_processes: bool = True,
+    ) -> None:
+        if importlib.util.find_spec("PIL") is None:  # pragma: no cover
+            raise ImportError("Install Pillow to generate image derivatives: pip install async_storages[images]")
+
+        self.storage = storage
+        self.prefix = prefix.strip("/")
+        self.sizes = frozenset(sizes)
+        self.max_size = max_size
+        self.quality = quality
+        self.use_processes = use_processes
+        self.generated = 0
+        self._in_flight: dict[str, anyio.Event] = {}
+
+    def variant_path(self, path: str, width: int | None, height: int | None) -> str:
+        return f"{self.prefix}/{width or 0}x{height or 0}/{path}"
+
+    def validate(self, width: int | None, height: int | None) -> None:
+        if width is None and height is None:
+            raise ValueError("Width or height is required")
+        for size in (width, height):
+            if size is None:
+                continue
+            if size not in self.sizes:
+                raise ValueError(f"Size {size} is not allowed")
+            if not 0 < size <= self.max_size:
+                raise ValueError(f"Size must be between 1 and {self.max_size}")
+
+    async def resize(self, data: bytes, width: int | None, height: int | None) -> bytes:
+        if self.use_processes:
+            return await to_process.run_sync(resize_image, data, width, height, self.quality)
+        return await run_sync(resize_image, data, width, height, self.quality)
+
+    async def get(self, path: str, width: int | None = None, height: int | None = None) -> str:
+        """Return the path of the variant, generate it if it does not exist yet."""
+        self.validate(width, height)
+        variant_path = self.variant_path(path, width, height)
+        while True:
+            if await self.storage.exists(variant_path):
+                return variant_path
+            if variant_path not in self._in_flight:
+                break
+            await self._in_flight[variant_path].wait()  # generated by a concurrent request, or it failed
+
+        self._in_flight[variant_path] = anyio.Event()
+        try:
+            file = await self.storage.open(path)
+            async with file:
+                data = await file.read()
+            await self.storage.write(variant_path, await self.resize(data, width, height))
+            self.generated += 1
+        finally:
+            self._in_flight.pop(variant_path).set()
+        return variant_path
+
+    async def delete_variants(self, path: str) -> None:
+        """Remove generated variants, call it when the original image changes."""
+        variants = [info.path async for info in self.storage.list(self.prefix + "/")]
+        for variant_path in variants:
+            if variant_path[len(self.prefix) + 1 :].split("/", 1)[-1] == path:
+                await self.storage.delete(variant_path)
@@ -1,8 +1,14 @@
+import base64
+import binascii
+import contextlib
 import mimetypes
 import os
+import re
+import sys
 import typing
-from urllib.parse import quote
+from urllib.parse import parse_qs, quote
 
+from starlette.requests import Request
 from starlette.responses import (
     FileResponse,
     PlainTextResponse,
@@ -12,23 +18,66 @@ from starlette.responses import (
 )
 from starlette.types import Receive, Scope, Send
 
-from async_storages import FileStorage, MemoryBackend
+from async_storages.backends.base import AsyncFileLike, UploadOffsetError, UploadSession, UploadSizeError
+from async_storages.file_storage import FileStorage
+from async_storages.helpers import generate_file_path
+from async_storages.usage import QuotaExceededError
+
+if typing.TYPE_CHECKING:  # pragma: no cover
+    from async_storages.archive import ArchiveFormat
+    from async_storages.backends.compressed import CompressedBackend
+    from async_storages.backends.write_behind import WriteBehindBackend
+    from async_storages.contrib.images import ImageDerivatives
 
 
 # add uploader
 # add file name generator
 
 
+def is_backend(backend: object, module_name: str, class_name: str) -> bool:
+    # an instance of the class cannot exist unless its module was imported,
+    # so don't import backend modules only to run isinstance checks
+    module = sys.modules.get(module_name)
+    return module is not None and isinstance(backend, getattr(module, class_name))
+
+
+def get_accepted_encodings(scope: Scope) -> set[str]:
+    for name, value in scope["headers"]:
+        if name == b"accept-encoding":
+            encodings = set()
+            for item in value.decode("latin-1").split(","):
+                encoding, _, params = item.strip().partition(";")
+                if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+                    encodings.add(encoding.strip().lower())
+            return encodings
+    return set()
+
+
 class FileServer:
     def __init__(
         self,
         storage: FileStorage,
         as_attachment: bool = True,
         redirect_status: int = 301,
+        derivatives: "ImageDerivatives | None" = None,
     ) -> None:
         self.storage = storage
         self.redirect_status = redirect_status
         self.as_attachment = as_attachment
+        self.derivatives = derivatives
+
+    async def get_derivative_path(self, path: str, scope: Scope) -> str:
+        """Return path of the resized image if the query asks for one (?w=320&h=240)."""
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        if self.derivatives is None or not ("w" in query or "h" in query):
+            return path
+
+        try:
+            width = int(query["w"][0]) if "w" in query else None
+            height = int(query["h"][0]) if "h" in query else None
+        except ValueError:
+            raise ValueError("Invalid image size")
+        return await self.derivatives.get(path, width, height)
 
     async def get_response(self, path: str, scope: Scope) -> Response:
         if scope["method"] not in ("GET", "HEAD"):
@@ -41,6 +90,34 @@ class FileServer:
             return PlainTextResponse("Forbidden", status_code=403)
 
         path = path.removeprefix("/")  # strip leading slash if any
+        try:
+            path = await self.get_derivative_path(path, scope)
+        except FileNotFoundError:
+            return PlainTextResponse("File not found", status_code=404)
+        except ValueError as ex:
+            return PlainTextResponse(str(ex), status_code=400)
+
+        mime_type, _ = mimetypes.guess_type(path)
+        disposition = "attachment" if self.as_attachment else "inline"
+        if is_backend(self.storage.storage, "async_storages.backends.compressed", "CompressedBackend"):
+            # serve precompressed bytes if client understands the encoding, avoid decompress-recompress.
+            # Not redirected, clients not accepting the encoding would get compressed bytes from the URL
+            backend = typing.cast("CompressedBackend", self.storage.storage)
+            try:
+                reader, encoding = await backend.read_encoded(path, 1024 * 64, get_accepted_encodings(scope))
+            except FileNotFoundError:
+                return PlainTextResponse("File not found", status_code=404)
+            headers = {"vary": "accept-encoding"}
+            if encoding:
+                headers["content-encoding"] = encoding
+            return self.stream_response(reader, path, mime_type, disposition, headers)
+
+        if is_backend(self.storage.storage, "async_storages.backends.write_behind", "WriteBehindBackend") and (
+            path in typing.cast("WriteBehindBackend", self.storage.storage).pending
+        ):
+            # not uploaded yet, the remote URL would answer 404: serve it from the staging directory
+            reader = await self.storage.open(path)
+            return self.stream_response(reader, path, mime_type, disposition)
 
         # in case of s3-like storages - they should return URL to the file
         # we will redirect to that destination
@@ -51,25 +128,9 @@ class FileServer:
         if not await self.storage.exists(path):
             return PlainTextResponse("File not found", status_code=404)
 
-        mime_type, _ = mimetypes.guess_type(path)
-        disposition = "attachment" if self.as_attachment else "inline"
-        if isinstance(self.storage.storage, MemoryBackend):
-            reader = await self.storage.storage.read(path, 1024 * 8)
-
-            async def streamer() -> typing.AsyncIterable[bytes]:
-                while chunk := await reader.read(1024 * 64):
-                    yield chunk
-
-            return StreamingResponse(
-                streamer(),
-                status_code=200,
-                headers={
-                    "content-disposition": '{disposition}; filename="{filename}"'.format(
-                        disposition=disposition, filename=quote(os.path.basename(path))
-                    )
-                },
-                media_type=mime_type,
-            )
+        if is_backend(self.storage.storage, "async_storages.backends.memory", "MemoryBackend"):
+            reader = await self.storage.open(path)
+            return self.stream_response(reader, path, mime_type, disposition)
 
         # only for LocalStorage
         path = self.storage.abspath(path)
@@ -81,6 +142,43 @@ class FileServer:
             content_disposition_type=disposition,
         )
 
+    def stream_response(
+        self,
+        reader: AsyncFileLike,
+        path: str,
+        mime_type: str | None,
+        disposition: str,
+        headers: dict[str, str] | None = None,
+    ) -> Response:
+        async def streamer() -> typing.AsyncIterable[bytes]:
+            while chunk := await reader.read(1024 * 64):
+                yield chunk
+
+        return StreamingResponse(
+            streamer(),
+            status_code=200,
+            headers={
+                "content-disposition": f'{disposition}; filename="{quote(os.path.basename(path))}"',
+                **(headers or {}),
+            },
+            media_type=mime_type,
+        )
+
+    def archive_response(
+        self,
+        paths: typing.Iterable[str] | typing.Mapping[str, str],
+        filename: str = "archive.zip",
+        format: "ArchiveFormat" = "zip",
+        concurrency: int = 4,
+    ) -> Response:
+        """Stream stored files to the client as one archive, entries are generated while the response is sent."""
+        return ArchiveResponse(
+            self.storage.archive(paths, format, concurrency),
+            status_code=200,
+            headers={"content-disposition": f'attachment; filename="{quote(filename)}"'},
+            media_type="application/zip" if format == "zip" else "application/x-tar",
+        )
+
     def get_path(self, scope: Scope) -> str:
         file_path = scope["path"].replace(scope["root_path"], "").strip("/")
         return typing.cast(str, os.path.normpath(os.path.join(*file_path.split("/"))))
@@ -90,3 +188,169 @@ class FileServer:
         path = self.get_path(scope)
         response = await self.get_response(path, scope)
         await response(scope, receive, send)
+
+
+class ArchiveResponse(StreamingResponse):
+    """Streams an archive, its background downloads are cancelled when the client disconnects."""
+
+    def __init__(
+        self,
+        archive: contextlib.AbstractAsyncContextManager[typing.AsyncIterator[bytes]],
+        status_code: int = 200,
+        headers: typing.Mapping[str, str] | None = None,
+        media_type: str | None = None,
+    ) -> None:
+        super().__init__((), status_code=status_code, headers=headers, media_type=media_type)
+        self.archive = archive
+
+    async def stream_response(self, send: Send) -> None:
+        async with self.archive as chunks:
+            self.body_iterator = chunks
+            await super().stream_response(send)
+
+
+class RequestReader:
+    """Reads request body as a file."""
+
+    def __init__(self, request: Request) -> None:
+        self.stream = request.stream()
+        self.buffer = bytearray()
+        self.eof = False
+
+    async def read(self, n: int = -1) -> bytes:
+        while not self.eof and (n < 0 or len(self.buffer) < n):
+            try:
+                self.buffer += await self.stream.__anext__()
+            except StopAsyncIteration:
+                self.eof = True
+
+        size = len(self.buffer) if n < 0 else min(n, len(self.buffer))
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+
+def parse_upload_metadata(header: str) -> dict[str, str]:
+    metadata = {}
+    for pair in header.split(","):
+        key, _, value = pair.strip().partition(" ")
+        if key:
+            metadata[key] = base64.b64decode(value, validate=True).decode("utf-8") if value else ""
+    return metadata
+
+
+class TusEndpoint:
+    """
+    Resumable uploads via the tus 1.0.0 protocol (core, creation and termination extensions).
+
+    Mount it at an upload collection URL, clients create an upload with POST and send data with PATCH:
+
+        Mount("/uploads", TusEndpoint(storage, destination="uploads/{date}/{uuid}/{file_name}"))
+
+    `destination` is a path template (see `generate_file_path`), the file name comes from "filename" metadata.
+    """
+
+    version = "1.0.0"
+    extensions = "creation,termination"
+    upload_id_pattern = re.compile(r"^[0-9a-f]{32}$")
+
+    def __init__(
+        self,
+        storage: FileStorage,
+        destination: str = "{uuid}/{file_name}",
+        max_size: int | None = None,
+        on_complete: typing.Callable[[UploadSession], typing.Awaitable[None]] | None = None,
+    ) -> None:
+        self.storage = storage
+        self.destination = destination
+        self.max_size = max_size
+        self.on_complete = on_complete
+
+    def response(self, status_code: int, headers: dict[str, str] | None = None, content: str = "") -> Response:
+        return Response(content, status_code=status_code, headers={"tus-resumable": self.version, **(headers or {})})
+
+    async def get_response(self, request: Request) -> Response:
+        upload_id = request.scope["path"].replace(request.scope["root_path"], "").strip("/")
+        if request.method == "OPTIONS":
+            headers = {"tus-version": self.version, "tus-extension": self.extensions}
+            if self.max_size is not None:
+                headers["tus-max-size"] = str(self.max_size)
+            return self.response(204, headers)
+
+        if request.headers.get("tus-resumable") != self.version:
+            return self.response(412, {"tus-version": self.version}, "Unsupported tus version")
+
+        if request.method == "POST" and not upload_id:
+            return await self.create(request)
+        if not self.upload_id_pattern.match(upload_id):
+            return self.response(404, content="Upload not found")
+
+        try:
+            if request.method == "HEAD":
+                session = await self.storage.get_upload(upload_id)
+                headers = {"upload-offset": str(session.offset), "cache-control": "no-store"}
+                if session.length is not None:
+                    headers["upload-length"] = str(session.length)
+                return self.response(200, headers)
+            if request.method == "PATCH":
+                return await self.append(request, upload_id)
+            if request.method == "DELETE":
+                await self.storage.abort_upload(upload_id)
+                return self.response(204)
+        except FileNotFoundError:
+            return self.response(404, content="Upload not found")
+        return self.response(405, content="Method Not Allowed")
+
+    async def create(self, request: Request) -> Response:
+        try:
+            length = int(request.headers["upload-length"])
+            metadata = parse_upload_metadata(request.headers.get("upload-metadata", ""))
+        except (KeyError, ValueError, binascii.Error):
+            return self.response(400, content="Invalid Upload-Length or Upload-Metadata")
+        if length < 0:
+            return self.response(400, content="Invalid Upload-Length")
+        if self.max_size is not None and length > self.max_size:
+            return self.response(413, content="Upload is too large")
+
+        path = generate_file_path(metadata.get("filename") or "upload", self.destination)
+        try:
+            session = await self.storage.create_upload(path, length, metadata)
+            if length == 0:
+                await self.complete(session.id)
+        except QuotaExceededError:
+            return self.response(413, content="Storage quota is exceeded")
+        return self.response(201, {"location": str(request.url.replace(query="")).rstrip("/") + "/" + session.id})
+
+    async def append(self, request: Request, upload_id: str) -> Response:
+        if request.headers.get("content-type") != "application/offset+octet-stream":
+            return self.response(415, content="Content-Type must be application/offset+octet-stream")
+        try:
+            offset = int(request.headers["upload-offset"])
+        except (KeyError, ValueError):
+            return self.response(400, content="Invalid Upload-Offset")
+
+        try:
+            session = await self.storage.append_upload(upload_id, offset, RequestReader(request))
+        except UploadOffsetError:
+            return self.response(409, content="Upload-Offset does not match")
+        except UploadSizeError:
+            return self.response(413, content="Upload exceeds Upload-Length")
+        except ValueError as ex:
+            return self.response(400, content=str(ex))
+
+        if session.is_complete:
+            try:
+                await self.complete(upload_id)
+            except QuotaExceededError:
+                return self.response(413, content="Storage quota is exceeded")
+        return self.response(204, {"upload-offset": str(session.offset)})
+
+    async def complete(self, upload_id: str) -> None:
+        session = await self.storage.complete_upload(upload_id)
+        if self.on_complete:
+            await self.on_complete(session)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        assert scope["type"] == "http"
+        response = await self.get_response(Request(scope, receive))
+        await response(scope, receive, send)
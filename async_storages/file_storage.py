@@ -1,47 +1,239 @@
+import contextlib
 import inspect
 import io
 import os
 import typing
 
+import anyio
+
 from async_storages.backends.base import (
     AdaptedBytesIO,
     AsyncFileLike,
     AsyncReader,
     BaseBackend,
+    FileInfo,
+    UploadSession,
 )
 
+if typing.TYPE_CHECKING:  # pragma: no cover
+    from async_storages.archive import ArchiveFormat
+    from async_storages.cache import ExistenceCache
+    from async_storages.instrumentation import Hook, Instrumentation
+    from async_storages.pipeline import Stage
+    from async_storages.usage import UsageIndex
+
+
+def _to_reader(data: bytes | AsyncReader | typing.BinaryIO) -> AsyncReader:
+    if isinstance(data, bytes):
+        data = io.BytesIO(data)
+
+    if not inspect.iscoroutinefunction(data.read):
+        return AdaptedBytesIO(typing.cast(typing.BinaryIO, data))
+    return typing.cast(AsyncReader, data)
+
 
 class FileStorage:
-    def __init__(self, storage: BaseBackend) -> None:
+    def __init__(
+        self,
+        storage: BaseBackend,
+        hooks: typing.Sequence["Hook"] = (),
+        exists_cache: "ExistenceCache | None" = None,
+        usage: "UsageIndex | None" = None,
+    ) -> None:
         self.storage = storage
+        self.exists_cache = exists_cache
+        self.usage = usage
+        self.instrumentation: "Instrumentation | None" = None
+        self._upload_locks: dict[str, tuple[anyio.Lock, int]] = {}  # upload id -> (lock, number of users)
+        if hooks:
+            from async_storages.instrumentation import Instrumentation
+
+            self.instrumentation = Instrumentation(hooks, "FileStorage")
 
     async def write(
         self,
         path: str | os.PathLike[typing.AnyStr],
         data: bytes | AsyncReader | typing.BinaryIO,
+        stages: typing.Sequence["Stage"] = (),
     ) -> None:
-        if isinstance(data, bytes):
-            data = io.BytesIO(data)
+        reader = _to_reader(data)
+        if stages:
+            from async_storages.pipeline import PipelineReader
+
+            reader = PipelineReader(reader, stages)
 
-        if not inspect.iscoroutinefunction(data.read):
-            data = AdaptedBytesIO(typing.cast(typing.BinaryIO, data))
+        reservation: contextlib.AbstractAsyncContextManager[None] = contextlib.nullcontext()
+        if self.usage:
+            from async_storages.usage import ByteCounter
 
-        await self.storage.write(str(path), typing.cast(AsyncReader, data))
+            # reject before any byte is sent, the size is known only for bytes
+            reservation = self.usage.reserve(str(path), len(data) if isinstance(data, bytes) and not stages else None)
+            reader = counter = ByteCounter(reader)
+
+        async with reservation:
+            if self.exists_cache:
+                self.exists_cache.invalidate(str(path))
+
+            if self.instrumentation:
+                await self.instrumentation.write(
+                    str(path), reader, lambda counted: self.storage.write(str(path), counted)
+                )
+            else:
+                await self.storage.write(str(path), reader)
+
+            if self.exists_cache:
+                self.exists_cache.mark_written(str(path))
+            if self.usage:
+                await self.usage.record(str(path), counter.size)
 
     async def open(self, path: str | os.PathLike[typing.AnyStr]) -> AsyncFileLike:
-        return await self.storage.read(str(path), 1)
+        try:
+            if self.instrumentation:
+                return await self.instrumentation.read(str(path), lambda: self.storage.read(str(path), 1))
+            return await self.storage.read(str(path), 1)
+        except FileNotFoundError:
+            if self.exists_cache:
+                self.exists_cache.set(str(path), False)
+            raise
 
     async def exists(self, path: str | os.PathLike[typing.AnyStr]) -> bool:
-        return await self.storage.exists(str(path))
+        if self.exists_cache and (cached := self.exists_cache.get(str(path))) is not None:
+            return cached
+
+        if self.instrumentation:
+            exists = await self.instrumentation.call("exists", str(path), lambda: self.storage.exists(str(path)))
+        else:
+            exists = await self.storage.exists(str(path))
+
+        if self.exists_cache:
+            self.exists_cache.set(str(path), exists)
+        return exists
 
     async def delete(self, path: str | os.PathLike[typing.AnyStr]) -> None:
-        await self.storage.delete(str(path))
+        if self.instrumentation:
+            await self.instrumentation.call("delete", str(path), lambda: self.storage.delete(str(path)))
+        else:
+            await self.storage.delete(str(path))
+
+        if self.exists_cache:
+            self.exists_cache.mark_deleted(str(path))
+        if self.usage:
+            await self.usage.record(str(path), None)
+
+    async def copy(self, source: str | os.PathLike[typing.AnyStr], dest: str | os.PathLike[typing.AnyStr]) -> None:
+        size = await self.usage.store.get_size(str(source)) if self.usage else None
+        await self._copy(str(dest), lambda: self.storage.copy(str(source), str(dest)), size)
+
+    async def _copy(self, dest: str, func: typing.Callable[[], typing.Awaitable[None]], size: int | None) -> None:
+        """Run a copy made by the backend itself, `size` of the copied file is reserved and recorded in usage."""
+        reservation: contextlib.AbstractAsyncContextManager[None] = contextlib.nullcontext()
+        if self.usage:
+            reservation = self.usage.reserve(dest, size)
+
+        async with reservation:
+            if self.exists_cache:
+                self.exists_cache.invalidate(dest)
+
+            if self.instrumentation:
+                await self.instrumentation.call("copy", dest, func)
+            else:
+                await func()
+
+            if self.exists_cache:
+                self.exists_cache.mark_written(dest)
+            if self.usage and size is not None:
+                await self.usage.record(dest, size)
+
+    async def create_upload(
+        self,
+        path: str | os.PathLike[typing.AnyStr],
+        length: int | None = None,
+        metadata: dict[str, str] | None = None,
+    ) -> UploadSession:
+        """Start a resumable upload, the file appears at `path` when the upload is completed."""
+        if self.usage:
+            await self.usage.check_quota(str(path), length)
+        return await self.storage.create_upload(str(path), length, metadata)
+
+    async def get_upload(self, upload_id: str) -> UploadSession:
+        return await self.storage.get_upload(upload_id)
+
+    @contextlib.asynccontextmanager
+    async def _lock_upload(self, upload_id: str) -> typing.AsyncIterator[None]:
+        """
+        Serialize changes of one upload: concurrent parts would both pass the offset check.
+        Only guards this process, a client must not send parts of one upload to different servers at once.
+        """
+        lock, users = self._upload_locks.get(upload_id, (anyio.Lock(), 0))
+        self._upload_locks[upload_id] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._upload_locks[upload_id]
+            if users == 1:
+                del self._upload_locks[upload_id]
+            else:
+                self._upload_locks[upload_id] = (lock, users - 1)
+
+    async def append_upload(
+        self, upload_id: str, offset: int, data: bytes | AsyncReader | typing.BinaryIO
+    ) -> UploadSession:
+        async with self._lock_upload(upload_id):
+            return await self.storage.append_upload(upload_id, offset, _to_reader(data))
+
+    async def complete_upload(self, upload_id: str) -> UploadSession:
+        async with self._lock_upload(upload_id):
+            reservation: contextlib.AbstractAsyncContextManager[None] = contextlib.nullcontext()
+            if self.usage:
+                # checked again, uploads running in parallel have all passed the check of create_upload
+                pending = await self.storage.get_upload(upload_id)
+                reservation = self.usage.reserve(pending.path, pending.offset)
+
+            async with reservation:
+                session = await self.storage.complete_upload(upload_id)
+                if self.exists_cache:
+                    self.exists_cache.mark_written(session.path)
+                if self.usage:
+                    await self.usage.record(session.path, session.offset)
+        return session
+
+    async def abort_upload(self, upload_id: str) -> None:
+        async with self._lock_upload(upload_id):
+            await self.storage.abort_upload(upload_id)
+
+    def list(self, prefix: str = "") -> typing.AsyncIterator[FileInfo]:
+        return self.storage.list(prefix)
 
     async def url(self, path: str | os.PathLike[typing.AnyStr]) -> str:
+        if self.instrumentation:
+            return await self.instrumentation.call("url", str(path), lambda: self.storage.url(str(path)))
         return await self.storage.url(str(path))
 
     def abspath(self, path: str) -> str:
         return self.storage.abspath(path)
 
     async def iterator(self, path: str, chunk_size: int = 1024 * 64) -> typing.AsyncIterable[bytes]:
+        if self.instrumentation:
+            return await self.instrumentation.read(path, lambda: self.storage.read(path, chunk_size))
         return await self.storage.read(path, chunk_size)
+
+    def archive(
+        self,
+        paths: typing.Iterable[str] | typing.Mapping[str, str],
+        format: "ArchiveFormat" = "zip",
+        concurrency: int = 4,
+        spool_max_size: int = 1024**2 * 8,
+    ) -> contextlib.AbstractAsyncContextManager[typing.AsyncIterator[bytes]]:
+        """
+        Stream a zip or tar archive of the files, pass a mapping of path to archive name to rename entries.
+
+        Files are downloaded ahead in background tasks living as long as the context:
+
+            async with storage.archive(paths) as chunks:
+                async for chunk in chunks:
+                    ...
+        """
+        from async_storages.archive import open_archive
+
+        return open_archive(self, paths, format, concurrency, spool_max_size)
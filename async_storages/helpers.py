@@ -1,17 +1,112 @@
 import datetime
+import functools
 import os
+import string
 import time
 import typing
 import uuid
 
-import sanitize_filename
-
 
 def _get_now() -> datetime.datetime:
     # this is a mock target for tests
     return datetime.datetime.now()
 
 
+@functools.lru_cache(maxsize=4096)
+def _sanitize(filename: str) -> str:
+    import sanitize_filename
+
+    return typing.cast(str, sanitize_filename.sanitize(filename))
+
+
+_TIME_TOKENS = frozenset({"date", "datetime", "time", "timestamp"})
+_CONVERSIONS: dict[str, typing.Callable[[typing.Any], str]] = {"r": repr, "s": str, "a": ascii}
+
+
+class PathTemplate:
+    """
+    A destination path template parsed once and rendered many times.
+    Only tokens used by the template are evaluated.
+    See `generate_file_path` for the list of built-in tokens.
+    """
+
+    def __init__(self, template: str) -> None:
+        self.template = template
+        self.parts = tuple(string.Formatter().parse(template))
+        self.fields = frozenset(
+            field.split(".", 1)[0].split("[", 1)[0] for _, field, _, _ in self.parts if field is not None
+        )
+        # attribute access, indexes and nested specs are rare, let str.format handle them
+        self.is_simple = all(
+            field is None or (field.isidentifier() and "{" not in (spec or "")) for _, field, spec, _ in self.parts
+        )
+
+    def _time_tokens(self) -> dict[str, typing.Any]:
+        if not self.fields & _TIME_TOKENS:
+            return {}
+
+        now = _get_now()
+        tokens: dict[str, typing.Any] = {}
+        if "date" in self.fields:
+            tokens["date"] = now.date().isoformat()
+        if "datetime" in self.fields:
+            tokens["datetime"] = now.isoformat()
+        if "time" in self.fields:
+            tokens["time"] = now.time().isoformat()
+        if "timestamp" in self.fields:
+            tokens["timestamp"] = int(time.time())
+        return tokens
+
+    def _file_tokens(self, filename: str) -> dict[str, typing.Any]:
+        fields = self.fields
+        tokens: dict[str, typing.Any] = {}
+        if "random" in fields:
+            tokens["random"] = uuid.uuid4().hex[:8]
+        if "uuid" in fields:
+            tokens["uuid"] = str(uuid.uuid4())
+        if "file_name" in fields:
+            tokens["file_name"] = _sanitize(filename)
+        if "name" in fields or "extension" in fields:
+            name, extension = os.path.splitext(filename)
+            tokens["name"] = name
+            tokens["extension"] = extension.removeprefix(".")
+        return tokens
+
+    def _render(self, tokens: typing.Mapping[str, typing.Any]) -> str:
+        if not self.is_simple:
+            return self.template.format(**tokens)
+
+        result = []
+        for literal, field, spec, conversion in self.parts:
+            result.append(literal)
+            if field is not None:
+                value = tokens[field]
+                if conversion:
+                    value = _CONVERSIONS[conversion](value)
+                result.append(format(value, spec or ""))
+        return "".join(result)
+
+    def render(self, filename: str, extra_tokens: typing.Mapping[str, typing.Any] | None = None) -> str:
+        return self._render({**self._time_tokens(), **self._file_tokens(filename), **(extra_tokens or {})})
+
+    def render_many(
+        self,
+        filenames: typing.Iterable[str],
+        extra_tokens: typing.Mapping[str, typing.Any] | None = None,
+    ) -> list[str]:
+        """Render paths for many files at once, date and time tokens are computed once for the whole batch."""
+        shared_tokens = self._time_tokens()
+        return [
+            self._render({**shared_tokens, **self._file_tokens(filename), **(extra_tokens or {})})
+            for filename in filenames
+        ]
+
+
+@functools.lru_cache(maxsize=256)
+def compile_template(template: str) -> PathTemplate:
+    return PathTemplate(template)
+
+
 def generate_file_path(
     filename: str,
     destination: str,
@@ -31,19 +126,4 @@ def generate_file_path(
     - {name} - file name without extension
     - {extension} - file extension without dot
     """
-    now = _get_now()
-    return destination.format(
-        # randomization
-        random=uuid.uuid4().hex[:8],
-        uuid=str(uuid.uuid4()),
-        # date and time
-        date=now.date().isoformat(),
-        datetime=now.isoformat(),
-        time=now.time().isoformat(),
-        timestamp=int(time.time()),
-        # file name parts
-        file_name=sanitize_filename.sanitize(filename),
-        name=os.path.splitext(filename)[0],
-        extension=os.path.splitext(filename)[1].removeprefix("."),
-        **(extra_tokens or {}),
-    )
+    return compile_template(destination).render(filename, extra_tokens)
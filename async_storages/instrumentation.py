@@ -0,0 +1,288 @@
+import bisect
+import dataclasses
+import time
+import types
+import typing
+
+from async_storages.backends.base import (
+    AsyncFileLike,
+    AsyncReader,
+    BaseBackend,
+    FileInfo,
+    UploadSession,
+    thread_hop_listeners,
+)
+
+_T = typing.TypeVar("_T")
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+@dataclasses.dataclass
+class OperationEvent:
+    operation: str
+    source: str
+    path: str
+    started_at: float = dataclasses.field(default_factory=time.perf_counter)
+    duration: float = 0.0
+    bytes: int = 0
+    chunks: int = 0
+    thread_hops: int = 0
+    error: BaseException | None = None
+    finished: bool = False
+
+
+class Hook:
+    """Base class for instrumentation hooks, override methods you need."""
+
+    def on_start(self, event: OperationEvent) -> None:
+        pass
+
+    def on_end(self, event: OperationEvent) -> None:
+        pass
+
+
+class Instrumentation:
+    def __init__(self, hooks: typing.Sequence[Hook], source: str) -> None:
+        self.hooks = hooks
+        self.source = source
+
+    def start(self, operation: str, path: str) -> OperationEvent:
+        event = OperationEvent(operation=operation, source=self.source, path=path)
+        for hook in self.hooks:
+            hook.on_start(event)
+        return event
+
+    def end(self, event: OperationEvent, error: BaseException | None = None) -> None:
+        if event.finished:
+            return
+
+        event.finished = True
+        event.duration = time.perf_counter() - event.started_at
+        event.error = error
+        for hook in self.hooks:
+            hook.on_end(event)
+
+    async def track(
+        self,
+        event: OperationEvent,
+        func: typing.Callable[[], typing.Awaitable[_T]],
+        finish: bool = True,
+    ) -> _T:
+        """Await `func` counting thread hops into the event. Ends the event on error, or on success if `finish`."""
+
+        def on_thread_hop() -> None:
+            event.thread_hops += 1
+
+        token = thread_hop_listeners.set((*thread_hop_listeners.get(), on_thread_hop))
+        try:
+            result = await func()
+        except BaseException as ex:
+            self.end(event, ex)
+            raise
+        finally:
+            thread_hop_listeners.reset(token)
+        if finish:
+            self.end(event)
+        return result
+
+    async def call(self, operation: str, path: str, func: typing.Callable[[], typing.Awaitable[_T]]) -> _T:
+        return await self.track(self.start(operation, path), func)
+
+    async def write(
+        self, path: str, data: AsyncReader, func: typing.Callable[[AsyncReader], typing.Awaitable[None]]
+    ) -> None:
+        event = self.start("write", path)
+        await self.track(event, lambda: func(CountingReader(data, event)))
+
+    async def read(self, path: str, func: typing.Callable[[], typing.Awaitable[AsyncFileLike]]) -> AsyncFileLike:
+        """The read event ends when the returned file is exhausted or closed."""
+        event = self.start("read", path)
+        file = await self.track(event, func, finish=False)
+        return InstrumentedFile(file, event, self)
+
+
+class CountingReader:
+    def __init__(self, reader: AsyncReader, event: OperationEvent) -> None:
+        self.reader = reader
+        self.event = event
+
+    async def read(self, n: int = -1) -> bytes:
+        chunk = await self.reader.read(n)
+        if chunk:
+            self.event.bytes += len(chunk)
+            self.event.chunks += 1
+        return chunk
+
+
+class InstrumentedFile:
+    def __init__(self, file: AsyncFileLike, event: OperationEvent, instrumentation: Instrumentation) -> None:
+        self.file = file
+        self.event = event
+        self.instrumentation = instrumentation
+        # anyio file objects perform every call in a worker thread
+        self._hops_per_call = 1 if type(file).__module__.startswith("anyio") else 0
+
+    def _count(self, chunk: bytes) -> bytes:
+        self.event.thread_hops += self._hops_per_call
+        if chunk:
+            self.event.bytes += len(chunk)
+            self.event.chunks += 1
+        else:
+            self.instrumentation.end(self.event)
+        return chunk
+
+    async def read(self, n: int = -1) -> bytes:
+        chunk = await self.instrumentation.track(self.event, lambda: self.file.read(n), finish=False)
+        chunk = self._count(chunk)
+        if n < 0:  # whole file has been read
+            self.instrumentation.end(self.event)
+        return chunk
+
+    async def __aiter__(self) -> typing.AsyncIterator[bytes]:
+        async for chunk in self.file:
+            yield self._count(chunk)
+        self.instrumentation.end(self.event)
+
+    async def __aenter__(self) -> "InstrumentedFile":
+        return self
+
+    async def __aexit__(self, exc_type: type[Exception], exc_val: BaseException, exc_tb: types.TracebackType) -> None:
+        self.instrumentation.end(self.event)
+        await self.file.__aexit__(exc_type, exc_val, exc_tb)
+
+    def __getattr__(self, name: str) -> typing.Any:
+        return getattr(self.file, name)
+
+
+class InstrumentedBackend(BaseBackend):
+    """Reports every backend operation to hooks."""
+
+    def __init__(self, backend: BaseBackend, hooks: typing.Sequence[Hook]) -> None:
+        self.backend = backend
+        self.instrumentation = Instrumentation(hooks, type(backend).__name__)
+
+    async def write(self, path: str, data: AsyncReader) -> None:
+        await self.instrumentation.write(path, data, lambda reader: self.backend.write(path, reader))
+
+    async def read(self, path: str, chunk_size: int) -> AsyncFileLike:
+        return await self.instrumentation.read(path, lambda: self.backend.read(path, chunk_size))
+
+    async def delete(self, path: str) -> None:
+        await self.instrumentation.call("delete", path, lambda: self.backend.delete(path))
+
+    async def exists(self, path: str) -> bool:
+        return await self.instrumentation.call("exists", path, lambda: self.backend.exists(path))
+
+    async def url(self, path: str) -> str:
+        return await self.instrumentation.call("url", path, lambda: self.backend.url(path))
+
+    def abspath(self, path: str) -> str:
+        return self.backend.abspath(path)
+
+    async def copy(self, source: str, dest: str) -> None:
+        await self.instrumentation.call("copy", dest, lambda: self.backend.copy(source, dest))
+
+    def list(self, prefix: str = "") -> typing.AsyncIterator[FileInfo]:
+        return self.backend.list(prefix)
+
+    async def create_upload(
+        self, path: str, length: int | None = None, metadata: dict[str, str] | None = None
+    ) -> UploadSession:
+        return await self.instrumentation.call(
+            "create_upload", path, lambda: self.backend.create_upload(path, length, metadata)
+        )
+
+    async def get_upload(self, upload_id: str) -> UploadSession:
+        return await self.instrumentation.call("get_upload", upload_id, lambda: self.backend.get_upload(upload_id))
+
+    async def append_upload(self, upload_id: str, offset: int, data: AsyncReader) -> UploadSession:
+        event = self.instrumentation.start("append_upload", upload_id)
+        return await self.instrumentation.track(
+            event, lambda: self.backend.append_upload(upload_id, offset, CountingReader(data, event))
+        )
+
+    async def complete_upload(self, upload_id: str) -> UploadSession:
+        return await self.instrumentation.call(
+            "complete_upload", upload_id, lambda: self.backend.complete_upload(upload_id)
+        )
+
+    async def abort_upload(self, upload_id: str) -> None:
+        await self.instrumentation.call("abort_upload", upload_id, lambda: self.backend.abort_upload(upload_id))
+
+
+class Histogram:
+    def __init__(self, buckets: typing.Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket it falls into."""
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return self.buckets[index] if index < len(self.buckets) else float("inf")
+        return float("inf")  # pragma: no cover
+
+
+@dataclasses.dataclass
+class OperationMetrics:
+    calls: int = 0
+    errors: int = 0
+    bytes: int = 0
+    chunks: int = 0
+    thread_hops: int = 0
+    latency: Histogram = dataclasses.field(default_factory=Histogram)
+
+
+class MetricsCollector(Hook):
+    """Aggregates events per source and operation."""
+
+    def __init__(self, buckets: typing.Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self.metrics: dict[tuple[str, str], OperationMetrics] = {}
+        self.in_flight = 0
+
+    def on_start(self, event: OperationEvent) -> None:
+        self.in_flight += 1
+
+    def on_end(self, event: OperationEvent) -> None:
+        self.in_flight -= 1
+        key = (event.source, event.operation)
+        if key not in self.metrics:
+            self.metrics[key] = OperationMetrics(latency=Histogram(self.buckets))
+
+        metrics = self.metrics[key]
+        metrics.calls += 1
+        metrics.errors += event.error is not None
+        metrics.bytes += event.bytes
+        metrics.chunks += event.chunks
+        metrics.thread_hops += event.thread_hops
+        metrics.latency.observe(event.duration)
+
+    def snapshot(self) -> dict[str, dict[str, typing.Any]]:
+        return {
+            f"{source}.{operation}": {
+                "calls": metrics.calls,
+                "errors": metrics.errors,
+                "bytes": metrics.bytes,
+                "chunks": metrics.chunks,
+                "thread_hops": metrics.thread_hops,
+                "latency_sum": metrics.latency.sum,
+                "latency_p50": metrics.latency.quantile(0.5),
+                "latency_p99": metrics.latency.quantile(0.99),
+            }
+            for (source, operation), metrics in self.metrics.items()
+        }
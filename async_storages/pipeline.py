@@ -0,0 +1,160 @@
+import abc
+import hashlib
+import typing
+import zlib
+
+from async_storages.backends.base import AsyncReader, run_sync
+
+Offload = typing.Literal["thread", "process"] | None
+
+
+class Stage(abc.ABC):
+    """
+    A streaming transformation applied to every chunk written to the storage.
+
+    Set `offload` to "thread" for CPU-heavy stages that release the GIL (zlib, zstd, hashlib).
+    `TransformStage` also accepts "process" for stateless functions that must not run on the event loop at all.
+    """
+
+    offload: Offload = None
+
+    @abc.abstractmethod
+    def transform(self, chunk: bytes) -> bytes: ...
+
+    def flush(self) -> bytes:
+        return b""
+
+
+class GzipStage(Stage):
+    offload: Offload = "thread"
+
+    def __init__(self, level: int = 6) -> None:
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def transform(self, chunk: bytes) -> bytes:
+        return self.compressor.compress(chunk)
+
+    def flush(self) -> bytes:
+        return self.compressor.flush()
+
+
+class ZstdStage(Stage):
+    offload: Offload = "thread"
+
+    def __init__(self, level: int = 3) -> None:
+        try:
+            import zstandard
+        except ImportError:  # pragma: no cover
+            raise ImportError("Install zstandard to use zstd compression: pip install async_storages[zstd]")
+
+        self.compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def transform(self, chunk: bytes) -> bytes:
+        compressed: bytes = self.compressor.compress(chunk)
+        return compressed
+
+    def flush(self) -> bytes:
+        compressed: bytes = self.compressor.flush()
+        return compressed
+
+
+class HashStage(Stage):
+    def __init__(self, algorithm: str = "sha256") -> None:
+        self.hash = hashlib.new(algorithm)
+
+    def transform(self, chunk: bytes) -> bytes:
+        self.hash.update(chunk)
+        return chunk
+
+    def hexdigest(self) -> str:
+        return self.hash.hexdigest()
+
+
+class SizeStage(Stage):
+    def __init__(self) -> None:
+        self.size = 0
+        self.chunks = 0
+
+    def transform(self, chunk: bytes) -> bytes:
+        self.size += len(chunk)
+        self.chunks += 1
+        return chunk
+
+
+class TransformStage(Stage):
+    """
+    Apply a custom function to every chunk.
+
+    When `offload="process"` only the function is sent to the process pool, it must be picklable
+    (defined at module level) and must not keep state between chunks. `flush` runs in the caller.
+    """
+
+    def __init__(
+        self,
+        func: typing.Callable[[bytes], bytes],
+        flush: typing.Callable[[], bytes] | None = None,
+        offload: Offload = None,
+    ) -> None:
+        self.func = func
+        self.flush_func = flush
+        self.offload = offload
+
+    def transform(self, chunk: bytes) -> bytes:
+        return self.func(chunk)
+
+    def flush(self) -> bytes:
+        return self.flush_func() if self.flush_func else b""
+
+
+async def _transform(stage: Stage, chunk: bytes) -> bytes:
+    if stage.offload == "thread":
+        return await run_sync(stage.transform, chunk)
+    if stage.offload == "process":
+        if not isinstance(stage, TransformStage):
+            raise TypeError("Only TransformStage can run in a process pool")
+        from anyio import to_process
+
+        # send only the function, pickling the stage would copy its whole state for every chunk
+        return typing.cast(bytes, await to_process.run_sync(stage.func, chunk))
+    return stage.transform(chunk)
+
+
+async def _flush(stage: Stage) -> bytes:
+    # stages offloaded to a process are stateless, nothing to flush remotely
+    if stage.offload == "thread":
+        return await run_sync(stage.flush)
+    return stage.flush()
+
+
+class PipelineReader:
+    """Reads from the source in chunks and passes every chunk through the stages exactly once."""
+
+    def __init__(self, reader: AsyncReader, stages: typing.Sequence[Stage], chunk_size: int = 1024 * 64) -> None:
+        self.reader = reader
+        self.stages = stages
+        self.chunk_size = chunk_size
+        self._buffer = bytearray()
+        self._eof = False
+
+    async def _process(self, chunk: bytes, final: bool) -> bytes:
+        for stage in self.stages:
+            if chunk:
+                chunk = await _transform(stage, chunk)
+            if final:
+                chunk += await _flush(stage)
+        return chunk
+
+    async def read(self, n: int = -1) -> bytes:
+        while not self._eof and (n < 0 or len(self._buffer) < n):
+            chunk = await self.reader.read(self.chunk_size)
+            self._eof = not chunk
+            self._buffer += await self._process(chunk, final=self._eof)
+
+        if n < 0 or n >= len(self._buffer):
+            data = bytes(self._buffer)
+            self._buffer.clear()
+            return data
+
+        data = bytes(self._buffer[:n])
+        del self._buffer[:n]
+        return data
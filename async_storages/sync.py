@@ -0,0 +1,192 @@
+import dataclasses
+import functools
+import json
+import os
+import pathlib
+import sys
+import time
+import typing
+
+import anyio
+import anyio.abc
+
+from async_storages.backends.base import BaseBackend, FileInfo, run_sync
+from async_storages.file_storage import FileStorage
+
+
+@dataclasses.dataclass
+class SyncReport:
+    dry_run: bool = False
+    copied: list[str] = dataclasses.field(default_factory=list)
+    deleted: list[str] = dataclasses.field(default_factory=list)
+    skipped: int = 0
+    failed: dict[str, Exception] = dataclasses.field(default_factory=dict)
+    bytes: int = 0
+    server_side: bool = False
+    duration: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Transferred bytes per second."""
+        return self.bytes / self.duration if self.duration else 0.0
+
+    @property
+    def files_per_second(self) -> float:
+        return len(self.copied) / self.duration if self.duration else 0.0
+
+
+def is_changed(source: FileInfo, dest: FileInfo | None, compare_etags: bool = True) -> bool:
+    """
+    Compare listings of both sides, etags are compared only when both backends provide them.
+    Pass `compare_etags=False` when the destination computes etags differently, e.g. multipart uploads.
+    """
+    if dest is None or source.size != dest.size:
+        return True
+    if compare_etags and source.etag is not None and dest.etag is not None:
+        return source.etag != dest.etag
+    if source.mtime is not None and dest.mtime is not None:
+        return source.mtime > dest.mtime
+    return False
+
+
+def get_server_side_copy(
+    source: BaseBackend, dest: BaseBackend
+) -> typing.Callable[[str, str], typing.Awaitable[None]] | None:
+    if source is dest:
+        return dest.copy
+
+    s3 = sys.modules.get("async_storages.backends.s3")
+    if s3 and isinstance(source, s3.S3Backend) and isinstance(dest, s3.S3Backend) and dest.shares_account(source):
+        return functools.partial(dest.copy, source_bucket=source.bucket)
+    return None
+
+
+class Checkpoint:
+    """Remembers transferred files so an interrupted sync can be resumed without comparing them again."""
+
+    def __init__(self, path: str | os.PathLike[str], flush_interval: float = 1.0) -> None:
+        self.path = pathlib.Path(path)
+        self.flush_interval = flush_interval
+        self.done: dict[str, list[typing.Any]] = {}
+        self._flushed_at = time.monotonic()
+
+    @staticmethod
+    def signature(info: FileInfo) -> list[typing.Any]:
+        return [info.size, info.etag, info.mtime]
+
+    async def load(self) -> None:
+        if await run_sync(self.path.exists):
+            self.done = json.loads(await run_sync(self.path.read_text, "utf-8"))["done"]
+
+    def is_done(self, info: FileInfo) -> bool:
+        return self.done.get(info.path) == self.signature(info)
+
+    async def mark_done(self, info: FileInfo) -> None:
+        self.done[info.path] = self.signature(info)
+        if time.monotonic() - self._flushed_at >= self.flush_interval:
+            await self.flush()
+
+    async def flush(self) -> None:
+        self._flushed_at = time.monotonic()
+        data = json.dumps({"done": self.done})
+
+        def save() -> None:
+            temp_path = self.path.with_name(self.path.name + ".tmp")
+            temp_path.write_text(data, "utf-8")
+            os.replace(temp_path, self.path)  # never leave a half written checkpoint
+
+        await run_sync(save)
+
+    async def remove(self) -> None:
+        await run_sync(functools.partial(self.path.unlink, missing_ok=True))
+
+
+async def sync(
+    source: FileStorage,
+    dest: FileStorage,
+    prefix: str = "",
+    dest_prefix: str | None = None,
+    concurrency: int = 8,
+    delete: bool = False,
+    dry_run: bool = False,
+    checkpoint: str | os.PathLike[str] | None = None,
+) -> SyncReport:
+    """
+    Copy new and changed files under `prefix` from `source` to `dest`.
+
+    Both sides are listed and compared by size and modification time, etags are compared only for server-side
+    copies: uploads to another account may get different etags for the same content (multipart uploads).
+    Files are copied by the backend itself when both storages share it (or share an S3 account).
+    With `delete` files missing in the source are removed from the destination.
+    With `checkpoint` transferred files are recorded in a JSON file, a restarted sync skips them.
+    The checkpoint is removed when sync finishes without errors.
+    """
+    dest_prefix = prefix if dest_prefix is None else dest_prefix
+    report = SyncReport(dry_run=dry_run)
+    started_at = time.perf_counter()
+    state = Checkpoint(checkpoint) if checkpoint else None
+    if state:
+        await state.load()
+
+    server_side_copy = get_server_side_copy(source.storage, dest.storage)
+    report.server_side = server_side_copy is not None
+    dest_files = {info.path: info async for info in dest.list(dest_prefix)}
+    source_paths: set[str] = set()
+    send_stream, receive_stream = anyio.create_memory_object_stream[tuple[FileInfo, str]](concurrency)
+
+    async def transfer(info: FileInfo, dest_path: str) -> None:
+        if server_side_copy:
+            # through the destination storage, its cache, hooks and quotas must see the copy
+            await dest._copy(dest_path, lambda: server_side_copy(info.path, dest_path), info.size)
+        else:
+            file = await source.open(info.path)
+            async with file:
+                await dest.write(dest_path, file)
+
+    async def worker(receive_stream: anyio.abc.ObjectReceiveStream[tuple[FileInfo, str]]) -> None:
+        async with receive_stream:
+            async for info, dest_path in receive_stream:
+                try:
+                    if not dry_run:
+                        await transfer(info, dest_path)
+                        if state:
+                            await state.mark_done(info)
+                except Exception as ex:
+                    report.failed[info.path] = ex
+                else:
+                    report.copied.append(info.path)
+                    report.bytes += info.size
+
+    listing_error: Exception | None = None
+    async with anyio.create_task_group() as tg:
+        for _ in range(max(concurrency, 1)):
+            tg.start_soon(worker, receive_stream.clone())
+        receive_stream.close()  # workers own their clones
+
+        async with send_stream:
+            try:
+                async for info in source.list(prefix):
+                    dest_path = dest_prefix + info.path[len(prefix) :]
+                    source_paths.add(dest_path)
+                    changed = is_changed(info, dest_files.get(dest_path), compare_etags=report.server_side)
+                    if (state and state.is_done(info)) or not changed:
+                        report.skipped += 1
+                    else:
+                        await send_stream.send((info, dest_path))
+            except Exception as ex:
+                # raised outside of the task group so callers get the original exception, not an exception group
+                listing_error = ex
+                tg.cancel_scope.cancel()
+    if listing_error:
+        raise listing_error
+
+    if delete:
+        for path in sorted(dest_files.keys() - source_paths):
+            if not dry_run:
+                await dest.delete(path)
+            report.deleted.append(path)
+
+    if state and not dry_run:
+        await (state.flush() if report.failed else state.remove())
+    report.duration = time.perf_counter() - started_at
+    return report
@@ -0,0 +1,182 @@
+import asyncio
+import atexit
+import contextlib
+import os
+import threading
+import types
+import typing
+
+import anyio
+from anyio.from_thread import BlockingPortal, start_blocking_portal
+
+from async_storages.backends.base import AsyncFileLike, BaseBackend, FileInfo, long_lived_loops
+from async_storages.file_storage import FileStorage
+
+_T = typing.TypeVar("_T")
+_R = typing.TypeVar("_R")
+
+
+async def _mark_long_lived() -> None:
+    long_lived_loops.add(asyncio.get_running_loop())
+
+
+class EventLoopThread:
+    """
+    An event loop running in a daemon thread, started on first use.
+
+    A forked child does not inherit the thread, it starts its own loop on first use.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._context: contextlib.AbstractContextManager[BlockingPortal] | None = None
+        self._portal: BlockingPortal | None = None
+        self._inherited: list[typing.Any] = []
+
+    @property
+    def portal(self) -> BlockingPortal:
+        with self._lock:
+            if self._portal is None:
+                self._context = start_blocking_portal(name="async-storages-loop")
+                self._portal = self._context.__enter__()
+                self._portal.call(_mark_long_lived)
+            return self._portal
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._context is not None:
+                self._context.__exit__(None, None, None)
+            self._context = self._portal = None
+
+    def _after_fork(self) -> None:
+        # finalizing the inherited context would wait for the thread of the parent, keep it referenced instead
+        self._inherited.append(self._context)
+        self._lock = threading.Lock()
+        self._context = self._portal = None
+
+
+# one loop per process: backend clients and their connection pools stay bound to it between calls
+event_loop_thread = EventLoopThread()
+atexit.register(event_loop_thread.stop)
+if hasattr(os, "register_at_fork"):  # pragma: no branch
+    os.register_at_fork(after_in_child=event_loop_thread._after_fork)
+
+
+class SyncFile:
+    """Blocking reader of a file opened in the event loop thread."""
+
+    def __init__(self, file: AsyncFileLike, portal: BlockingPortal, chunk_size: int = 1024 * 64) -> None:
+        self.file = file
+        self.portal = portal
+        self.chunk_size = chunk_size
+
+    def read(self, n: int = -1) -> bytes:
+        return self.portal.call(self.file.read, n)
+
+    def close(self) -> None:
+        self.portal.call(self._close)
+
+    async def _close(self) -> None:
+        await self.file.__aexit__(None, None, None)  # type: ignore[arg-type]
+
+    def __iter__(self) -> typing.Iterator[bytes]:
+        while chunk := self.read(self.chunk_size):
+            yield chunk
+
+    def __enter__(self) -> "SyncFile":
+        return self
+
+    def __exit__(self, exc_type: type[Exception], exc_val: BaseException, exc_tb: types.TracebackType) -> None:
+        self.close()
+
+
+class SyncFileStorage:
+    """
+    Blocking facade of `FileStorage` for synchronous code: scripts, batch jobs, WSGI views.
+
+    Operations run on an event loop thread shared by the process, backend clients (and connection pools)
+    created on it are reused between calls. Batch variants run up to `concurrency` operations at once.
+    Don't call it from async code, it blocks the event loop.
+    """
+
+    def __init__(self, storage: FileStorage | BaseBackend, concurrency: int = 16) -> None:
+        self.storage = storage if isinstance(storage, FileStorage) else FileStorage(storage)
+        self.concurrency = concurrency
+
+    def _call(self, func: typing.Callable[..., typing.Awaitable[_R]], *args: typing.Any) -> _R:
+        return event_loop_thread.portal.call(func, *args)
+
+    def write(self, path: str, data: bytes | typing.BinaryIO) -> None:
+        self._call(self.storage.write, path, data)
+
+    def open(self, path: str) -> SyncFile:
+        portal = event_loop_thread.portal
+        return SyncFile(portal.call(self.storage.open, path), portal)
+
+    def read(self, path: str) -> bytes:
+        return self._call(self._read, path)
+
+    def exists(self, path: str) -> bool:
+        return self._call(self.storage.exists, path)
+
+    def delete(self, path: str) -> None:
+        self._call(self.storage.delete, path)
+
+    def copy(self, source: str, dest: str) -> None:
+        self._call(self.storage.copy, source, dest)
+
+    def url(self, path: str) -> str:
+        return self._call(self.storage.url, path)
+
+    def write_many(self, files: typing.Mapping[str, bytes | typing.BinaryIO]) -> None:
+        self._call(self._map, lambda path: self.storage.write(path, files[path]), list(files))
+
+    def read_many(self, paths: typing.Iterable[str]) -> dict[str, bytes]:
+        paths = list(paths)
+        return dict(zip(paths, self._call(self._map, self._read, paths)))
+
+    def exists_many(self, paths: typing.Iterable[str]) -> dict[str, bool]:
+        paths = list(paths)
+        return dict(zip(paths, self._call(self._map, self.storage.exists, paths)))
+
+    def delete_many(self, paths: typing.Iterable[str]) -> None:
+        self._call(self._map, self.storage.delete, list(paths))
+
+    def close(self) -> None:
+        """Close backend clients kept alive on the event loop thread."""
+        close = getattr(self.storage.storage, "close", None)
+        if close is not None:
+            self._call(close)
+
+    async def _read(self, path: str) -> bytes:
+        file = await self.storage.open(path)
+        async with file:
+            return await file.read()
+
+    async def _list(self, prefix: str) -> list[FileInfo]:
+        return [info async for info in self.storage.list(prefix)]
+
+    async def _map(self, func: typing.Callable[[_T], typing.Awaitable[_R]], items: typing.Sequence[_T]) -> list[_R]:
+        results: list[typing.Any] = [None] * len(items)
+        errors: list[Exception] = []
+        limiter = anyio.CapacityLimiter(self.concurrency)
+
+        async def run(index: int, item: _T) -> None:
+            async with limiter:
+                try:
+                    results[index] = await func(item)
+                except Exception as ex:
+                    errors.append(ex)
+                    tg.cancel_scope.cancel()
+
+        async with anyio.create_task_group() as tg:
+            for index, item in enumerate(items):
+                tg.start_soon(run, index, item)
+        # raised outside the task group, callers get the original exception instead of an ExceptionGroup
+        if errors:
+            raise errors[0]
+        return results
+
+    # defined last, the name shadows the builtin in annotations of the class body
+    def list(self, prefix: str = "") -> list[FileInfo]:
+        return self._call(self._list, prefix)
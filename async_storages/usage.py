@@ -0,0 +1,269 @@
+import abc
+import contextlib
+import dataclasses
+import os
+import sqlite3
+import typing
+
+import anyio
+
+from async_storages.backends.base import AsyncReader, FileInfo, run_sync
+
+
+@dataclasses.dataclass(frozen=True)
+class Usage:
+    bytes: int = 0
+    objects: int = 0
+
+
+class QuotaExceededError(Exception):
+    def __init__(self, prefix: str, usage: Usage, limit: int) -> None:
+        super().__init__(f'Quota of {limit} bytes for "{prefix}" is exceeded, {usage.bytes} bytes used')
+        self.prefix = prefix
+        self.usage = usage
+        self.limit = limit
+
+
+def ancestor_prefixes(path: str) -> list[str]:
+    """Directory prefixes containing the path: "a/b/c.txt" -> ["", "a/", "a/b/"]."""
+    parts = path.split("/")[:-1]
+    return [""] + ["/".join(parts[: index + 1]) + "/" for index in range(len(parts))]
+
+
+def aggregate(files: typing.Mapping[str, int]) -> dict[str, Usage]:
+    totals: dict[str, list[int]] = {}
+    for path, size in files.items():
+        for prefix in ancestor_prefixes(path):
+            total = totals.setdefault(prefix, [0, 0])
+            total[0] += size
+            total[1] += 1
+    return {prefix: Usage(size, objects) for prefix, (size, objects) in totals.items()}
+
+
+class UsageStore(abc.ABC):  # pragma: no cover
+    """Keeps sizes of stored files and totals of every directory prefix."""
+
+    @abc.abstractmethod
+    async def get(self, prefix: str) -> Usage: ...
+
+    @abc.abstractmethod
+    async def get_size(self, path: str) -> int | None: ...
+
+    @abc.abstractmethod
+    async def set_size(self, path: str, size: int | None) -> None:
+        """Record the new size of the file (None when deleted) and update totals of its prefixes."""
+
+    @abc.abstractmethod
+    async def replace(self, files: typing.Mapping[str, int]) -> None:
+        """Replace all data with sizes of given files."""
+
+
+class MemoryUsageStore(UsageStore):
+    def __init__(self) -> None:
+        self.files: dict[str, int] = {}
+        self.prefixes: dict[str, Usage] = {}
+
+    async def get(self, prefix: str) -> Usage:
+        return self.prefixes.get(prefix, Usage())
+
+    async def get_size(self, path: str) -> int | None:
+        return self.files.get(path)
+
+    async def set_size(self, path: str, size: int | None) -> None:
+        old_size = self.files.pop(path, None)
+        if size is not None:
+            self.files[path] = size
+        delta_bytes = (size or 0) - (old_size or 0)
+        delta_objects = (size is not None) - (old_size is not None)
+        for prefix in ancestor_prefixes(path):
+            usage = self.prefixes.get(prefix, Usage())
+            self.prefixes[prefix] = Usage(usage.bytes + delta_bytes, usage.objects + delta_objects)
+
+    async def replace(self, files: typing.Mapping[str, int]) -> None:
+        self.files = dict(files)
+        self.prefixes = aggregate(files)
+
+
+class SQLiteUsageStore(UsageStore):
+    """Persists usage in a SQLite database, queries run in a worker thread."""
+
+    def __init__(self, path: str | os.PathLike[str]) -> None:
+        self.path = path
+        self._connection: sqlite3.Connection | None = None
+        self._lock = anyio.Lock()  # the connection is shared by worker threads
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER NOT NULL)")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS prefixes "
+                "(prefix TEXT PRIMARY KEY, bytes INTEGER NOT NULL, objects INTEGER NOT NULL)"
+            )
+            self._connection = connection
+        return self._connection
+
+    async def _run(self, func: typing.Callable[[sqlite3.Connection], typing.Any]) -> typing.Any:
+        async with self._lock:
+            return await run_sync(lambda: func(self._connect()))
+
+    async def get(self, prefix: str) -> Usage:
+        def query(connection: sqlite3.Connection) -> Usage:
+            row = connection.execute("SELECT bytes, objects FROM prefixes WHERE prefix = ?", (prefix,)).fetchone()
+            return Usage(*row) if row else Usage()
+
+        return typing.cast(Usage, await self._run(query))
+
+    async def get_size(self, path: str) -> int | None:
+        def query(connection: sqlite3.Connection) -> int | None:
+            row = connection.execute("SELECT size FROM files WHERE path = ?", (path,)).fetchone()
+            return row[0] if row else None
+
+        return typing.cast(int | None, await self._run(query))
+
+    async def set_size(self, path: str, size: int | None) -> None:
+        def update(connection: sqlite3.Connection) -> None:
+            with connection:  # one transaction
+                connection.execute("BEGIN IMMEDIATE")
+                row = connection.execute("SELECT size FROM files WHERE path = ?", (path,)).fetchone()
+                old_size = row[0] if row else None
+                if size is None:
+                    connection.execute("DELETE FROM files WHERE path = ?", (path,))
+                else:
+                    connection.execute("INSERT OR REPLACE INTO files (path, size) VALUES (?, ?)", (path, size))
+
+                delta_bytes = (size or 0) - (old_size or 0)
+                delta_objects = (size is not None) - (old_size is not None)
+                connection.executemany(
+                    "INSERT INTO prefixes (prefix, bytes, objects) VALUES (?, ?, ?) "
+                    "ON CONFLICT(prefix) DO UPDATE SET bytes = bytes + excluded.bytes, "
+                    "objects = objects + excluded.objects",
+                    [(prefix, delta_bytes, delta_objects) for prefix in ancestor_prefixes(path)],
+                )
+
+        await self._run(update)
+
+    async def replace(self, files: typing.Mapping[str, int]) -> None:
+        totals = aggregate(files)
+
+        def update(connection: sqlite3.Connection) -> None:
+            with connection:
+                connection.execute("BEGIN IMMEDIATE")
+                connection.execute("DELETE FROM files")
+                connection.execute("DELETE FROM prefixes")
+                connection.executemany("INSERT INTO files (path, size) VALUES (?, ?)", files.items())
+                connection.executemany(
+                    "INSERT INTO prefixes (prefix, bytes, objects) VALUES (?, ?, ?)",
+                    [(prefix, usage.bytes, usage.objects) for prefix, usage in totals.items()],
+                )
+
+        await self._run(update)
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class ByteCounter:
+    """Counts bytes read from the wrapped reader."""
+
+    def __init__(self, reader: AsyncReader) -> None:
+        self.reader = reader
+        self.size = 0
+
+    async def read(self, n: int = -1) -> bytes:
+        chunk = await self.reader.read(n)
+        self.size += len(chunk)
+        return chunk
+
+
+class UsageIndex:
+    """
+    Incremental per-prefix usage of a storage, maintained by `FileStorage` writes and deletes.
+
+    `quotas` maps directory prefixes ("tenants/acme/", "" for the whole storage) to byte limits.
+    Quotas are checked before a write starts: writes of known size are rejected when they would exceed the quota,
+    streams of unknown size when the quota is already used up. The size of a write in progress stays reserved
+    until it is recorded, so concurrent writes can't all pass the check.
+    Files changed by other processes are not seen until `rebuild` runs.
+    """
+
+    def __init__(self, store: UsageStore | None = None, quotas: typing.Mapping[str, int] | None = None) -> None:
+        self.store = store or MemoryUsageStore()
+        self.quotas = dict(quotas or {})
+        self._locks: dict[str, anyio.Lock] = {}  # quota prefix -> lock of its check and reservation
+        self._reserved: dict[str, int] = {}  # quota prefix -> bytes of writes in progress
+        self._rebuilds: list[dict[str, int | None]] = []  # changes seen by every running rebuild
+
+    async def usage(self, prefix: str = "") -> Usage:
+        if prefix and not prefix.endswith("/"):
+            prefix += "/"
+        return await self.store.get(prefix)
+
+    async def check_quota(self, path: str, size: int | None = None) -> None:
+        """Raise QuotaExceededError if the file can't be stored under quotas of its prefixes."""
+        async with self.reserve(path, size):
+            pass
+
+    @contextlib.asynccontextmanager
+    async def reserve(self, path: str, size: int | None = None) -> typing.AsyncIterator[None]:
+        """
+        Check quotas of the file and reserve `size` bytes of them until the context exits.
+        Record the written file before leaving the context, otherwise its bytes are briefly not counted at all.
+        """
+        prefixes = [prefix for prefix in ancestor_prefixes(path) if prefix in self.quotas]
+        async with contextlib.AsyncExitStack() as stack:
+            # ancestors are always locked in the same order, from the root
+            for prefix in prefixes:
+                await stack.enter_async_context(self._locks.setdefault(prefix, anyio.Lock()))
+
+            old_size = (await self.store.get_size(path) or 0) if prefixes else 0
+            for prefix in prefixes:
+                limit = self.quotas[prefix]
+                usage = await self.store.get(prefix)
+                used = usage.bytes + self._reserved.get(prefix, 0)
+                if used - old_size + (size or 0) > limit or (size is None and used >= limit):
+                    raise QuotaExceededError(prefix, usage, limit)
+            for prefix in prefixes:
+                self._reserved[prefix] = self._reserved.get(prefix, 0) + (size or 0)
+
+        try:
+            yield
+        finally:
+            for prefix in prefixes:
+                self._reserved[prefix] -= size or 0
+                if not self._reserved[prefix]:
+                    del self._reserved[prefix]
+
+    async def record(self, path: str, size: int | None) -> None:
+        """Record the size of a written file, None for a deleted one."""
+        for changes in self._rebuilds:
+            changes[path] = size
+        await self.store.set_size(path, size)
+
+    async def record_copy(self, source: str, dest: str) -> None:
+        if (size := await self.store.get_size(source)) is not None:
+            await self.record(dest, size)
+
+    async def rebuild(self, files: typing.Iterable[FileInfo] | typing.AsyncIterable[FileInfo]) -> None:
+        """Replace the index with a complete listing of the storage, for example `storage.list()`."""
+        sizes: dict[str, int] = {}
+        changes: dict[str, int | None] = {}
+        self._rebuilds.append(changes)
+        try:
+            if isinstance(files, typing.AsyncIterable):
+                async for info in files:
+                    sizes[info.path] = info.size
+            else:
+                for info in files:
+                    sizes[info.path] = info.size
+            await self.store.replace(sizes)
+
+            # the listing may have missed changes made while it was running
+            while changes:
+                path = next(iter(changes))
+                await self.store.set_size(path, changes.pop(path))
+        finally:
+            self._rebuilds = [other for other in self._rebuilds if other is not changes]
@@ -0,0 +1,63 @@
+"""
+Run the benchmark suite.
+
+Usage: python -m benchmarks [--quick] [--only storage,file_server,s3,import_time] [--output results.json]
+Compare two runs with: python -m benchmarks.compare before.json after.json
+"""
+
+import argparse
+import datetime
+import json
+import platform
+import sys
+import typing
+
+import anyio
+
+from benchmarks import file_server, import_time, s3, storage
+from benchmarks.utils import Result
+
+SUITES: dict[str, typing.Callable[[bool], typing.Awaitable[list[Result]]]] = {
+    "storage": storage.run,
+    "file_server": file_server.run,
+    "s3": s3.run,
+}
+
+
+async def run(suites: typing.Sequence[str], quick: bool) -> dict[str, typing.Any]:
+    results: list[Result] = []
+    for name in suites:
+        if name == "import_time":
+            results.append(import_time.measure(runs=5 if quick else 20))
+        else:
+            results += await SUITES[name](quick)
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "quick": quick,
+            "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        },
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="small sizes and few repetitions, for smoke testing")
+    parser.add_argument("--only", default=",".join([*SUITES, "import_time"]), help="comma separated suite names")
+    parser.add_argument("--output", help="write results to this file instead of stdout")
+    args = parser.parse_args()
+
+    report = anyio.run(run, args.only.split(","), args.quick)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == "__main__":
+    main()
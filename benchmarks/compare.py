@@ -0,0 +1,55 @@
+"""
+Compare two benchmark reports produced by `python -m benchmarks --output`.
+
+Usage: python -m benchmarks.compare before.json after.json [--threshold 0.1]
+Exits with status 1 if any benchmark got slower than the threshold.
+"""
+
+import argparse
+import json
+import sys
+import typing
+
+
+def _key(result: dict[str, typing.Any]) -> str:
+    params = ",".join(f"{name}={value}" for name, value in sorted(result.get("params", {}).items()))
+    return f"{result['benchmark']}[{params}]"
+
+
+def compare(
+    before: dict[str, typing.Any], after: dict[str, typing.Any], threshold: float
+) -> list[tuple[str, float, float, float, bool]]:
+    """Return (benchmark, ops/sec before, ops/sec after, change, is regression) rows."""
+    previous = {_key(result): result for result in before["results"] if result.get("ops_per_sec")}
+    rows = []
+    for result in after["results"]:
+        key = _key(result)
+        if key not in previous or not result.get("ops_per_sec"):
+            continue
+
+        old, new = previous[key]["ops_per_sec"], result["ops_per_sec"]
+        change = (new - old) / old
+        rows.append((key, old, new, change, change < -threshold))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed slowdown, 0.1 means 10%%")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    rows = compare(before, after, args.threshold)
+    for key, old, new, change, regression in rows:
+        print(f"{'REGRESSION' if regression else 'ok':<10} {change:+8.1%} {old:>12.1f} -> {new:>12.1f} ops/s  {key}")
+    sys.exit(1 if any(row[4] for row in rows) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import tempfile
+
+import anyio
+import httpx
+from starlette.applications import Starlette
+from starlette.routing import Mount
+
+from async_storages import FileStorage, FileSystemBackend, MemoryBackend
+from async_storages.contrib.starlette import FileServer
+from benchmarks.utils import Result, make_result
+
+
+async def requests_per_second(
+    storage: FileStorage, backend: str, size: int, requests: int, concurrency: int
+) -> list[Result]:
+    await storage.write("file.bin", b"x" * size)
+    app = Starlette(routes=[Mount("/media", FileServer(storage))])
+    timings: list[float] = []
+    limiter = anyio.CapacityLimiter(concurrency)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://testserver") as client:
+
+        async def fetch(path: str, status_code: int) -> None:
+            async with limiter:
+                started = anyio.current_time()
+                response = await client.get(path)
+                timings.append(anyio.current_time() - started)
+                assert response.status_code == status_code
+
+        results = []
+        for name, path, status_code, total_bytes in (
+            ("file_server_hit", "/media/file.bin", 200, size * requests),
+            ("file_server_miss", "/media/missing.bin", 404, 0),
+        ):
+            timings.clear()
+            started = anyio.current_time()
+            async with anyio.create_task_group() as tg:
+                for _ in range(requests):
+                    tg.start_soon(fetch, path, status_code)
+            results.append(
+                make_result(
+                    name,
+                    anyio.current_time() - started,
+                    requests,
+                    timings,
+                    total_bytes,
+                    backend=backend,
+                    size=size,
+                    concurrency=concurrency,
+                )
+            )
+        return results
+
+
+async def run(quick: bool = False) -> list[Result]:
+    requests = 50 if quick else 2000
+    results = await requests_per_second(FileStorage(MemoryBackend()), "memory", 16 * 1024, requests, 16)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        storage = FileStorage(FileSystemBackend(tmp_dir))
+        results += await requests_per_second(storage, "fs", 16 * 1024, requests, 16)
+    return results
@@ -0,0 +1,54 @@
+"""
+Measure how long `import async_storages` takes in a fresh interpreter.
+
+Usage: python -m benchmarks.import_time [--runs 20] [--module async_storages]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ["aioboto3", "botocore", "sanitize_filename", "async_storages.backends.s3"]
+
+_SCRIPT = """
+import sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(elapsed, ",".join(name for name in {heavy!r} if name in sys.modules))
+"""
+
+
+def measure(module: str = "async_storages", runs: int = 20) -> dict[str, object]:
+    timings = []
+    loaded: set[str] = set()
+    for _ in range(runs):
+        output = subprocess.check_output(
+            [sys.executable, "-c", _SCRIPT.format(module=module, heavy=HEAVY_MODULES)], text=True
+        )
+        elapsed, _, modules = output.strip().partition(" ")
+        timings.append(float(elapsed) * 1000)
+        loaded.update(filter(None, modules.split(",")))
+
+    return {
+        "benchmark": "import_time",
+        "module": module,
+        "runs": runs,
+        "min_ms": round(min(timings), 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "heavy_modules_loaded": sorted(loaded),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--module", default="async_storages")
+    args = parser.parse_args()
+    print(json.dumps(measure(args.module, args.runs)))
+
+
+if __name__ == "__main__":
+    main()
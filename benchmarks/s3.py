@@ -0,0 +1,70 @@
+"""
+S3Backend benchmarks against a local S3-compatible server.
+
+Set BENCH_S3_ENDPOINT_URL to a running server (minio), otherwise moto's in-process server is used when installed.
+"""
+
+import contextlib
+import logging
+import os
+import typing
+
+from async_storages import FileStorage, S3Backend
+from benchmarks.utils import Result, measure
+
+BUCKET = os.environ.get("BENCH_S3_BUCKET", "async-storages-bench")
+ACCESS_KEY_ID = os.environ.get("BENCH_S3_ACCESS_KEY_ID", "minioadmin")
+SECRET_ACCESS_KEY = os.environ.get("BENCH_S3_SECRET_ACCESS_KEY", "minioadmin")
+
+
+@contextlib.contextmanager
+def s3_endpoint() -> typing.Iterator[str | None]:
+    if endpoint_url := os.environ.get("BENCH_S3_ENDPOINT_URL"):
+        yield endpoint_url
+        return
+
+    try:
+        from moto.server import ThreadedMotoServer
+    except ImportError:
+        yield None
+        return
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = ThreadedMotoServer(port=0, verbose=False)
+    server.start()
+    try:
+        host, port = server.get_host_and_port()
+        yield f"http://{host}:{port}"
+    finally:
+        server.stop()
+
+
+async def run(quick: bool = False) -> list[Result]:
+    with s3_endpoint() as endpoint_url:
+        if endpoint_url is None:
+            return [{"benchmark": "s3", "skipped": "set BENCH_S3_ENDPOINT_URL or install moto[server]"}]
+
+        backend = S3Backend(BUCKET, ACCESS_KEY_ID, SECRET_ACCESS_KEY, endpoint_url=endpoint_url)
+        async with backend.session.client("s3", endpoint_url=endpoint_url) as client:
+            with contextlib.suppress(client.exceptions.BucketAlreadyOwnedByYou, client.exceptions.BucketAlreadyExists):
+                await client.create_bucket(Bucket=BUCKET)
+
+        storage = FileStorage(backend)
+        repeat = 3 if quick else 20
+        results = []
+        for size in [1024, 1024**2] if quick else [1024, 1024**2, 16 * 1024**2]:
+            data = b"x" * size
+            path = f"bench/{size}.bin"
+
+            async def write(path: str = path, data: bytes = data) -> None:
+                await storage.write(path, data)
+
+            async def read(path: str = path) -> None:
+                async with await storage.open(path) as file:
+                    await file.read()
+
+            results.append(await measure("s3_write", write, repeat, size, size=size))
+            results.append(await measure("s3_read", read, repeat, size, size=size))
+
+        results.append(await measure("s3_exists", lambda: storage.exists("bench/1024.bin"), repeat * 5))
+        return results
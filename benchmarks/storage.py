@@ -0,0 +1,140 @@
+import tempfile
+import typing
+
+import anyio
+
+from async_storages import FileStorage, FileSystemBackend, MemoryBackend
+from async_storages.backends.base import BaseBackend
+from benchmarks.utils import Result, make_result, measure
+
+BackendFactory = typing.Callable[[str], BaseBackend]
+
+BACKENDS: dict[str, BackendFactory] = {
+    "memory": lambda tmp_dir: MemoryBackend(),
+    "fs": lambda tmp_dir: FileSystemBackend(tmp_dir, mkdirs=True),
+}
+
+
+class _ChunkedReader:
+    """Feeds data to the backend in fixed-size chunks regardless of the requested size."""
+
+    def __init__(self, data: bytes, chunk_size: int) -> None:
+        self.data = memoryview(data)
+        self.chunk_size = chunk_size
+        self.offset = 0
+
+    async def read(self, n: int = -1) -> bytes:
+        chunk = bytes(self.data[self.offset : self.offset + self.chunk_size])
+        self.offset += len(chunk)
+        return chunk
+
+
+async def _drain(storage: FileStorage, path: str, chunk_size: int) -> int:
+    total = 0
+    async with await storage.open(path) as file:
+        while chunk := await file.read(chunk_size):
+            total += len(chunk)
+    return total
+
+
+async def throughput(
+    backend: str,
+    tmp_dir: str,
+    sizes: typing.Sequence[int],
+    chunk_sizes: typing.Sequence[int],
+    repeat: int,
+) -> list[Result]:
+    storage = FileStorage(BACKENDS[backend](tmp_dir))
+    results = []
+    for size in sizes:
+        data = b"x" * size
+        for chunk_size in chunk_sizes:
+            params = {"backend": backend, "size": size, "chunk_size": chunk_size}
+            path = f"throughput/{size}-{chunk_size}.bin"
+
+            # loop variables are bound as defaults, each closure keeps the values of its iteration
+            async def write(path: str = path, data: bytes = data, chunk_size: int = chunk_size) -> None:
+                await storage.write(path, _ChunkedReader(data, chunk_size))
+
+            async def read(path: str = path, chunk_size: int = chunk_size) -> None:
+                await _drain(storage, path, chunk_size)
+
+            results.append(await measure("write_throughput", write, repeat, size, **params))
+            results.append(await measure("read_throughput", read, repeat, size, **params))
+    return results
+
+
+async def small_files(backend: str, tmp_dir: str, count: int, size: int = 128) -> list[Result]:
+    storage = FileStorage(BACKENDS[backend](tmp_dir))
+    data = b"x" * size
+    paths = [f"small/{index}.txt" for index in range(count)]
+    results = []
+    for name, func in (
+        ("small_write", lambda path: storage.write(path, data)),
+        ("small_exists", storage.exists),
+        ("small_read", lambda path: _drain(storage, path, size)),
+        ("small_delete", storage.delete),
+    ):
+        timings = []
+        started = anyio.current_time()
+        for path in paths:
+            op_started = anyio.current_time()
+            await func(path)
+            timings.append(anyio.current_time() - op_started)
+        results.append(make_result(name, anyio.current_time() - started, count, timings, backend=backend, size=size))
+    return results
+
+
+async def concurrent_readers(
+    backend: str,
+    tmp_dir: str,
+    size: int,
+    concurrency_levels: typing.Sequence[int],
+    chunk_size: int = 64 * 1024,
+) -> list[Result]:
+    storage = FileStorage(BACKENDS[backend](tmp_dir))
+    results = []
+    for concurrency in concurrency_levels:
+        # each reader gets its own file, memory backend shares a file position between readers
+        paths = [f"concurrent/{index}.bin" for index in range(concurrency)]
+        for path in paths:
+            await storage.write(path, b"x" * size)
+
+        timings: list[float] = []
+
+        async def reader(path: str, timings: list[float] = timings) -> None:
+            started = anyio.current_time()
+            await _drain(storage, path, chunk_size)
+            timings.append(anyio.current_time() - started)
+
+        started = anyio.current_time()
+        async with anyio.create_task_group() as tg:
+            for path in paths:
+                tg.start_soon(reader, path)
+        elapsed = anyio.current_time() - started
+        results.append(
+            make_result(
+                "concurrent_read",
+                elapsed,
+                concurrency,
+                timings,
+                size * concurrency,
+                backend=backend,
+                size=size,
+                concurrency=concurrency,
+            )
+        )
+    return results
+
+
+async def run(quick: bool = False) -> list[Result]:
+    sizes = [1024, 1024**2] if quick else [1024, 64 * 1024, 1024**2, 16 * 1024**2]
+    chunk_sizes = [64 * 1024] if quick else [8 * 1024, 64 * 1024, 1024**2]
+    repeat = 3 if quick else 20
+    results = []
+    for backend in BACKENDS:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            results += await throughput(backend, tmp_dir, sizes, chunk_sizes, repeat)
+            results += await small_files(backend, tmp_dir, 50 if quick else 1000)
+            results += await concurrent_readers(backend, tmp_dir, 1024**2, [1, 4] if quick else [1, 4, 16, 64])
+    return results
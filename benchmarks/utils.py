@@ -0,0 +1,46 @@
+import statistics
+import time
+import typing
+
+Result = dict[str, typing.Any]
+
+
+async def measure(
+    name: str,
+    func: typing.Callable[[], typing.Awaitable[typing.Any]],
+    repeat: int,
+    bytes_per_op: int = 0,
+    **params: typing.Any,
+) -> Result:
+    """Call `func` `repeat` times and describe the timings as a machine-readable result."""
+    await func()  # warm up caches, thread pools and connections
+    timings = []
+    started = time.perf_counter()
+    for _ in range(repeat):
+        op_started = time.perf_counter()
+        await func()
+        timings.append(time.perf_counter() - op_started)
+    elapsed = time.perf_counter() - started
+
+    return make_result(name, elapsed, repeat, timings, bytes_per_op * repeat, **params)
+
+
+def make_result(
+    name: str,
+    elapsed: float,
+    ops: int,
+    timings: typing.Sequence[float],
+    total_bytes: int = 0,
+    **params: typing.Any,
+) -> Result:
+    timings = sorted(timings)
+    return {
+        "benchmark": name,
+        "params": params,
+        "ops": ops,
+        "seconds": round(elapsed, 6),
+        "ops_per_sec": round(ops / elapsed, 3) if elapsed else None,
+        "mb_per_sec": round(total_bytes / elapsed / 1024**2, 3) if elapsed and total_bytes else None,
+        "p50_ms": round(statistics.median(timings) * 1000, 4) if timings else None,
+        "p99_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000, 4) if timings else None,
+    }
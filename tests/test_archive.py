@@ -0,0 +1,135 @@
+import gc
+import io
+import os
+import tarfile
+import zipfile
+
+import anyio
+import pytest
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.routing import Route
+from starlette.testclient import TestClient
+from starlette.types import Message
+
+from async_storages import FileStorage, MemoryBackend
+from async_storages.backends.fs import FileSystemBackend
+from async_storages.contrib.starlette import FileServer
+
+pytestmark = [pytest.mark.asyncio]
+
+FILES = {
+    "docs/readme.txt": b"hello " * 1000,
+    "images/photo.jpg": os.urandom(5000),
+    "empty.bin": b"",
+    "large.bin": os.urandom(1024 * 200),
+}
+
+
+async def _collect(storage: FileStorage, **kwargs: object) -> bytes:
+    async with storage.archive(**kwargs) as chunks:  # type: ignore[arg-type]
+        return b"".join([chunk async for chunk in chunks])
+
+
+async def _make_storage() -> FileStorage:
+    storage = FileStorage(MemoryBackend())
+    for path, content in FILES.items():
+        await storage.write(path, content)
+    return storage
+
+
+async def test_zip_archive() -> None:
+    storage = await _make_storage()
+    data = await _collect(storage, paths=list(FILES), concurrency=2, spool_max_size=1024)
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        assert archive.testzip() is None
+        assert archive.namelist() == list(FILES)
+        for path, content in FILES.items():
+            assert archive.read(path) == content
+        assert archive.getinfo("docs/readme.txt").compress_type == zipfile.ZIP_DEFLATED
+        assert archive.getinfo("docs/readme.txt").compress_size < len(FILES["docs/readme.txt"])
+        assert archive.getinfo("images/photo.jpg").compress_type == zipfile.ZIP_STORED
+
+
+async def test_tar_archive_with_renamed_entries(tmp_path: str) -> None:
+    storage = FileStorage(FileSystemBackend(tmp_path, mkdirs=True))
+    for path, content in FILES.items():
+        await storage.write(path, content)
+
+    renames = {path: f"export/{os.path.basename(path)}" for path in FILES}
+    data = await _collect(storage, paths=renames, format="tar", spool_max_size=1024)
+    assert len(data) % tarfile.RECORDSIZE == 0
+
+    with tarfile.open(fileobj=io.BytesIO(data)) as archive:
+        assert archive.getnames() == list(renames.values())
+        for path, name in renames.items():
+            member = archive.extractfile(name)
+            assert member is not None
+            assert member.read() == FILES[path]
+
+
+async def test_archive_missing_file() -> None:
+    storage = await _make_storage()
+    with pytest.raises(FileNotFoundError):
+        await _collect(storage, paths=["docs/readme.txt", "missing.txt"])
+
+
+async def test_archive_unsupported_format() -> None:
+    storage = await _make_storage()
+    with pytest.raises(ValueError):
+        await _collect(storage, paths=["empty.bin"], format="rar")
+
+
+async def test_file_server_archive_response() -> None:
+    storage = await _make_storage()
+    server = FileServer(storage)
+
+    async def download(request: Request) -> Response:
+        return server.archive_response(["docs/readme.txt", "empty.bin"], filename="files.zip")
+
+    client = TestClient(Starlette(routes=[Route("/download", download)]))
+    response = client.get("/download")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    assert response.headers["content-disposition"] == 'attachment; filename="files.zip"'
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.read("docs/readme.txt") == FILES["docs/readme.txt"]
+        assert archive.read("empty.bin") == b""
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="requires procfs")
+async def test_archive_abandoned_halfway_closes_files(tmp_path: str) -> None:
+    storage = FileStorage(FileSystemBackend(tmp_path, mkdirs=True))
+    for path, content in FILES.items():
+        await storage.write(path, content)
+    open_files = len(os.listdir("/proc/self/fd"))
+
+    for _ in range(3):
+        async with storage.archive(["large.bin", "docs/readme.txt"], format="tar", spool_max_size=1024) as chunks:
+            async for _chunk in chunks:
+                break
+    await _collect(storage, paths=list(FILES))
+    gc.collect()
+    assert len(os.listdir("/proc/self/fd")) == open_files
+
+
+async def test_archive_response_client_disconnect() -> None:
+    storage = await _make_storage()
+    response = FileServer(storage).archive_response(list(FILES), format="tar")
+    messages: list[Message] = []
+    disconnected = anyio.Event()
+
+    async def receive() -> Message:
+        await disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Message) -> None:
+        messages.append(message)
+        if message["type"] == "http.response.body":
+            disconnected.set()
+            await anyio.sleep(0.01)
+
+    await response({"type": "http"}, receive, send)
+    assert messages[-1]["more_body"] is True
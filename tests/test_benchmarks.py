@@ -0,0 +1,45 @@
+import pathlib
+
+import pytest
+
+from async_storages import FileStorage, MemoryBackend
+from benchmarks import file_server, storage
+from benchmarks.compare import compare
+from benchmarks.utils import make_result
+
+pytestmark = [pytest.mark.asyncio]
+
+
+@pytest.mark.parametrize("backend", ["memory", "fs"])
+async def test_storage_benchmarks_run(backend: str, tmp_path: pathlib.Path) -> None:
+    results = await storage.throughput(backend, str(tmp_path), [1024], [512], repeat=2)
+    results += await storage.small_files(backend, str(tmp_path), 3)
+    results += await storage.concurrent_readers(backend, str(tmp_path), 1024, [2])
+
+    assert [result["benchmark"] for result in results] == [
+        "write_throughput",
+        "read_throughput",
+        "small_write",
+        "small_exists",
+        "small_read",
+        "small_delete",
+        "concurrent_read",
+    ]
+    assert all(result["ops_per_sec"] > 0 for result in results)
+
+
+async def test_file_server_benchmark_runs() -> None:
+    results = await file_server.requests_per_second(
+        FileStorage(MemoryBackend()), "memory", 128, requests=4, concurrency=2
+    )
+    assert [result["benchmark"] for result in results] == ["file_server_hit", "file_server_miss"]
+
+
+def test_compare_detects_regressions() -> None:
+    before = {"results": [make_result("read", 1.0, 100, [0.01] * 100, backend="fs")]}
+    after = {"results": [make_result("read", 2.0, 100, [0.02] * 100, backend="fs")]}
+
+    [(key, old, new, change, regression)] = compare(before, after, threshold=0.1)
+    assert key == "read[backend=fs]"
+    assert (old, new, change, regression) == (100, 50, -0.5, True)
+    assert not compare(after, before, threshold=0.1)[0][4]
@@ -0,0 +1,109 @@
+import time
+import typing
+from unittest import mock
+
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+from async_storages import FileStorage, MemoryBackend
+from async_storages.cache import BloomFilter, ExistenceCache
+from async_storages.contrib.starlette import FileServer
+
+pytestmark = [pytest.mark.asyncio]
+
+
+class _CountingBackend(MemoryBackend):
+    def __init__(self) -> None:
+        super().__init__()
+        self.exists_calls = 0
+
+    async def exists(self, path: str) -> bool:
+        self.exists_calls += 1
+        return await super().exists(path)
+
+
+def test_bloom_filter() -> None:
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for index in range(1000):
+        bloom.add(f"file-{index}.txt")
+
+    assert all(f"file-{index}.txt" in bloom for index in range(1000))
+    false_positives = sum(f"missing-{index}.txt" in bloom for index in range(10_000))
+    assert false_positives < 300
+    assert 1 not in bloom
+
+
+def test_cache_expires_entries() -> None:
+    cache = ExistenceCache(positive_ttl=10, negative_ttl=1)
+    cache.set("present.txt", True)
+    cache.set("missing.txt", False)
+    assert cache.get("present.txt") is True
+    assert cache.get("missing.txt") is False
+
+    with mock.patch("time.monotonic", return_value=time.monotonic() + 5):
+        assert cache.get("present.txt") is True
+        assert cache.get("missing.txt") is None
+    assert cache.hits == 3
+    assert cache.misses == 1
+
+
+def test_cache_is_bounded() -> None:
+    cache = ExistenceCache(max_size=2)
+    cache.set("a", True)
+    cache.set("b", True)
+    cache.get("a")
+    cache.set("c", True)
+    assert list(cache.entries) == ["a", "c"]
+
+
+async def test_file_storage_uses_and_invalidates_cache() -> None:
+    backend = _CountingBackend()
+    storage = FileStorage(backend, exists_cache=ExistenceCache())
+
+    assert not await storage.exists("file.txt")
+    assert not await storage.exists("file.txt")
+    assert backend.exists_calls == 1
+
+    await storage.write("file.txt", b"content")
+    assert await storage.exists("file.txt")
+    assert backend.exists_calls == 1
+
+    await storage.delete("file.txt")
+    assert not await storage.exists("file.txt")
+    assert backend.exists_calls == 1
+
+
+async def test_bloom_filter_answers_misses() -> None:
+    backend = _CountingBackend()
+    cache = ExistenceCache(negative_ttl=0)
+    storage = FileStorage(backend, exists_cache=cache)
+    await storage.write("file.txt", b"content")
+
+    async def listing() -> typing.AsyncIterator[str]:
+        yield "file.txt"
+
+    await cache.load_bloom(listing(), capacity=100)
+    cache.clear()
+    assert await storage.exists("file.txt")
+    assert backend.exists_calls == 1
+
+    for index in range(10):
+        assert not await storage.exists(f"missing-{index}.txt")
+    assert backend.exists_calls == 1
+    assert cache.bloom_hits == 10
+
+    await storage.write("new.txt", b"content")
+    cache.clear()
+    assert await storage.exists("new.txt")
+
+
+async def test_file_server_404_served_from_cache() -> None:
+    backend = _CountingBackend()
+    app = Starlette(routes=[Mount("/", FileServer(FileStorage(backend, exists_cache=ExistenceCache())))])
+
+    client = TestClient(app)
+    for _ in range(5):
+        assert client.get("/missing.txt").status_code == 404
+    assert backend.exists_calls == 1
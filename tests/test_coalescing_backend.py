@@ -0,0 +1,161 @@
+import io
+import os
+
+import anyio
+import anyio.lowlevel
+import pytest
+
+from async_storages import FileStorage, MemoryBackend
+from async_storages.backends.base import AdaptedBytesIO, AsyncFileLike
+from async_storages.backends.coalescing import CoalescingBackend
+
+pytestmark = [pytest.mark.asyncio]
+
+
+class _SlowBackend(MemoryBackend):
+    """Every read gets its own stream, chunks arrive after a delay."""
+
+    def __init__(self, delay: float = 0.0) -> None:
+        super().__init__()
+        self.delay = delay
+        self.reads = 0
+        self.closed = 0
+
+    async def read(self, path: str, chunk_size: int) -> AsyncFileLike:
+        self.reads += 1
+        await anyio.sleep(self.delay)
+        file = await super().read(path, chunk_size)
+        content = await file.read()
+        backend = self
+
+        class _Stream(AdaptedBytesIO):
+            async def read(self, n: int = -1) -> bytes:
+                await anyio.sleep(backend.delay)
+                return await super().read(n)
+
+            async def __aexit__(self, *args: object) -> None:
+                backend.closed += 1
+
+        return _Stream(io.BytesIO(content))
+
+
+async def test_concurrent_readers_share_upstream_read() -> None:
+    upstream = _SlowBackend(delay=0.001)
+    content = os.urandom(1024 * 300)
+    await upstream.write("viral.bin", AdaptedBytesIO(io.BytesIO(content)))
+    backend = CoalescingBackend(upstream, chunk_size=1024 * 16)
+    results: list[bytes] = []
+
+    async def reader() -> None:
+        file = await backend.read("viral.bin", 1024 * 16)
+        async with file:
+            results.append(await file.read())
+
+    async with anyio.create_task_group() as tg:
+        for _ in range(50):
+            tg.start_soon(reader)
+
+    assert results == [content] * 50
+    assert upstream.reads == 1
+    assert upstream.closed == 1
+    assert backend.coalesced_reads == 49
+    assert not backend.flights
+
+
+async def test_slow_reader_detaches() -> None:
+    upstream = _SlowBackend()
+    content = os.urandom(1024 * 200)
+    await upstream.write("file.bin", AdaptedBytesIO(io.BytesIO(content)))
+    backend = CoalescingBackend(upstream, buffer_size=1024 * 32, chunk_size=1024 * 16)
+
+    fast = await backend.read("file.bin", 1024 * 16)
+    slow = await backend.read("file.bin", 1024 * 16)
+    assert upstream.reads == 1
+    slow_head = await slow.read(1000)
+
+    assert await fast.read() == content
+    # the buffer has moved past the slow reader, it continues with its own read
+    assert slow_head + await slow.read() == content
+    assert backend.detached == 1
+    assert upstream.reads == 2
+
+
+async def test_late_reader_starts_new_read_after_buffer_moved() -> None:
+    upstream = _SlowBackend()
+    content = os.urandom(1024 * 100)
+    await upstream.write("file.bin", AdaptedBytesIO(io.BytesIO(content)))
+    backend = CoalescingBackend(upstream, buffer_size=1024 * 16, chunk_size=1024 * 16)
+
+    first = await backend.read("file.bin", 1)
+    for _ in range(4):
+        await first.read(1024 * 16)
+    second = await backend.read("file.bin", 1)
+    assert upstream.reads == 2
+    assert await second.read() == content
+
+
+async def test_retained_bytes_and_invalidation() -> None:
+    upstream = _SlowBackend()
+    await upstream.write("small.txt", AdaptedBytesIO(io.BytesIO(b"content")))
+    backend = CoalescingBackend(upstream, retain_ttl=60)
+    storage = FileStorage(backend)
+
+    assert await (await storage.open("small.txt")).read() == b"content"
+    assert await (await storage.open("small.txt")).read() == b"content"
+    assert upstream.reads == 1
+    assert backend.retained_reads == 1
+
+    await storage.write("small.txt", b"updated")
+    assert await (await storage.open("small.txt")).read() == b"updated"
+    assert upstream.reads == 2
+
+    await storage.delete("small.txt")
+    assert not await storage.exists("small.txt")
+    with pytest.raises(FileNotFoundError):
+        await storage.open("small.txt")
+
+
+async def test_upstream_errors_reach_all_readers() -> None:
+    backend = CoalescingBackend(_SlowBackend(delay=0.01))
+    errors: list[Exception] = []
+
+    async def reader() -> None:
+        try:
+            await backend.read("missing.txt", 1)
+        except FileNotFoundError as ex:
+            errors.append(ex)
+
+    async with anyio.create_task_group() as tg:
+        for _ in range(3):
+            tg.start_soon(reader)
+
+    assert len(errors) == 3
+    assert not backend.flights
+
+
+async def test_cancelled_readers_release_shared_read() -> None:
+    upstream = _SlowBackend(delay=0.05)
+    await upstream.write("file.bin", AdaptedBytesIO(io.BytesIO(b"content")))
+    backend = CoalescingBackend(upstream)
+
+    async def cancelled_reader() -> None:
+        with anyio.move_on_after(0.01):
+            await backend.read("file.bin", 1024)
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(cancelled_reader)  # opens the shared read
+        await anyio.lowlevel.checkpoint()
+        tg.start_soon(cancelled_reader)  # joins it
+    assert not backend.flights
+
+    async def reader() -> None:
+        file = await backend.read("file.bin", 1024)
+        async with file:
+            assert await file.read(3) == b"con"  # closed before the end, the upstream is closed by the release
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(reader)
+        await anyio.lowlevel.checkpoint()
+        tg.start_soon(cancelled_reader)  # joins, cancelled before the shared read is opened
+    assert not backend.flights
+    assert upstream.closed == 1
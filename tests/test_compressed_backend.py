@@ -0,0 +1,182 @@
+import gzip
+import io
+import pathlib
+
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+from async_storages import FileStorage, FileSystemBackend, MemoryBackend
+from async_storages.backends.base import AdaptedBytesIO
+from async_storages.backends.compressed import CompressedBackend
+from async_storages.backends.s3 import S3Backend
+from async_storages.contrib.starlette import FileServer
+
+pytestmark = [pytest.mark.asyncio]
+
+
+async def test_compresses_large_files(tmp_path: pathlib.Path) -> None:
+    inner = FileSystemBackend(tmp_path, mkdirs=True)
+    storage = FileStorage(CompressedBackend(inner, min_size=10))
+    content = b'{"key": "value"}' * 1000
+    await storage.write("data/export.json", content)
+
+    assert gzip.decompress((tmp_path / "data/export.json").read_bytes()) == content
+    assert (tmp_path / ".encodings/data/export.json").read_text() == "gzip"
+    assert storage.abspath("data/export.json") == str(tmp_path / "data/export.json")
+    assert await storage.exists("data/export.json")
+    async with await storage.open("data/export.json") as file:
+        assert await file.read(5) == b'{"key'
+        assert await file.read() == content[5:]
+
+
+async def test_stores_small_files_as_is() -> None:
+    inner = MemoryBackend()
+    storage = FileStorage(CompressedBackend(inner, min_size=1024))
+    await storage.write("small.txt", b"content")
+
+    assert await inner.exists("small.txt")
+    assert "small.txt" not in inner.encodings
+    async with await storage.open("small.txt") as file:
+        assert await file.read() == b"content"
+
+
+@pytest.mark.parametrize("kind", ["fs", "memory"])
+async def test_overwrite_removes_stale_encoding(kind: str, tmp_path: pathlib.Path) -> None:
+    inner = FileSystemBackend(tmp_path, mkdirs=True) if kind == "fs" else MemoryBackend()
+    storage = FileStorage(CompressedBackend(inner, min_size=10))
+    await storage.write("file.txt", b"a" * 100)
+    await storage.write("file.txt", b"small")
+
+    assert not await inner.exists(".encodings/file.txt")
+    async with await storage.open("file.txt") as file:
+        assert await file.read() == b"small"
+
+    await storage.write("file.txt", b"a" * 100)
+    await storage.delete("file.txt")
+    assert not await storage.exists("file.txt")
+    assert not await inner.exists(".encodings/file.txt")
+    assert [info.path async for info in storage.list()] == []
+
+
+async def test_data_and_marker_out_of_step(tmp_path: pathlib.Path) -> None:
+    inner = FileSystemBackend(tmp_path, mkdirs=True)
+    storage = FileStorage(CompressedBackend(inner, min_size=10))
+
+    # the marker of a compressed file is written, the data is not replaced yet
+    await storage.write("file.txt", b"old")
+    (tmp_path / ".encodings").mkdir()
+    (tmp_path / ".encodings/file.txt").write_text("gzip")
+    async with await storage.open("file.txt") as file:
+        assert await file.read() == b"old"
+
+    # small data replaced a compressed file, removing the marker failed
+    await storage.write("file.txt", b"a" * 100)
+    (tmp_path / "file.txt").write_bytes(b"new")
+    async with await storage.open("file.txt") as file:
+        assert await file.read() == b"new"
+
+
+async def test_s3_stores_content_encoding(storage: S3Backend) -> None:
+    file_storage = FileStorage(CompressedBackend(storage, min_size=10))
+    content = b"content" * 100
+    await file_storage.write("compressed/file.txt", content)
+    await file_storage.write("compressed/small.txt", b"small")
+
+    async with storage.client() as client:
+        head = await client.head_object(Bucket=storage.bucket, Key="compressed/file.txt")
+        assert head["ContentEncoding"] == "gzip"
+        assert "ContentEncoding" not in await client.head_object(Bucket=storage.bucket, Key="compressed/small.txt")
+    async with await file_storage.open("compressed/file.txt") as file:
+        assert await file.read() == content
+    assert not await storage.exists(".encodings/compressed/file.txt")
+
+    # served by the app, a redirect to the object would send gzip bytes to clients not accepting them
+    client = TestClient(Starlette(routes=[Mount("/", FileServer(file_storage))]))
+    response = client.get("/compressed/file.txt", headers={"accept-encoding": "identity"}, follow_redirects=False)
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.content == content
+    assert client.get("/compressed/missing.txt", follow_redirects=False).status_code == 404
+
+    await file_storage.delete("compressed/file.txt")
+    await file_storage.delete("compressed/small.txt")
+
+
+async def test_read_encoded_returns_compressed_bytes() -> None:
+    backend = CompressedBackend(MemoryBackend(), min_size=0, level=9)
+    await backend.write("file.txt", AdaptedBytesIO(io.BytesIO(b"content")))
+
+    file, encoding = await backend.read_encoded("file.txt", 1024, {"gzip"})
+    assert encoding == "gzip"
+    assert gzip.decompress(await file.read()) == b"content"
+
+
+async def test_missing_file() -> None:
+    storage = FileStorage(CompressedBackend(MemoryBackend()))
+    assert not await storage.exists("missing.txt")
+    with pytest.raises(FileNotFoundError):
+        await storage.open("missing.txt")
+
+
+async def test_zstd() -> None:
+    pytest.importorskip("zstandard")
+    storage = FileStorage(CompressedBackend(MemoryBackend(), encoding="zstd", min_size=0))
+    await storage.write("file.txt", b"content")
+    async with await storage.open("file.txt") as file:
+        assert await file.read() == b"content"
+
+
+async def test_file_server_sends_precompressed_content() -> None:
+    storage = FileStorage(CompressedBackend(MemoryBackend(), min_size=0))
+    await storage.write("data.json", b'{"key": "value"}')
+    app = Starlette(routes=[Mount("/", FileServer(storage))])
+
+    client = TestClient(app)
+    response = client.get("/data.json", headers={"accept-encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text == '{"key": "value"}'  # decoded by the client
+
+    response = client.get("/data.json", headers={"accept-encoding": "gzip;q=0, identity"})
+    assert "content-encoding" not in response.headers
+    assert response.text == '{"key": "value"}'
+
+
+async def test_list_returns_original_names() -> None:
+    storage = FileStorage(CompressedBackend(MemoryBackend(), min_size=10))
+    await storage.write("docs/large.txt", b"x" * 100)
+    await storage.write("docs/small.txt", b"x")
+    await storage.write("other/file.txt", b"x" * 100)
+
+    assert [info.path async for info in storage.list("docs/")] == ["docs/large.txt", "docs/small.txt"]
+    assert [info.path async for info in storage.list("docs/large.txt")] == ["docs/large.txt"]
+
+
+async def test_files_with_encoding_suffixes_are_distinct() -> None:
+    storage = FileStorage(CompressedBackend(MemoryBackend(), min_size=10))
+    await storage.write("backup.tar", b"x" * 100)
+    await storage.write("backup.tar.gz", gzip.compress(b"y" * 100))
+
+    async with await storage.open("backup.tar") as file:
+        assert await file.read() == b"x" * 100
+    async with await storage.open("backup.tar.gz") as file:
+        assert gzip.decompress(await file.read()) == b"y" * 100
+
+    await storage.delete("backup.tar.gz")
+    assert await storage.exists("backup.tar")
+
+
+async def test_copy_keeps_encoding() -> None:
+    inner = MemoryBackend()
+    storage = FileStorage(CompressedBackend(inner, min_size=10))
+    await storage.write("large.txt", b"x" * 100)
+    await storage.write("small.txt", b"x")
+    await storage.copy("large.txt", "copy.txt")
+    await storage.copy("small.txt", "large.txt")
+
+    async with await storage.open("copy.txt") as file:
+        assert await file.read() == b"x" * 100
+    async with await storage.open("large.txt") as file:
+        assert await file.read() == b"x"
+    assert [info.path async for info in storage.list()] == ["copy.txt", "large.txt", "small.txt"]
@@ -4,6 +4,7 @@ import uuid
 from unittest import mock
 
 from async_storages import generate_file_path
+from async_storages.helpers import PathTemplate, compile_template
 
 
 def test_generate_file_path() -> None:
@@ -23,3 +24,38 @@ def test_generate_file_path() -> None:
     with mock.patch("async_storages.helpers.time.time", lambda: timestamp):
         expected = f"/media/{timestamp}/myfile.txt"
         assert generate_file_path("myfile.txt", "/media/{timestamp}/{file_name}") == expected
+
+
+def test_path_template_evaluates_only_used_tokens() -> None:
+    template = PathTemplate("/media/{name}.{extension}")
+    with mock.patch("uuid.uuid4") as uuid_mock, mock.patch("async_storages.helpers._get_now") as now_mock:
+        assert template.render("myfile.txt") == "/media/myfile.txt"
+        uuid_mock.assert_not_called()
+        now_mock.assert_not_called()
+
+
+def test_path_template_supports_format_spec_and_extra_tokens() -> None:
+    template = PathTemplate("/{user_id:05d}/{name!r}/{meta[kind]}/{file_name}")
+    assert template.render("my file.txt", {"user_id": 42, "meta": {"kind": "avatar"}}) == (
+        "/00042/'my file'/avatar/my file.txt"
+    )
+
+    template = PathTemplate("/{user_id:05d}/{name!r}")
+    assert template.render("myfile.txt", {"user_id": 42}) == "/00042/'myfile'"
+
+
+def test_path_template_render_many() -> None:
+    today = datetime.datetime.now()
+    now_mock = mock.Mock(return_value=today)
+    with mock.patch("async_storages.helpers._get_now", now_mock):
+        paths = PathTemplate("/{date}/{file_name}").render_many(["a.txt", "b.txt"])
+
+    assert paths == [f"/{today.date()}/a.txt", f"/{today.date()}/b.txt"]
+    now_mock.assert_called_once()
+
+
+def test_generate_file_path_reuses_compiled_template() -> None:
+    compile_template.cache_clear()
+    generate_file_path("a.txt", "/media/{file_name}")
+    generate_file_path("b.txt", "/media/{file_name}")
+    assert compile_template.cache_info().hits == 1
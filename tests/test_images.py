@@ -0,0 +1,110 @@
+import io
+
+import anyio
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+from async_storages import FileStorage, MemoryBackend
+from async_storages.contrib.images import ImageDerivatives, resize_image
+from async_storages.contrib.starlette import FileServer
+
+Image = pytest.importorskip("PIL.Image")
+
+pytestmark = [pytest.mark.asyncio]
+
+
+def _make_image(width: int, height: int, format: str = "JPEG") -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", (width, height), "red").save(output, format=format)
+    return output.getvalue()
+
+
+def _size(data: bytes) -> tuple[int, int]:
+    size: tuple[int, int] = Image.open(io.BytesIO(data)).size
+    return size
+
+
+def test_resize_image() -> None:
+    assert _size(resize_image(_make_image(800, 600), 320, None, 85)) == (320, 240)
+    assert _size(resize_image(_make_image(800, 600), None, 60, 85)) == (80, 60)
+    assert _size(resize_image(_make_image(800, 600), 100, 100, 85)) == (100, 75)
+    # never upscaled
+    assert _size(resize_image(_make_image(80, 60, "PNG"), 320, None, 85)) == (80, 60)
+    with pytest.raises(ValueError):
+        resize_image(b"not an image", 100, None, 85)
+    with pytest.raises(ValueError, match="damaged"):
+        resize_image(_make_image(800, 600)[:1000], 100, None, 85)
+
+
+def test_resize_image_rejects_decompression_bombs(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+    with pytest.raises(ValueError, match="too large"):
+        resize_image(_make_image(800, 600), 100, None, 85)
+
+
+async def test_derivatives_are_generated_once() -> None:
+    storage = FileStorage(MemoryBackend())
+    await storage.write("photo.jpg", _make_image(800, 600))
+    derivatives = ImageDerivatives(storage, use_processes=False)
+    paths: list[str] = []
+
+    async def request() -> None:
+        paths.append(await derivatives.get("photo.jpg", width=320))
+
+    async with anyio.create_task_group() as tg:
+        for _ in range(10):
+            tg.start_soon(request)
+
+    assert paths == ["_derivatives/320x0/photo.jpg"] * 10
+    assert derivatives.generated == 1
+    assert _size(await (await storage.open(paths[0])).read()) == (320, 240)
+
+    await derivatives.delete_variants("photo.jpg")
+    assert not await storage.exists(paths[0])
+    assert await storage.exists("photo.jpg")
+
+
+async def test_derivatives_in_process_pool() -> None:
+    storage = FileStorage(MemoryBackend())
+    await storage.write("photo.png", _make_image(400, 400, "PNG"))
+    derivatives = ImageDerivatives(storage, prefix="thumbs", sizes=[100])
+    path = await derivatives.get("photo.png", height=100)
+    assert path == "thumbs/0x100/photo.png"
+    assert _size(await (await storage.open(path)).read()) == (100, 100)
+
+
+async def test_derivative_sizes_are_validated() -> None:
+    derivatives = ImageDerivatives(FileStorage(MemoryBackend()), sizes=[160, 320], use_processes=False)
+    for width, height in ((None, None), (100, None), (320, 5000)):
+        with pytest.raises(ValueError):
+            await derivatives.get("photo.jpg", width, height)
+    # by default only a few sizes are allowed
+    with pytest.raises(ValueError):
+        await ImageDerivatives(FileStorage(MemoryBackend()), use_processes=False).get("photo.jpg", 321)
+    with pytest.raises(FileNotFoundError):
+        await derivatives.get("photo.jpg", 160)
+
+
+async def test_file_server_serves_derivatives() -> None:
+    storage = FileStorage(MemoryBackend())
+    await storage.write("media/photo.jpg", _make_image(800, 600))
+    await storage.write("notes.txt", b"text")
+    await storage.write("media/damaged.jpg", _make_image(800, 600)[:1000])
+    derivatives = ImageDerivatives(storage, sizes=[320], use_processes=False)
+    client = TestClient(Starlette(routes=[Mount("/", FileServer(storage, derivatives=derivatives))]))
+
+    response = client.get("/media/photo.jpg?w=320")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/jpeg"
+    assert _size(response.content) == (320, 240)
+    assert client.get("/media/photo.jpg?w=320").content == response.content
+    assert derivatives.generated == 1
+
+    assert _size(client.get("/media/photo.jpg").content) == (800, 600)
+    assert client.get("/media/photo.jpg?w=100").status_code == 400
+    assert client.get("/media/photo.jpg?w=abc").status_code == 400
+    assert client.get("/media/missing.jpg?w=320").status_code == 404
+    assert client.get("/notes.txt?w=320").status_code == 400
+    assert client.get("/media/damaged.jpg?w=320").status_code == 400
@@ -0,0 +1,45 @@
+import subprocess
+import sys
+
+from benchmarks.import_time import measure
+
+
+def _loaded_modules(code: str) -> set[str]:
+    script = code + "\nimport sys; print(' '.join(sys.modules))"
+    return set(subprocess.check_output([sys.executable, "-c", script], text=True).split())
+
+
+def test_import_does_not_load_backends_and_helpers() -> None:
+    modules = _loaded_modules("import async_storages")
+    assert "aioboto3" not in modules
+    assert "botocore" not in modules
+    assert "sanitize_filename" not in modules
+    assert "async_storages.backends.s3" not in modules
+
+
+def test_lazy_attributes_resolve() -> None:
+    import async_storages
+    from async_storages.backends.memory import MemoryBackend
+
+    assert async_storages.MemoryBackend is MemoryBackend
+    assert callable(async_storages.sanitize_filename.sanitize)
+    assert "FileStorage" in dir(async_storages)
+
+
+def test_s3_backend_imports_aioboto3_on_first_use() -> None:
+    modules = _loaded_modules(
+        "from async_storages import S3Backend; S3Backend('bucket', 'key', 'secret', endpoint_url='http://localhost')"
+    )
+    assert "aioboto3" not in modules
+    assert "botocore" not in modules
+
+
+def test_file_server_import_does_not_load_backends() -> None:
+    modules = _loaded_modules("import async_storages.contrib.starlette")
+    assert "async_storages.backends.memory" not in modules
+    assert "async_storages.backends.s3" not in modules
+
+
+def test_import_time_benchmark() -> None:
+    result = measure(runs=1)
+    assert result["heavy_modules_loaded"] == []
@@ -0,0 +1,89 @@
+import pathlib
+
+import pytest
+
+from async_storages import FileStorage, FileSystemBackend, MemoryBackend
+from async_storages.instrumentation import (
+    Histogram,
+    Hook,
+    InstrumentedBackend,
+    MetricsCollector,
+    OperationEvent,
+)
+
+pytestmark = [pytest.mark.asyncio]
+
+
+class _RecordingHook(Hook):
+    def __init__(self) -> None:
+        self.started: list[OperationEvent] = []
+        self.ended: list[OperationEvent] = []
+
+    def on_start(self, event: OperationEvent) -> None:
+        self.started.append(event)
+
+    def on_end(self, event: OperationEvent) -> None:
+        self.ended.append(event)
+
+
+async def test_file_storage_reports_operations() -> None:
+    hook = _RecordingHook()
+    store = FileStorage(MemoryBackend(spool_max_size=1), hooks=[hook])
+    await store.write("file.txt", b"content")
+    assert await store.exists("file.txt")
+    async with await store.open("file.txt") as file:
+        assert await file.read(3) == b"con"
+        assert await file.read(10) == b"tent"
+    await store.url("file.txt")
+    await store.delete("file.txt")
+
+    assert [event.operation for event in hook.started] == ["write", "exists", "read", "url", "delete"]
+    assert [event.operation for event in hook.ended] == ["write", "exists", "read", "url", "delete"]
+    write, _, read, *_ = hook.ended
+    assert write.bytes == 7
+    assert write.chunks == 1
+    assert write.thread_hops > 0  # rolled spooled file is written in a thread
+    assert write.source == "FileStorage"
+    assert read.bytes == 7
+    assert read.chunks == 2
+    assert all(event.duration >= 0 and event.error is None for event in hook.ended)
+
+
+async def test_reports_errors() -> None:
+    hook = _RecordingHook()
+    store = FileStorage(MemoryBackend(), hooks=[hook])
+    with pytest.raises(FileNotFoundError):
+        await store.open("missing.txt")
+
+    assert isinstance(hook.ended[0].error, FileNotFoundError)
+
+
+async def test_instrumented_backend_and_metrics(tmp_path: pathlib.Path) -> None:
+    collector = MetricsCollector()
+    backend = InstrumentedBackend(FileSystemBackend(tmp_path), [collector])
+    store = FileStorage(backend)
+    await store.write("file.txt", b"content")
+    await store.exists("file.txt")
+    await store.exists("missing.txt")
+    async for _ in await store.iterator("file.txt"):
+        pass
+
+    snapshot = collector.snapshot()
+    assert snapshot["FileSystemBackend.write"]["bytes"] == 7
+    assert snapshot["FileSystemBackend.write"]["thread_hops"] == 5  # 2 source reads, open, write, close
+    assert snapshot["FileSystemBackend.exists"]["calls"] == 2
+    assert snapshot["FileSystemBackend.read"]["bytes"] == 7
+    assert snapshot["FileSystemBackend.read"]["thread_hops"] > 0
+    assert collector.in_flight == 0
+
+
+def test_histogram_quantiles() -> None:
+    histogram = Histogram(buckets=[0.1, 1])
+    for value in [0.05, 0.05, 0.5, 5]:
+        histogram.observe(value)
+
+    assert histogram.count == 4
+    assert histogram.quantile(0.5) == 0.1
+    assert histogram.quantile(0.75) == 1
+    assert histogram.quantile(1) == float("inf")
+    assert Histogram().quantile(0.5) == 0
@@ -0,0 +1,68 @@
+import gzip
+import hashlib
+
+import pytest
+
+from async_storages import FileStorage, MemoryBackend
+from async_storages.pipeline import GzipStage, HashStage, SizeStage, TransformStage, ZstdStage
+
+pytestmark = [pytest.mark.asyncio]
+
+
+def _upper(chunk: bytes) -> bytes:
+    return chunk.upper()
+
+
+async def test_pipeline_compresses_while_writing() -> None:
+    store = FileStorage(MemoryBackend())
+    content = b"content" * 10_000
+    await store.write("test.txt.gz", content, stages=[GzipStage()])
+
+    async with await store.open("test.txt.gz") as file:
+        assert gzip.decompress(await file.read()) == content
+
+
+async def test_pipeline_hashes_and_counts_in_one_pass() -> None:
+    store = FileStorage(MemoryBackend())
+    content = b"content" * 100_000
+    hasher = HashStage("sha256")
+    source_size = SizeStage()
+    stored_size = SizeStage()
+    await store.write("test.txt.gz", content, stages=[source_size, hasher, GzipStage(), stored_size])
+
+    assert hasher.hexdigest() == hashlib.sha256(content).hexdigest()
+    assert source_size.size == len(content)
+    assert source_size.chunks == len(content) // (1024 * 64) + 1
+    async with await store.open("test.txt.gz") as file:
+        assert len(await file.read()) == stored_size.size
+
+
+async def test_pipeline_custom_transform_with_flush() -> None:
+    store = FileStorage(MemoryBackend())
+    await store.write("test.txt", b"content", stages=[TransformStage(_upper, flush=lambda: b"!", offload="thread")])
+
+    async with await store.open("test.txt") as file:
+        assert await file.read() == b"CONTENT!"
+
+
+async def test_pipeline_offloads_to_process() -> None:
+    store = FileStorage(MemoryBackend())
+    # the flush function is not picklable, only the transform function is sent to the pool
+    await store.write("test.txt", b"content", stages=[TransformStage(_upper, flush=lambda: b"!", offload="process")])
+
+    async with await store.open("test.txt") as file:
+        assert await file.read() == b"CONTENT!"
+
+    stage = SizeStage()
+    stage.offload = "process"
+    with pytest.raises(TypeError):
+        await store.write("test.txt", b"content", stages=[stage])
+
+
+async def test_pipeline_zstd() -> None:
+    zstandard = pytest.importorskip("zstandard")
+    store = FileStorage(MemoryBackend())
+    await store.write("test.txt.zst", b"content", stages=[ZstdStage()])
+
+    async with await store.open("test.txt.zst") as file:
+        assert zstandard.ZstdDecompressor().decompressobj().decompress(await file.read()) == b"content"
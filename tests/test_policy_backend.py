@@ -0,0 +1,226 @@
+import io
+import math
+
+import anyio
+import pytest
+
+from async_storages import FileStorage, MemoryBackend
+from async_storages.backends.base import AdaptedBytesIO, AsyncFileLike, AsyncReader
+from async_storages.backends.policy import CircuitBreaker, CircuitOpenError, PolicyBackend, RetryBudget, is_retryable
+
+pytestmark = [pytest.mark.asyncio]
+
+
+class _FlakyBackend(MemoryBackend):
+    def __init__(self, failures: int = 0, delays: list[float] | None = None) -> None:
+        super().__init__()
+        self.failures = failures
+        self.delays = delays or []
+        self.calls = 0
+
+    async def exists(self, path: str) -> bool:
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("Service unavailable")
+        return await super().exists(path)
+
+    async def read(self, path: str, chunk_size: int) -> AsyncFileLike:
+        self.calls += 1
+        if self.delays:
+            await anyio.sleep(self.delays.pop(0))
+        return await super().read(path, chunk_size)
+
+
+async def test_retries_transient_errors() -> None:
+    backend = PolicyBackend(_FlakyBackend(failures=2), backoff_base=0)
+    assert not await backend.exists("file.txt")
+    assert backend.get_stats("exists").retries == 2
+    assert backend.get_stats("exists").failures == 2
+
+
+async def test_gives_up_after_max_attempts() -> None:
+    backend = PolicyBackend(_FlakyBackend(failures=5), backoff_base=0, max_attempts=3)
+    with pytest.raises(ConnectionError):
+        await backend.exists("file.txt")
+    assert backend.get_stats("exists").retries == 2
+
+
+async def test_does_not_retry_missing_files() -> None:
+    backend = PolicyBackend(MemoryBackend(), backoff_base=0)
+    with pytest.raises(FileNotFoundError):
+        await backend.read("missing.txt", 1024)
+    assert backend.get_stats("read").retries == 0
+    assert backend.circuit_breaker.state == "closed"
+
+
+async def test_missing_files_do_not_reset_circuit_breaker() -> None:
+    backend = PolicyBackend(_FlakyBackend(failures=1), max_attempts=1)
+    with pytest.raises(ConnectionError):
+        await backend.exists("file.txt")
+    with pytest.raises(FileNotFoundError):
+        await backend.read("missing.txt", 1024)
+    assert backend.circuit_breaker.failures == 1
+
+
+async def test_retry_budget_prevents_retry_storm() -> None:
+    backend = PolicyBackend(_FlakyBackend(failures=100), backoff_base=0, retry_budget=RetryBudget(min_tokens=1))
+    with pytest.raises(ConnectionError):
+        await backend.exists("file.txt")
+    assert backend.get_stats("exists").retries == 1
+    assert backend.get_stats("exists").retries_rejected == 1
+
+
+async def test_applies_timeouts() -> None:
+    backend = PolicyBackend(_FlakyBackend(delays=[1, 1]), timeouts={"read": 0.01}, max_attempts=2, backoff_base=0)
+    with pytest.raises(TimeoutError):
+        await backend.read("file.txt", 1024)
+    assert backend.get_stats("read").timeouts == 2
+
+
+async def test_streaming_uploads_have_no_default_timeout() -> None:
+    class _SlowWrites(MemoryBackend):
+        async def write(self, path: str, data: AsyncReader) -> None:
+            await anyio.sleep(0.05)
+            await super().write(path, data)
+
+    backend = PolicyBackend(_SlowWrites(), default_timeout=0.01)
+    await FileStorage(backend).write("file.txt", b"content")
+    assert backend.get_timeout("write") == math.inf
+    assert backend.get_timeout("append_upload") == math.inf
+    assert backend.get_timeout("read") == 0.01
+    assert PolicyBackend(MemoryBackend(), timeouts={"write": 5}).get_timeout("write") == 5
+
+
+async def test_circuit_breaker_opens_and_recovers() -> None:
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    inner = _FlakyBackend(failures=2)
+    backend = PolicyBackend(inner, max_attempts=1, circuit_breaker=breaker)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            await backend.exists("file.txt")
+
+    with pytest.raises(CircuitOpenError):
+        await backend.exists("file.txt")
+    assert inner.calls == 2
+    assert backend.get_stats("exists").circuit_opened == 1
+    assert backend.get_stats("exists").circuit_rejected == 1
+
+    await anyio.sleep(0.05)
+    assert breaker.state == "half-open"
+    assert not await backend.exists("file.txt")
+    assert breaker.opened_at is None
+
+
+async def test_only_trial_call_releases_trial() -> None:
+    class _SlowBackend(_FlakyBackend):
+        async def exists(self, path: str) -> bool:
+            await anyio.sleep(1)
+            return await super().exists(path)
+
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.01)
+    inner = _SlowBackend(delays=[0.05])
+    backend = PolicyBackend(inner, max_attempts=1, circuit_breaker=breaker)
+
+    async def cancelled_call() -> None:
+        with anyio.CancelScope() as scope:
+            old_scopes.append(scope)
+            await backend.exists("old.txt")
+
+    async def missing_file() -> None:
+        with pytest.raises(FileNotFoundError):
+            await backend.read("missing.txt", 1024)
+
+    old_scopes: list[anyio.CancelScope] = []
+    async with anyio.create_task_group() as tg:
+        # calls started while the circuit is closed, they end while the trial is in flight
+        tg.start_soon(cancelled_call)
+        tg.start_soon(missing_file)
+        await anyio.wait_all_tasks_blocked()
+        breaker.record_failure()
+        await anyio.sleep(0.01)
+        assert breaker.state == "half-open"
+
+        tg.start_soon(backend.exists, "trial.txt")
+        await anyio.wait_all_tasks_blocked()
+        assert breaker.trial_in_flight
+        old_scopes[0].cancel()
+        await anyio.sleep(0.05)  # the read fails with FileNotFoundError meanwhile
+
+        assert breaker.trial_in_flight
+        with pytest.raises(CircuitOpenError):
+            await backend.exists("file.txt")
+        tg.cancel_scope.cancel()
+
+    assert not breaker.trial_in_flight  # the cancelled trial lets another call try
+
+
+async def test_hedged_read_wins_over_slow_request() -> None:
+    inner = _FlakyBackend(delays=[1, 0])
+    await inner.write("file.txt", AdaptedBytesIO(io.BytesIO(b"content")))
+    backend = PolicyBackend(inner, hedge_after=0.01)
+
+    with anyio.fail_after(0.5):
+        file = await FileStorage(backend).open("file.txt")
+    assert await file.read() == b"content"
+    assert backend.get_stats("read").hedged == 1
+    assert backend.get_stats("read").hedge_wins == 1
+    assert backend.get_stats("read").calls == 1
+
+
+async def test_hedge_not_sent_for_fast_reads() -> None:
+    inner = _FlakyBackend()
+    await inner.write("file.txt", AdaptedBytesIO(io.BytesIO(b"content")))
+    backend = PolicyBackend(inner, hedge_after=0.5)
+
+    file = await backend.read("file.txt", 1024)
+    assert await file.read() == b"content"
+    assert backend.get_stats("read").hedged == 0
+    assert inner.calls == 1
+
+
+async def test_hedged_read_is_one_call() -> None:
+    class _FailingFirstRead(_FlakyBackend):
+        async def read(self, path: str, chunk_size: int) -> AsyncFileLike:
+            if self.calls == 0:
+                self.calls += 1
+                raise ConnectionError("Service unavailable")
+            return await super().read(path, chunk_size)
+
+    inner = _FailingFirstRead()
+    await inner.write("file.txt", AdaptedBytesIO(io.BytesIO(b"content")))
+    backend = PolicyBackend(inner, hedge_after=0.5, backoff_base=0)
+
+    file = await backend.read("file.txt", 1024)
+    assert await file.read() == b"content"
+    stats = backend.get_stats("read")
+    # the failed request is retried by the call, not hedged
+    assert (stats.calls, stats.retries, stats.hedged) == (1, 1, 0)
+    assert inner.calls == 2
+
+
+def test_s3_transport_errors_are_retryable() -> None:
+    from aiohttp import ServerDisconnectedError
+    from botocore.exceptions import ConnectTimeoutError, EndpointConnectionError, ReadTimeoutError
+
+    for exc in (
+        EndpointConnectionError(endpoint_url="http://s3"),
+        ConnectTimeoutError(endpoint_url="http://s3"),
+        ReadTimeoutError(endpoint_url="http://s3"),
+        ServerDisconnectedError(),
+    ):
+        assert is_retryable(exc), exc
+    assert not is_retryable(ValueError("invalid"))
+
+
+async def test_s3_transport_errors_open_circuit() -> None:
+    from botocore.exceptions import EndpointConnectionError
+
+    class _Unreachable(MemoryBackend):
+        async def exists(self, path: str) -> bool:
+            raise EndpointConnectionError(endpoint_url="http://s3")
+
+    backend = PolicyBackend(_Unreachable(), backoff_base=0, circuit_breaker=CircuitBreaker(failure_threshold=3))
+    with pytest.raises(EndpointConnectionError):
+        await backend.exists("file.txt")
+    assert backend.get_stats("exists").retries == 2
+    assert backend.circuit_breaker.state == "open"
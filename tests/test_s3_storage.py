@@ -4,6 +4,10 @@ import pytest
 
 from async_storages.backends.base import AdaptedBytesIO
 from async_storages.backends.s3 import S3Backend
+from async_storages.file_storage import FileStorage
+from async_storages.sync import sync
+from async_storages.usage import Usage, UsageIndex
+from tests.conftest import AWS_ACCESS_KEY_ID, AWS_ENDPOINT_URL, AWS_SECRET_ACCESS_KEY
 
 pytestmark = [pytest.mark.asyncio]
 
@@ -24,3 +28,45 @@ async def test_operations(storage: S3Backend) -> None:
 async def test_s3_raises_file_error_for_missing_key(storage: S3Backend) -> None:
     with pytest.raises(FileNotFoundError):
         await storage.read("missing-file.txt", 1)
+
+
+async def test_s3_list_and_copy(storage: S3Backend) -> None:
+    await storage.write("listing/a.txt", AdaptedBytesIO(io.BytesIO(b"content")))
+    await storage.copy("listing/a.txt", "listing/b.txt")
+
+    files = [info async for info in storage.list("listing/")]
+    assert [(info.path, info.size) for info in files] == [("listing/a.txt", 7), ("listing/b.txt", 7)]
+    assert files[0].etag == files[1].etag
+    assert files[0].mtime
+
+    with pytest.raises(FileNotFoundError):
+        await storage.copy("listing/missing.txt", "listing/c.txt")
+    await storage.delete("listing/a.txt")
+    await storage.delete("listing/b.txt")
+
+
+async def test_sync_between_buckets_records_usage(storage: S3Backend) -> None:
+    other = S3Backend(
+        bucket="asyncstorages-sync",
+        aws_access_key_id=AWS_ACCESS_KEY_ID,
+        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+        endpoint_url=AWS_ENDPOINT_URL,
+    )
+    async with other.client() as client:
+        try:
+            await client.create_bucket(Bucket="asyncstorages-sync")
+        except client.exceptions.BucketAlreadyOwnedByYou:
+            pass
+    await storage.write("sync/a.txt", AdaptedBytesIO(io.BytesIO(b"content")))
+    try:
+        usage = UsageIndex()
+        report = await sync(FileStorage(storage), FileStorage(other, usage=usage), "sync/")
+        assert report.server_side
+        assert report.copied == ["sync/a.txt"]
+        assert await usage.usage("sync/") == Usage(7, 1)
+
+        report = await sync(FileStorage(storage), FileStorage(other, usage=usage), "sync/")
+        assert report.skipped == 1
+    finally:
+        await storage.delete("sync/a.txt")
+        await other.delete("sync/a.txt")
@@ -0,0 +1,172 @@
+import json
+import pathlib
+import typing
+
+import pytest
+
+from async_storages import FileStorage, MemoryBackend
+from async_storages.backends.base import AsyncReader, FileInfo
+from async_storages.backends.fs import FileSystemBackend
+from async_storages.instrumentation import Hook, OperationEvent
+from async_storages.sync import is_changed, sync
+from async_storages.usage import QuotaExceededError, Usage, UsageIndex
+
+pytestmark = [pytest.mark.asyncio]
+
+
+class _RecordingHook(Hook):
+    def __init__(self) -> None:
+        self.ended: list[OperationEvent] = []
+
+    def on_end(self, event: OperationEvent) -> None:
+        self.ended.append(event)
+
+
+class _FailingBackend(MemoryBackend):
+    def __init__(self, fail_on: str) -> None:
+        super().__init__()
+        self.fail_on = fail_on
+        self.copied: list[str] = []
+
+    async def write(self, path: str, data: AsyncReader) -> None:
+        if path == self.fail_on:
+            raise ConnectionError("upload failed")
+        self.copied.append(path)
+        await super().write(path, data)
+
+
+def test_is_changed() -> None:
+    source = FileInfo("a.txt", 10, etag="abc", mtime=100)
+    assert is_changed(source, None)
+    assert is_changed(source, FileInfo("a.txt", 11))
+    assert not is_changed(source, FileInfo("a.txt", 10, etag="abc", mtime=50))
+    assert is_changed(source, FileInfo("a.txt", 10, etag="def", mtime=200))
+    assert is_changed(FileInfo("a.txt", 10, mtime=100), FileInfo("a.txt", 10, mtime=50))
+    assert not is_changed(FileInfo("a.txt", 10, mtime=100), FileInfo("a.txt", 10, mtime=150))
+    assert not is_changed(FileInfo("a.txt", 10), FileInfo("a.txt", 10))
+    # multipart uploads to another account get other etags
+    assert not is_changed(source, FileInfo("a.txt", 10, etag="def-2", mtime=200), compare_etags=False)
+
+
+async def test_list(tmp_path: pathlib.Path) -> None:
+    for storage in (FileStorage(MemoryBackend()), FileStorage(FileSystemBackend(tmp_path, mkdirs=True))):
+        await storage.write("docs/a.txt", b"a")
+        await storage.write("docs/nested/b.txt", b"bb")
+        await storage.write("docs-c.txt", b"ccc")
+        await storage.write("other.txt", b"dddd")
+
+        files = [info async for info in storage.list("docs")]
+        assert [(info.path, info.size) for info in files] == [
+            ("docs-c.txt", 3),
+            ("docs/a.txt", 1),
+            ("docs/nested/b.txt", 2),
+        ]
+        assert all(info.mtime for info in files)
+        assert [info.path async for info in storage.list("docs/nested/")] == ["docs/nested/b.txt"]
+
+
+async def test_copy(tmp_path: pathlib.Path) -> None:
+    for storage in (FileStorage(MemoryBackend()), FileStorage(FileSystemBackend(tmp_path, mkdirs=True))):
+        await storage.write("a.txt", b"content")
+        await storage.copy("a.txt", "copies/a.txt")
+        assert await (await storage.open("copies/a.txt")).read() == b"content"
+        assert await (await storage.open("a.txt")).read() == b"content"
+        with pytest.raises(FileNotFoundError):
+            await storage.copy("missing.txt", "b.txt")
+
+
+async def test_sync(tmp_path: pathlib.Path) -> None:
+    source = FileStorage(FileSystemBackend(tmp_path, mkdirs=True))
+    dest = FileStorage(MemoryBackend())
+    for index in range(20):
+        await source.write(f"files/{index}.txt", b"x" * index)
+    await dest.write("files/stale.txt", b"stale")
+
+    report = await sync(source, dest, "files/", concurrency=4)
+    assert sorted(report.copied) == sorted(f"files/{index}.txt" for index in range(20))
+    assert report.bytes == sum(range(20))
+    assert report.throughput > 0
+    assert not report.server_side
+    assert await (await dest.open("files/5.txt")).read() == b"xxxxx"
+
+    await source.write("files/5.txt", b"changed")
+    report = await sync(source, dest, "files/", delete=True)
+    assert report.copied == ["files/5.txt"]
+    assert report.skipped == 19
+    assert report.deleted == ["files/stale.txt"]
+    assert not await dest.exists("files/stale.txt")
+    assert await (await dest.open("files/5.txt")).read() == b"changed"
+
+
+async def test_sync_dry_run() -> None:
+    source, dest = FileStorage(MemoryBackend()), FileStorage(MemoryBackend())
+    await source.write("a.txt", b"a")
+    await dest.write("b.txt", b"b")
+
+    report = await sync(source, dest, delete=True, dry_run=True)
+    assert report.copied == ["a.txt"]
+    assert report.deleted == ["b.txt"]
+    assert not await dest.exists("a.txt")
+    assert await dest.exists("b.txt")
+
+
+async def test_sync_server_side_copy() -> None:
+    storage = FileStorage(MemoryBackend())
+    await storage.write("old/a.txt", b"a")
+    await storage.write("old/b.txt", b"b")
+
+    report = await sync(storage, storage, "old/", dest_prefix="new/")
+    assert report.server_side
+    assert sorted(report.copied) == ["old/a.txt", "old/b.txt"]
+    assert await (await storage.open("new/b.txt")).read() == b"b"
+
+
+async def test_sync_server_side_copy_is_seen_by_destination() -> None:
+    backend = MemoryBackend()
+    source = FileStorage(backend)
+    await source.write("src/big.txt", b"x" * 100)
+    await source.write("src/small.txt", b"x" * 5)
+    hook = _RecordingHook()
+    usage = UsageIndex(quotas={"dst/": 10})
+    dest = FileStorage(backend, hooks=[hook], usage=usage)
+
+    report = await sync(source, dest, "src/", dest_prefix="dst/")
+    assert report.server_side
+    assert report.copied == ["src/small.txt"]
+    assert isinstance(report.failed["src/big.txt"], QuotaExceededError)
+    assert [(event.operation, event.path) for event in hook.ended] == [("copy", "dst/small.txt")]
+    assert not await dest.exists("dst/big.txt")
+    assert await usage.usage("dst/") == Usage(5, 1)
+
+
+async def test_sync_resumes_from_checkpoint(tmp_path: pathlib.Path) -> None:
+    checkpoint = tmp_path / "sync.json"
+    source = FileStorage(MemoryBackend())
+    for name in ("a.txt", "b.txt", "c.txt"):
+        await source.write(name, name.encode())
+
+    dest_backend = _FailingBackend(fail_on="b.txt")
+    report = await sync(source, FileStorage(dest_backend), checkpoint=checkpoint, concurrency=1)
+    assert list(report.failed) == ["b.txt"]
+    assert set(json.loads(checkpoint.read_text())["done"]) == {"a.txt", "c.txt"}
+
+    # destination listing lost track of uploaded files, the checkpoint still skips them
+    dest_backend.fs.clear()
+    dest_backend.fail_on = ""
+    dest_backend.copied.clear()
+    report = await sync(source, FileStorage(dest_backend), checkpoint=checkpoint)
+    assert dest_backend.copied == ["b.txt"]
+    assert report.skipped == 2
+    assert not checkpoint.exists()
+
+
+async def test_sync_listing_error_is_not_wrapped() -> None:
+    class _BrokenListing(MemoryBackend):
+        async def list(self, prefix: str = "") -> typing.AsyncIterator[FileInfo]:
+            yield FileInfo("a.txt", 1)
+            raise ConnectionError("listing failed")
+
+    source = FileStorage(_BrokenListing())
+    await source.write("a.txt", b"a")
+    with pytest.raises(ConnectionError):
+        await sync(source, FileStorage(MemoryBackend()))
@@ -0,0 +1,121 @@
+import io
+import os
+import threading
+import typing
+
+import pytest
+
+from async_storages import FileStorage, MemoryBackend
+from async_storages.backends.s3 import S3Backend
+from async_storages.sync_storage import SyncFileStorage, event_loop_thread
+
+
+def test_blocking_operations() -> None:
+    storage = SyncFileStorage(MemoryBackend())
+    storage.write("docs/a.txt", b"content")
+    storage.write("docs/b.txt", io.BytesIO(b"other"))
+
+    assert storage.exists("docs/a.txt")
+    assert storage.read("docs/b.txt") == b"other"
+    with storage.open("docs/a.txt") as file:
+        assert file.read(3) == b"con"
+        assert b"".join(file) == b"tent"
+    storage.copy("docs/a.txt", "docs/c.txt")
+    assert [(info.path, info.size) for info in storage.list("docs/")] == [
+        ("docs/a.txt", 7),
+        ("docs/b.txt", 5),
+        ("docs/c.txt", 7),
+    ]
+
+    storage.delete("docs/a.txt")
+    assert not storage.exists("docs/a.txt")
+    with pytest.raises(FileNotFoundError):
+        storage.read("docs/a.txt")
+
+
+def test_batch_operations() -> None:
+    storage = SyncFileStorage(FileStorage(MemoryBackend()), concurrency=4)
+    files = {f"batch/{index}.txt": str(index).encode() for index in range(20)}
+    storage.write_many(files)
+
+    assert storage.read_many(files) == files
+    assert storage.exists_many(["batch/1.txt", "batch/missing.txt"]) == {
+        "batch/1.txt": True,
+        "batch/missing.txt": False,
+    }
+    with pytest.raises(FileNotFoundError):
+        storage.read_many(["batch/1.txt", "batch/missing.txt"])
+
+    storage.delete_many(files)
+    assert not any(storage.exists_many(files).values())
+
+
+def test_calls_share_one_event_loop() -> None:
+    storage = SyncFileStorage(MemoryBackend())
+    threads: list[int] = []
+
+    async def current_thread() -> int:
+        return threading.get_ident()
+
+    for _ in range(3):
+        storage.write("file.txt", b"x")
+        threads.append(event_loop_thread.portal.call(current_thread))
+    assert len(set(threads)) == 1
+    assert threads[0] != threading.get_ident()
+
+    # from other threads too
+    results: list[bool] = []
+    workers = [threading.Thread(target=lambda: results.append(storage.exists("file.txt"))) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert results == [True] * 4
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+def test_forked_process_starts_own_loop() -> None:
+    storage = SyncFileStorage(MemoryBackend())
+    storage.write("file.txt", b"content")
+
+    pid = os.fork()
+    if pid == 0:  # pragma: no cover
+        try:
+            os._exit(0 if storage.read("file.txt") == b"content" else 1)
+        except BaseException:
+            os._exit(2)
+    _, status = os.waitpid(pid, 0)
+    assert os.waitstatus_to_exitcode(status) == 0
+
+
+def test_cannot_be_called_from_event_loop() -> None:
+    storage = SyncFileStorage(MemoryBackend())
+
+    async def main() -> None:
+        with pytest.raises(RuntimeError):
+            storage.write("file.txt", b"x")
+
+    # it would deadlock waiting for itself
+    event_loop_thread.portal.call(main)
+
+
+def test_s3_client_is_kept_alive(storage: S3Backend, monkeypatch: pytest.MonkeyPatch) -> None:
+    assert storage.keep_client_alive is None
+    created: list[str] = []
+    create_client = storage.session.client
+
+    def counting_client(*args: typing.Any, **kwargs: typing.Any) -> typing.Any:
+        created.append(args[0])
+        return create_client(*args, **kwargs)
+
+    monkeypatch.setattr(storage.session, "client", counting_client)
+    sync_storage = SyncFileStorage(storage)
+    for index in range(3):
+        sync_storage.write(f"sync-facade/{index}.txt", b"content")
+    assert sync_storage.read_many([f"sync-facade/{index}.txt" for index in range(3)])["sync-facade/2.txt"] == b"content"
+    sync_storage.delete_many([f"sync-facade/{index}.txt" for index in range(3)])
+    assert created == ["s3"]
+    assert len(storage._clients) == 1
+
+    sync_storage.close()
+    assert not storage._clients
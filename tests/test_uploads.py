@@ -0,0 +1,271 @@
+import base64
+import io
+import os
+import pathlib
+import typing
+import uuid
+
+import anyio
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+from async_storages import FileStorage, MemoryBackend
+from async_storages.backends.base import BaseBackend, UploadOffsetError, UploadSession
+from async_storages.backends.coalescing import CoalescingBackend
+from async_storages.backends.compressed import CompressedBackend
+from async_storages.backends.fs import FileSystemBackend
+from async_storages.backends.policy import PolicyBackend
+from async_storages.backends.s3 import S3Backend
+from async_storages.backends.write_behind import WriteBehindBackend
+from async_storages.contrib.starlette import FileServer, TusEndpoint, parse_upload_metadata
+from async_storages.instrumentation import InstrumentedBackend
+from async_storages.usage import UsageIndex
+from tests.conftest import AWS_ACCESS_KEY_ID, AWS_ENDPOINT_URL, AWS_SECRET_ACCESS_KEY
+
+pytestmark = [pytest.mark.asyncio]
+
+
+class _BrokenReader:
+    """Delivers some data, then fails like a dropped connection."""
+
+    def __init__(self, data: bytes) -> None:
+        self.data = io.BytesIO(data)
+
+    async def read(self, n: int = -1) -> bytes:
+        if chunk := self.data.read(n):
+            return chunk
+        raise ConnectionResetError("connection lost")
+
+
+def _make_storage(kind: str, tmp_path: pathlib.Path) -> FileStorage:
+    if kind == "s3":
+        return FileStorage(
+            S3Backend(
+                bucket="asyncstorages",
+                aws_access_key_id=AWS_ACCESS_KEY_ID,
+                aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+                endpoint_url=AWS_ENDPOINT_URL,
+                upload_part_size=1024**2 * 5,
+            )
+        )
+    if kind == "fs":
+        return FileStorage(FileSystemBackend(tmp_path, mkdirs=True))
+    return FileStorage(MemoryBackend())
+
+
+@pytest.mark.parametrize("kind", ["s3", "fs", "memory"])
+async def test_resumable_upload(kind: str, tmp_path: pathlib.Path, storage: S3Backend) -> None:
+    # 2 full S3 parts and a tail
+    content = os.urandom(1024**2 * 11)
+    file_storage = _make_storage(kind, tmp_path)
+    path = f"uploads/{uuid.uuid4().hex}.bin"
+    session = await file_storage.create_upload(path, len(content), {"filename": "big.bin"})
+    assert session.offset == 0
+
+    await file_storage.append_upload(session.id, 0, content[: 1024**2 * 3])
+    with pytest.raises(UploadOffsetError):
+        await file_storage.append_upload(session.id, 0, b"again")
+    with pytest.raises(ConnectionResetError):
+        await file_storage.append_upload(session.id, 1024**2 * 3, _BrokenReader(content[1024**2 * 3 : 1024**2 * 7]))
+
+    # the client asks for the offset and resumes from the last stored byte
+    session = await file_storage.get_upload(session.id)
+    assert session.offset == 1024**2 * 7
+    assert session.metadata == {"filename": "big.bin"}
+    assert not await file_storage.exists(path)
+
+    session = await file_storage.append_upload(session.id, session.offset, content[session.offset :])
+    assert session.is_complete
+    with pytest.raises(ValueError):
+        await file_storage.append_upload(session.id, session.offset, b"extra")
+
+    await file_storage.complete_upload(session.id)
+    assert await (await file_storage.open(path)).read() == content
+    with pytest.raises(FileNotFoundError):
+        await file_storage.get_upload(session.id)
+    paths = [info.path async for info in file_storage.list("")]
+    assert path in paths
+    assert not any(stored_path.startswith(".uploads") for stored_path in paths)
+    await file_storage.delete(path)
+
+
+@pytest.mark.parametrize("kind", ["s3", "fs", "memory"])
+async def test_abort_upload(kind: str, tmp_path: pathlib.Path, storage: S3Backend) -> None:
+    file_storage = _make_storage(kind, tmp_path)
+    session = await file_storage.create_upload("aborted.txt")
+    await file_storage.append_upload(session.id, 0, b"content")
+    with pytest.raises(ValueError):
+        await file_storage.complete_upload((await file_storage.create_upload("other.txt", 10)).id)
+
+    await file_storage.abort_upload(session.id)
+    with pytest.raises(FileNotFoundError):
+        await file_storage.get_upload(session.id)
+    assert not await file_storage.exists("aborted.txt")
+    await file_storage.abort_upload(session.id)
+
+
+async def test_upload_without_length(tmp_path: pathlib.Path) -> None:
+    storage = FileStorage(FileSystemBackend(tmp_path))
+    session = await storage.create_upload("stream.txt")
+    await storage.append_upload(session.id, 0, b"hello ")
+    await storage.append_upload(session.id, 6, b"world")
+    await storage.complete_upload(session.id)
+    assert (tmp_path / "stream.txt").read_bytes() == b"hello world"
+    with pytest.raises(FileNotFoundError):
+        await storage.get_upload("../../etc/passwd")
+
+
+async def test_partial_uploads_are_not_served(tmp_path: pathlib.Path) -> None:
+    storage = FileStorage(FileSystemBackend(tmp_path / "media", mkdirs=True))
+    session = await storage.create_upload("file.txt", 10)
+    await storage.append_upload(session.id, 0, b"secret")
+
+    # inside the base directory, a mount point or a read-only parent directory are fine
+    assert (tmp_path / "media" / ".uploads" / f"{session.id}.part").exists()
+    client = TestClient(Starlette(routes=[Mount("/media", FileServer(storage))]))
+    assert client.get(f"/media/.uploads/{session.id}.part").status_code == 404
+    assert client.get(f"/media/.uploads/{session.id}.json").status_code == 404
+    assert not await storage.exists(f".uploads/{session.id}.part")
+    with pytest.raises(FileNotFoundError):
+        await storage.open(f".uploads/{session.id}.part")
+    assert [info.path async for info in storage.list()] == []
+
+
+@pytest.mark.parametrize(
+    "wrap",
+    [
+        lambda backend: PolicyBackend(backend),
+        lambda backend: InstrumentedBackend(backend, []),
+        lambda backend: CompressedBackend(backend, min_size=1),
+        lambda backend: CoalescingBackend(backend, retain_ttl=60),
+    ],
+)
+async def test_wrapper_backends_delegate_uploads(wrap: typing.Callable[[BaseBackend], BaseBackend]) -> None:
+    storage = FileStorage(wrap(MemoryBackend()))
+    await storage.write("file.txt", b"old content")
+    assert await (await storage.open("file.txt")).read() == b"old content"
+
+    session = await storage.create_upload("file.txt", 11)
+    await storage.append_upload(session.id, 0, b"new content")
+    await storage.complete_upload(session.id)
+    assert await (await storage.open("file.txt")).read() == b"new content"
+
+    session = await storage.create_upload("aborted.txt")
+    assert (await storage.get_upload(session.id)).path == "aborted.txt"
+    await storage.abort_upload(session.id)
+    with pytest.raises(FileNotFoundError):
+        await storage.get_upload(session.id)
+
+
+async def test_write_behind_upload_replaces_staged_write(tmp_path: pathlib.Path) -> None:
+    remote = MemoryBackend()
+    async with WriteBehindBackend(remote, FileSystemBackend(tmp_path, mkdirs=True)) as backend:
+        storage = FileStorage(backend)
+        await storage.write("file.txt", b"staged")
+        session = await storage.create_upload("file.txt", 8)
+        await storage.append_upload(session.id, 0, b"uploaded")
+        await storage.complete_upload(session.id)
+        await backend.drain()
+        assert await (await storage.open("file.txt")).read() == b"uploaded"
+
+
+async def test_concurrent_parts_are_serialized() -> None:
+    storage = FileStorage(MemoryBackend())
+    session = await storage.create_upload("file.txt", 10)
+
+    class _SlowReader:
+        def __init__(self, data: bytes) -> None:
+            self.data = io.BytesIO(data)
+
+        async def read(self, n: int = -1) -> bytes:
+            await anyio.sleep(0.01)
+            return self.data.read(n)
+
+    errors: list[Exception] = []
+
+    async def append() -> None:
+        try:
+            await storage.append_upload(session.id, 0, _SlowReader(b"0123456789"))
+        except UploadOffsetError as ex:
+            errors.append(ex)
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(append)
+        tg.start_soon(append)
+
+    assert len(errors) == 1
+    assert (await storage.get_upload(session.id)).offset == 10
+    assert not storage._upload_locks
+
+
+def test_parse_upload_metadata() -> None:
+    header = "filename " + base64.b64encode("отчёт.pdf".encode()).decode() + ",is_confidential"
+    assert parse_upload_metadata(header) == {"filename": "отчёт.pdf", "is_confidential": ""}
+    assert parse_upload_metadata("") == {}
+
+
+async def test_tus_endpoint() -> None:
+    completed: list[UploadSession] = []
+
+    async def on_complete(session: UploadSession) -> None:
+        completed.append(session)
+
+    storage = FileStorage(MemoryBackend())
+    endpoint = TusEndpoint(storage, destination="files/{file_name}", max_size=100, on_complete=on_complete)
+    client = TestClient(Starlette(routes=[Mount("/uploads", endpoint)]))
+    tus = {"tus-resumable": "1.0.0"}
+
+    response = client.options("/uploads")
+    assert response.status_code == 204
+    assert response.headers["tus-version"] == "1.0.0"
+    assert response.headers["tus-max-size"] == "100"
+
+    assert client.post("/uploads", headers={"upload-length": "5"}).status_code == 412
+    assert client.post("/uploads", headers={**tus, "upload-length": "101"}).status_code == 413
+    assert client.post("/uploads", headers={**tus, "upload-length": "x"}).status_code == 400
+
+    metadata = "filename " + base64.b64encode(b"hello.txt").decode()
+    response = client.post("/uploads", headers={**tus, "upload-length": "11", "upload-metadata": metadata})
+    assert response.status_code == 201
+    location = response.headers["location"]
+    assert location.startswith("http://testserver/uploads/")
+
+    patch = {**tus, "content-type": "application/offset+octet-stream"}
+    response = client.patch(location, headers={**patch, "upload-offset": "0"}, content=b"hello")
+    assert response.status_code == 204
+    assert response.headers["upload-offset"] == "5"
+
+    assert client.patch(location, headers={**patch, "upload-offset": "0"}, content=b"hello").status_code == 409
+    assert client.patch(location, headers={**tus, "upload-offset": "5"}, content=b" world").status_code == 415
+
+    response = client.head(location, headers=tus)
+    assert response.headers["upload-offset"] == "5"
+    assert response.headers["upload-length"] == "11"
+
+    response = client.patch(location, headers={**patch, "upload-offset": "5"}, content=b" world")
+    assert response.headers["upload-offset"] == "11"
+    assert [session.path for session in completed] == ["files/hello.txt"]
+    assert await (await storage.open("files/hello.txt")).read() == b"hello world"
+    assert client.head(location, headers=tus).status_code == 404
+
+    response = client.post("/uploads", headers={**tus, "upload-length": "10"})
+    location = response.headers["location"]
+    assert client.patch(location, headers={**patch, "upload-offset": "0"}, content=b"x" * 11).status_code == 413
+    assert client.delete(location, headers=tus).status_code == 204
+    assert client.head(location, headers=tus).status_code == 404
+    assert client.head("/uploads/not-an-upload", headers=tus).status_code == 404
+
+
+async def test_tus_endpoint_quota() -> None:
+    storage = FileStorage(MemoryBackend(), usage=UsageIndex(quotas={"": 10}))
+    client = TestClient(Starlette(routes=[Mount("/uploads", TusEndpoint(storage))]))
+    tus = {"tus-resumable": "1.0.0"}
+    patch = {**tus, "content-type": "application/offset+octet-stream", "upload-offset": "0"}
+
+    assert client.post("/uploads", headers={**tus, "upload-length": "11"}).status_code == 413
+    first = client.post("/uploads", headers={**tus, "upload-length": "6"}).headers["location"]
+    second = client.post("/uploads", headers={**tus, "upload-length": "6"}).headers["location"]
+    assert client.patch(first, headers=patch, content=b"x" * 6).status_code == 204
+    assert client.patch(second, headers=patch, content=b"x" * 6).status_code == 413
@@ -0,0 +1,179 @@
+import io
+import pathlib
+import typing
+
+import anyio
+import pytest
+
+from async_storages import FileStorage, MemoryBackend
+from async_storages.backends.base import AsyncReader, FileInfo
+from async_storages.usage import (
+    MemoryUsageStore,
+    QuotaExceededError,
+    SQLiteUsageStore,
+    Usage,
+    UsageIndex,
+    UsageStore,
+    ancestor_prefixes,
+)
+
+pytestmark = [pytest.mark.asyncio]
+
+
+def _make_store(kind: str, tmp_path: pathlib.Path) -> UsageStore:
+    return SQLiteUsageStore(tmp_path / "usage.db") if kind == "sqlite" else MemoryUsageStore()
+
+
+def test_ancestor_prefixes() -> None:
+    assert ancestor_prefixes("file.txt") == [""]
+    assert ancestor_prefixes("a/b/c.txt") == ["", "a/", "a/b/"]
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite"])
+async def test_usage_is_maintained_by_writes_and_deletes(kind: str, tmp_path: pathlib.Path) -> None:
+    index = UsageIndex(_make_store(kind, tmp_path))
+    storage = FileStorage(MemoryBackend(), usage=index)
+
+    await storage.write("tenants/acme/a.txt", b"x" * 100)
+    await storage.write("tenants/acme/docs/b.txt", io.BytesIO(b"x" * 50))
+    await storage.write("tenants/other/c.txt", b"x" * 10)
+    assert await index.usage("tenants/acme") == Usage(bytes=150, objects=2)
+    assert await index.usage("tenants/acme/docs/") == Usage(bytes=50, objects=1)
+    assert await index.usage() == Usage(bytes=160, objects=3)
+
+    await storage.write("tenants/acme/a.txt", b"x" * 20)  # overwrite
+    assert await index.usage("tenants/acme/") == Usage(bytes=70, objects=2)
+
+    await storage.copy("tenants/acme/a.txt", "tenants/other/a.txt")
+    assert await index.usage("tenants/other/") == Usage(bytes=30, objects=2)
+
+    await storage.delete("tenants/acme/docs/b.txt")
+    assert await index.usage("tenants/acme/") == Usage(bytes=20, objects=1)
+    assert await index.usage("tenants/acme/docs/") == Usage(bytes=0, objects=0)
+    assert await index.usage("unknown/") == Usage()
+
+
+async def test_usage_is_persisted(tmp_path: pathlib.Path) -> None:
+    store = SQLiteUsageStore(tmp_path / "usage.db")
+    await UsageIndex(store).record("a/b.txt", 42)
+    store.close()
+
+    assert await UsageIndex(SQLiteUsageStore(tmp_path / "usage.db")).usage("a/") == Usage(42, 1)
+
+
+async def test_quota() -> None:
+    index = UsageIndex(quotas={"tenants/acme/": 100})
+    storage = FileStorage(MemoryBackend(), usage=index)
+
+    await storage.write("tenants/acme/a.txt", b"x" * 60)
+    with pytest.raises(QuotaExceededError) as exc_info:
+        await storage.write("tenants/acme/b.txt", b"x" * 50)
+    assert exc_info.value.prefix == "tenants/acme/"
+    assert exc_info.value.usage == Usage(60, 1)
+    assert not await storage.exists("tenants/acme/b.txt")
+
+    # overwriting replaces the old size
+    await storage.write("tenants/acme/a.txt", b"x" * 100)
+    await storage.write("tenants/other/b.txt", b"x" * 500)
+    # unknown size is rejected only when the quota is used up
+    with pytest.raises(QuotaExceededError):
+        await storage.write("tenants/acme/c.txt", io.BytesIO(b"x"))
+    with pytest.raises(QuotaExceededError):
+        await storage.create_upload("tenants/acme/d.txt", length=1)
+
+
+async def test_copies_and_uploads_are_checked() -> None:
+    index = UsageIndex(quotas={"tenants/acme/": 100})
+    storage = FileStorage(MemoryBackend(), usage=index)
+    await storage.write("tenants/acme/a.txt", b"x" * 60)
+
+    with pytest.raises(QuotaExceededError):
+        await storage.copy("tenants/acme/a.txt", "tenants/acme/b.txt")
+    assert not await storage.exists("tenants/acme/b.txt")
+    await storage.copy("tenants/acme/a.txt", "tenants/other/a.txt")
+    assert await index.usage() == Usage(120, 2)
+
+    # both uploads pass the check at creation, only one fits when completed
+    first = await storage.create_upload("tenants/acme/b.txt", length=30)
+    second = await storage.create_upload("tenants/acme/c.txt", length=30)
+    await storage.append_upload(first.id, 0, b"x" * 30)
+    await storage.append_upload(second.id, 0, b"x" * 30)
+    await storage.complete_upload(first.id)
+    with pytest.raises(QuotaExceededError):
+        await storage.complete_upload(second.id)
+    assert not await storage.exists("tenants/acme/c.txt")
+    assert await index.usage("tenants/acme/") == Usage(90, 2)
+    assert not index._reserved
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite"])
+async def test_rebuild_from_listing(kind: str, tmp_path: pathlib.Path) -> None:
+    backend = MemoryBackend()
+    plain = FileStorage(backend)
+    await plain.write("a/one.txt", b"1")
+    await plain.write("a/b/two.txt", b"22")
+    index = UsageIndex(_make_store(kind, tmp_path))
+    await index.record("stale.txt", 1000)
+
+    await index.rebuild(plain.list())
+    assert await index.usage() == Usage(3, 2)
+    assert await index.usage("a/b/") == Usage(2, 1)
+
+    async def listing() -> typing.AsyncIterator[FileInfo]:
+        yield FileInfo("a/one.txt", 1)
+        await index.record("a/new.txt", 5)  # written while listing
+        yield FileInfo("a/b/two.txt", 2)
+
+    await index.rebuild(listing())
+    assert await index.usage("a/") == Usage(8, 3)
+
+
+async def test_concurrent_writes_reserve_quota() -> None:
+    class _SlowBackend(MemoryBackend):
+        async def write(self, path: str, data: AsyncReader) -> None:
+            await anyio.sleep(0.01)
+            await super().write(path, data)
+
+    index = UsageIndex(quotas={"tenants/acme/": 100})
+    storage = FileStorage(_SlowBackend(), usage=index)
+    errors: list[QuotaExceededError] = []
+
+    async def write(path: str) -> None:
+        try:
+            await storage.write(path, b"x" * 60)
+        except QuotaExceededError as ex:
+            errors.append(ex)
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(write, "tenants/acme/a.txt")
+        tg.start_soon(write, "tenants/acme/b.txt")
+
+    assert len(errors) == 1
+    assert await index.usage("tenants/acme/") == Usage(60, 1)
+    assert not index._reserved
+
+
+async def test_overlapping_rebuilds_keep_changes() -> None:
+    index = UsageIndex()
+    first_listed, second_done = anyio.Event(), anyio.Event()
+
+    async def slow_listing() -> typing.AsyncIterator[FileInfo]:
+        yield FileInfo("a.txt", 1)
+        first_listed.set()
+        await second_done.wait()
+
+    async def fast_listing() -> typing.AsyncIterator[FileInfo]:
+        await first_listed.wait()
+        await index.record("b.txt", 2)  # written while both rebuilds are listing
+        yield FileInfo("a.txt", 1)
+
+    async def second_rebuild() -> None:
+        await index.rebuild(fast_listing())
+        second_done.set()
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(index.rebuild, slow_listing())
+        tg.start_soon(second_rebuild)
+
+    assert await index.usage() == Usage(3, 2)
+    assert not index._rebuilds
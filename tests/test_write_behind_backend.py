@@ -0,0 +1,192 @@
+import io
+import os
+import pathlib
+
+import anyio
+import pytest
+from starlette.applications import Starlette
+from starlette.routing import Mount
+from starlette.testclient import TestClient
+
+from async_storages import FileStorage, FileSystemBackend, MemoryBackend
+from async_storages.backends.base import AdaptedBytesIO, AsyncReader
+from async_storages.backends.write_behind import WriteBehindBackend
+from async_storages.contrib.starlette import FileServer
+
+pytestmark = [pytest.mark.asyncio]
+
+
+class _GatedBackend(MemoryBackend):
+    def __init__(self) -> None:
+        super().__init__()
+        self.gate = anyio.Event()
+        self.uploads: list[tuple[str, bytes]] = []
+        self.failures = 0
+
+    async def write(self, path: str, data: AsyncReader) -> None:
+        await self.gate.wait()
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("Service unavailable")
+        content = await data.read()
+        self.uploads.append((path, content))
+        await super().write(path, AdaptedBytesIO(io.BytesIO(content)))
+
+
+async def _read(storage: FileStorage, path: str) -> bytes:
+    file = await storage.open(path)
+    return await file.read()
+
+
+async def test_acknowledges_write_before_upload(tmp_path: pathlib.Path) -> None:
+    remote = _GatedBackend()
+    async with WriteBehindBackend(remote, FileSystemBackend(tmp_path, mkdirs=True)) as backend:
+        storage = FileStorage(backend)
+        with anyio.fail_after(1):
+            await storage.write("file.txt", b"content")
+
+        assert not await remote.exists("file.txt")
+        assert await storage.exists("file.txt")
+        assert await _read(storage, "file.txt") == b"content"
+
+        remote.gate.set()
+        await backend.drain()
+        assert remote.uploads == [("file.txt", b"content")]
+        assert await _read(storage, "file.txt") == b"content"
+        assert not backend.pending
+
+    assert list(tmp_path.iterdir()) == []
+
+
+async def test_coalesces_repeated_writes(tmp_path: pathlib.Path) -> None:
+    remote = _GatedBackend()
+    async with WriteBehindBackend(remote, FileSystemBackend(tmp_path, mkdirs=True), workers=2) as backend:
+        storage = FileStorage(backend)
+        await storage.write("file.txt", b"v1")
+        await anyio.wait_all_tasks_blocked()  # v1 upload is in progress
+        for version in (b"v2", b"v3", b"v4"):
+            await storage.write("file.txt", version)
+        assert await _read(storage, "file.txt") == b"v4"
+        remote.gate.set()
+
+    assert remote.uploads == [("file.txt", b"v1"), ("file.txt", b"v4")]
+    assert list(tmp_path.iterdir()) == []
+
+
+async def test_delete_cancels_pending_upload(tmp_path: pathlib.Path) -> None:
+    remote = _GatedBackend()
+    async with WriteBehindBackend(remote, FileSystemBackend(tmp_path, mkdirs=True)) as backend:
+        await backend.write("file.txt", AdaptedBytesIO(io.BytesIO(b"content")))
+        await anyio.wait_all_tasks_blocked()
+        await backend.delete("file.txt")
+        assert not await backend.exists("file.txt")
+        remote.gate.set()
+
+    assert not await remote.exists("file.txt")
+    assert list(tmp_path.iterdir()) == []
+
+
+async def test_retries_failed_uploads(tmp_path: pathlib.Path) -> None:
+    remote = _GatedBackend()
+    remote.failures = 1
+    remote.gate.set()
+    async with WriteBehindBackend(remote, FileSystemBackend(tmp_path, mkdirs=True), retry_delay=0) as backend:
+        await backend.write("file.txt", AdaptedBytesIO(io.BytesIO(b"content")))
+
+    assert remote.uploads == [("file.txt", b"content")]
+    assert not backend.failed
+
+
+async def test_recovers_staged_files_after_restart(tmp_path: pathlib.Path) -> None:
+    remote = _GatedBackend()
+    staging = FileSystemBackend(tmp_path, mkdirs=True)
+    backend = WriteBehindBackend(remote, staging, drain_timeout=0.05)
+    async with backend:
+        await backend.write("file.txt", AdaptedBytesIO(io.BytesIO(b"content")))
+    assert remote.uploads == []
+
+    remote.gate.set()
+    async with WriteBehindBackend(remote, staging) as backend:
+        assert await backend.exists("file.txt")
+
+    assert remote.uploads == [("file.txt", b"content")]
+    assert list(tmp_path.iterdir()) == []
+
+
+async def test_list_includes_staged_files(tmp_path: pathlib.Path) -> None:
+    remote = _GatedBackend()
+    remote.gate.set()
+    async with WriteBehindBackend(remote, FileSystemBackend(tmp_path, mkdirs=True)) as backend:
+        storage = FileStorage(backend)
+        await storage.write("a.txt", b"a")
+        await storage.write("c.txt", b"c")
+        await backend.drain()
+
+        remote.gate = anyio.Event()
+        await storage.write("b.txt", b"bb")
+        await storage.write("c.txt", b"ccc")
+        await storage.write("d.txt", b"d")
+        listed = [(info.path, info.size) async for info in storage.list()]
+        assert listed == [("a.txt", 1), ("b.txt", 2), ("c.txt", 3), ("d.txt", 1)]
+        remote.gate.set()
+
+
+class _FailingDeleteBackend(_GatedBackend):
+    async def delete(self, path: str) -> None:
+        raise ConnectionError("Service unavailable")
+
+
+async def test_workers_survive_delete_errors(tmp_path: pathlib.Path) -> None:
+    remote = _FailingDeleteBackend()
+    async with WriteBehindBackend(remote, FileSystemBackend(tmp_path, mkdirs=True), workers=1) as backend:
+        await backend.write("file.txt", AdaptedBytesIO(io.BytesIO(b"content")))
+        await anyio.wait_all_tasks_blocked()
+        with pytest.raises(ConnectionError):
+            await backend.delete("file.txt")
+        remote.gate.set()
+        await backend.drain()
+        assert isinstance(backend.failed["file.txt"], ConnectionError)
+
+        await backend.write("other.txt", AdaptedBytesIO(io.BytesIO(b"other")))
+        await backend.drain()
+
+    assert ("other.txt", b"other") in remote.uploads
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/fd"), reason="requires procfs")
+async def test_write_is_flushed_to_disk(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    synced: list[str] = []
+    fsync = os.fsync
+
+    def recording_fsync(fd: int) -> None:
+        synced.append(os.readlink(f"/proc/self/fd/{fd}"))
+        fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", recording_fsync)
+    remote = _GatedBackend()
+    async with WriteBehindBackend(remote, FileSystemBackend(tmp_path, mkdirs=True)) as backend:
+        await backend.write("file.txt", AdaptedBytesIO(io.BytesIO(b"content")))
+        key = backend.pending["file.txt"]
+        assert synced == [str(tmp_path / f"{key}.data"), str(tmp_path / f"{key}.path"), str(tmp_path)]
+        remote.gate.set()
+
+
+async def test_pending_files_are_served_locally(tmp_path: pathlib.Path) -> None:
+    class _RemoteBackend(_GatedBackend):
+        async def url(self, path: str) -> str:
+            return f"https://bucket.example.com/{path}"
+
+    remote = _RemoteBackend()
+    async with WriteBehindBackend(remote, FileSystemBackend(tmp_path / "staging", mkdirs=True)) as backend:
+        storage = FileStorage(backend)
+        await storage.write("file.txt", b"content")
+        assert await storage.url("file.txt") == "https://bucket.example.com/file.txt"
+
+        client = TestClient(Starlette(routes=[Mount("/media", FileServer(storage))]))
+        response = client.get("/media/file.txt", follow_redirects=False)
+        assert response.status_code == 200
+        assert response.content == b"content"
+
+        remote.gate.set()
+        await backend.drain()
+        assert client.get("/media/file.txt", follow_redirects=False).status_code == 301